@@ -1,24 +1,105 @@
 from flask import redirect, url_for, request, session, render_template
-from flask_login import current_user, LoginManager, login_required, logout_user
+from flask_login import current_user, LoginManager, login_required, logout_user, UserMixin
 from werkzeug.exceptions import Forbidden, Unauthorized
+import commithooks
 import models
 from functools import wraps
+from sqlalchemy.orm import joinedload
+from ttlcache import TTLCache
 
 # สร้าง LoginManager
 login_manager = LoginManager()
 
 
+# ข้อมูลผู้ใช้ที่ล็อกอินอยู่แบบอ่านอย่างเดียว (ไม่ผูกกับ session ของ SQLAlchemy)
+# ใช้เป็น current_user เพื่อไม่ต้อง query ตาราง users/roles ทุก request
+class Principal(UserMixin):
+    def __init__(self, id, username, name, status, roles):
+        self.id = id
+        self.username = username
+        self.name = name
+        self.status = status
+        self.roles = frozenset(roles)
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(
+            user.id,
+            user.username,
+            user.name,
+            user.status,
+            (role.name for role in user.roles),
+        )
+
+    def has_role(self, role_name):
+        return role_name in self.roles
+
+
+# cache แบบ LRU + TTL ต่อ process (ค่าจะถูกลบเมื่อ commit การแก้ไข User/Role)
+class PrincipalCache(TTLCache):
+    def __init__(self, maxsize=1024, ttl=300):
+        super().__init__(maxsize, ttl)
+
+    def invalidate(self, user_ids=None):
+        if user_ids is None:
+            self.clear()
+        else:
+            self.discard(user_ids)
+
+
+principals = PrincipalCache()
+
+
+# ลบ principal ของ User ที่แก้ออกจาก cache เมื่อ commit สำเร็จ
+# (แก้ Role หรือเขียนตาราง users/roles/user_roles แบบ bulk: ลบทั้งหมด)
+def _changed(session):
+    changes = set()
+    for obj in commithooks.pending(session):
+        if isinstance(obj, models.Role):
+            changes.add(None)
+        elif isinstance(obj, models.User) and obj.id is not None:
+            changes.add(obj.id)
+    return changes
+
+
+def _invalidate(changes):
+    if None in changes:
+        principals.invalidate()
+    else:
+        principals.invalidate(changes)
+
+
+_hook = commithooks.CommitHook(
+    "principal_changes", _changed, _invalidate, {"users", "roles", "user_roles"}
+)
+
+
 # กำหนดการตั้งค่า login_manager
 def init_acl(app):
     login_manager.init_app(app)
+    principals.maxsize = app.config.setdefault("PRINCIPAL_CACHE_SIZE", 1024)
+    principals.ttl = app.config.setdefault("PRINCIPAL_CACHE_TTL", 300)
+    _hook.register(models.db.session)
 
-    # โหลดผู้ใช้จาก ID
+    # โหลดผู้ใช้จาก ID (จาก cache ก่อน ถ้าไม่มีจึง query)
     @login_manager.user_loader
     def load_user(user_id):
-        return models.User.query.get(int(user_id))  # กำหนดการโหลดผู้ใช้จาก ID
+        user_id = int(user_id)
+        principal = principals.get(user_id)
+        if principal is not None:
+            return principal
+        # โหลด roles มาพร้อมกันใน query เดียว
+        user = models.db.session.get(
+            models.User, user_id, options=[joinedload(models.User.roles)]
+        )
+        if user is None:
+            return None
+        principal = Principal.from_user(user)
+        principals.set(user_id, principal)
+        return principal
 
     # กำหนดเส้นทางหน้าเข้าสู่ระบบ
-    login_manager.login_view = "login"  # กำหนด URL สำหรับหน้า login
+    login_manager.login_view = "site.login"  # กำหนด URL สำหรับหน้า login
 
 
 # ฟังก์ชันตรวจสอบสิทธิ์การเข้าถึงตามบทบาท
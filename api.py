@@ -0,0 +1,468 @@
+import datetime
+import json
+import shutil
+import tarfile
+import tempfile
+from collections import defaultdict
+
+from flask import Blueprint, current_app, request, stream_with_context, url_for
+from flask_login import current_user, login_required
+from werkzeug.exceptions import (
+    BadRequest,
+    HTTPException,
+    NotFound,
+    UnsupportedMediaType,
+)
+
+try:
+    import orjson
+except ImportError:  # ใช้ json มาตรฐานถ้าไม่ได้ติดตั้ง orjson
+    orjson = None
+
+import acl
+import bulk
+import imaging
+import models
+import pagination
+import search
+import tags
+import transfer
+import uploads
+
+bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+MAX_BATCH = 500
+# ขนาดหน้าสูงสุดของ API (JSON จาก tuple ของคอลัมน์ถูกกว่าหน้า HTML มาก)
+MAX_PAGE_SIZE = 1000
+
+# คอลัมน์ที่เปิดให้ API อ่านได้ของแต่ละ resource (id ต้องอยู่ลำดับแรกเสมอ)
+NOTE_FIELDS = ("id", "title", "description", "created_date", "updated_date")
+TAG_FIELDS = ("id", "name", "created_date")
+UPLOAD_FIELDS = (
+    "id",
+    "filename",
+    "sha256",
+    "size",
+    "mime_type",
+    "width",
+    "height",
+    "created_date",
+)
+# Content-Type ที่ /import/* รับ (ฟอร์ม HTML ข้ามเว็บส่งชนิดเหล่านี้ไม่ได้ จึงกัน CSRF ไปด้วย)
+NDJSON_TYPES = ("application/x-ndjson",)
+ARCHIVE_TYPES = (
+    "application/x-tar",
+    "application/gzip",
+    "application/x-gzip",
+    "application/zip",
+)
+
+
+def init_app(app):
+    app.register_blueprint(bp)
+    # API ตอบ 401 แทนการ redirect ไปหน้า login
+    acl.login_manager.blueprint_login_views[bp.name] = None
+
+
+def _default(value):
+    if isinstance(value, datetime.datetime) and value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NAIVE_UTC)
+    return json.dumps(data, separators=(",", ":"), default=_default).encode()
+
+
+# ตอบ JSON พร้อม ETag (GET ที่ ETag ตรงกับของเดิมจะได้ 304)
+def json_response(data, status=200):
+    response = current_app.response_class(
+        dumps(data), status=status, mimetype="application/json"
+    )
+    if request.method == "GET" and status == 200:
+        response.add_etag()
+        response.make_conditional(request)
+    return response
+
+
+@bp.errorhandler(HTTPException)
+def handle_error(error):
+    return json_response(
+        {"error": error.name, "description": error.description}, error.code
+    )
+
+
+def requested_fields(allowed, extra=()):
+    value = request.args.get("fields")
+    if not value:
+        return list(allowed), list(extra)
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = set(names) - set(allowed) - set(extra)
+    if unknown:
+        raise BadRequest(f"Unknown fields: {', '.join(sorted(unknown))}")
+    columns = ["id"] + [name for name in allowed if name in names and name != "id"]
+    return columns, [name for name in extra if name in names]
+
+
+def requested_ids():
+    value = request.args.get("ids")
+    if value is None:
+        return None
+    try:
+        ids = [int(part) for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise BadRequest("ids must be a comma-separated list of integers")
+    if len(ids) > MAX_BATCH:
+        raise BadRequest(f"At most {MAX_BATCH} ids per request")
+    return ids
+
+
+# ดึงข้อมูลเป็น tuple ของคอลัมน์ (ไม่สร้าง ORM object) แบ่งหน้าแบบ keyset ตาม id
+# หรือดึงตามรายการ id ที่ระบุใน ?ids=
+def fetch_rows(model, columns):
+    table = model.__table__
+    statement = models.db.select(*(table.c[name] for name in columns))
+    ids = requested_ids()
+    if ids is not None:
+        rows = models.db.session.execute(
+            statement.where(table.c.id.in_(ids)).order_by(table.c.id)
+        ).all()
+        return rows, None
+    limit = pagination.page_limit(MAX_PAGE_SIZE)
+    after = request.args.get("after")
+    if after:
+        values = pagination.decode_cursor(after)
+        if len(values) != 1 or not isinstance(values[0], int):
+            raise BadRequest("Invalid cursor")
+        statement = statement.where(table.c.id > values[0])
+    rows = models.db.session.execute(
+        statement.order_by(table.c.id).limit(limit + 1)
+    ).all()
+    if len(rows) > limit:
+        return rows[:limit], pagination.encode_cursor([rows[limit - 1][0]])
+    return rows, None
+
+
+def note_tags(note_ids):
+    result = defaultdict(list)
+    if not note_ids:
+        return result
+    link = models.note_tag_m2m.c
+    rows = models.db.session.execute(
+        models.db.select(link.note_id, models.Tag.name)
+        .join(models.Tag, models.Tag.id == link.tag_id)
+        .where(link.note_id.in_(note_ids))
+        .order_by(link.note_id, models.Tag.name)
+    )
+    for note_id, name in rows:
+        result[note_id].append(name)
+    return result
+
+
+def list_response(model, allowed, extra=()):
+    columns, extras = requested_fields(allowed, extra)
+    rows, next_cursor = fetch_rows(model, columns)
+    items = [dict(zip(columns, row)) for row in rows]
+    if "tags" in extras:
+        by_note = note_tags([row[0] for row in rows])
+        for item in items:
+            item["tags"] = by_note.get(item["id"], [])
+    return json_response({"items": items, "next": next_cursor})
+
+
+def detail_response(model, allowed, item_id, extra=()):
+    columns, extras = requested_fields(allowed, extra)
+    table = model.__table__
+    row = models.db.session.execute(
+        models.db.select(*(table.c[name] for name in columns)).where(table.c.id == item_id)
+    ).first()
+    if row is None:
+        raise NotFound(f"{model.__name__} {item_id} not found")
+    item = dict(zip(columns, row))
+    if "tags" in extras:
+        item["tags"] = note_tags([item_id]).get(item_id, [])
+    return json_response(item)
+
+
+def request_items():
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get("items", [data])
+    if not isinstance(data, list) or not data:
+        raise BadRequest("Expected a JSON object or a non-empty list of objects")
+    if len(data) > MAX_BATCH:
+        raise BadRequest(f"At most {MAX_BATCH} items per request")
+    if not all(isinstance(item, dict) for item in data):
+        raise BadRequest("Each item must be a JSON object")
+    return data
+
+
+@bp.get("/notes")
+def list_notes():
+    return list_response(models.Note, NOTE_FIELDS, ("tags",))
+
+
+@bp.get("/notes/<int:note_id>")
+def get_note(note_id):
+    return detail_response(models.Note, NOTE_FIELDS, note_id, ("tags",))
+
+
+@bp.post("/notes")
+@login_required
+def create_notes():
+    records = []
+    for item in request_items():
+        title = item.get("title")
+        item_tags = item.get("tags") or []
+        if not isinstance(title, str) or not title.strip():
+            raise BadRequest("Every note needs a title")
+        if not isinstance(item.get("description") or "", str):
+            raise BadRequest("description must be a string")
+        if not isinstance(item_tags, list) or not all(
+            isinstance(name, str) for name in item_tags
+        ):
+            raise BadRequest("tags must be a list of strings")
+        records.append(
+            {"title": title, "description": item.get("description"), "tags": item_tags}
+        )
+    note_ids = transfer.create_notes(records)
+    models.db.session.commit()
+    return json_response({"ids": note_ids}, 201)
+
+
+@bp.get("/tags")
+def list_tags():
+    return list_response(models.Tag, TAG_FIELDS)
+
+
+@bp.get("/tags/<int:tag_id>")
+def get_tag(tag_id):
+    return detail_response(models.Tag, TAG_FIELDS, tag_id)
+
+
+@bp.post("/tags")
+@login_required
+def create_tags():
+    names = [item.get("name") for item in request_items()]
+    if not all(isinstance(name, str) for name in names):
+        raise BadRequest("Every tag needs a name")
+    resolved = tags.resolve_tags(names)
+    models.db.session.commit()
+    return json_response({"ids": [tag.id for tag in resolved]}, 201)
+
+
+@bp.get("/uploads")
+def list_uploads():
+    return list_response(models.Upload, UPLOAD_FIELDS)
+
+
+@bp.get("/uploads/<int:upload_id>")
+def get_upload(upload_id):
+    return detail_response(models.Upload, UPLOAD_FIELDS, upload_id)
+
+
+# อัปโหลดไฟล์ใหญ่เป็นหลายส่วน:
+#   POST  /uploads/sessions {"filename": ..., "size": ...}  -> {"id", "offset"}
+#   PATCH /uploads/sessions/<id> (header Upload-Offset, body เป็นข้อมูลดิบ) ซ้ำจนครบ
+#   GET   /uploads/sessions/<id> -> offset ปัจจุบัน สำหรับส่งต่อหลังการเชื่อมต่อหลุด
+@bp.post("/uploads/sessions")
+@login_required
+def create_upload_session():
+    data = request.get_json(silent=True) or {}
+    filename = data.get("filename")
+    size = data.get("size")
+    if not isinstance(filename, str) or not filename:
+        raise BadRequest("filename is required")
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        raise BadRequest("size must be a positive integer")
+    token = uploads.create_session(filename, size, current_user.id)
+    response = json_response({"id": token, "offset": 0, "size": size}, 201)
+    response.headers["Location"] = url_for("api.upload_session", token=token)
+    return response
+
+
+@bp.get("/uploads/sessions/<token>")
+@login_required
+def upload_session(token):
+    session = uploads.load_session(token, current_user.id)
+    response = json_response(
+        {"id": token, "offset": session["offset"], "size": session["size"]}
+    )
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+@bp.patch("/uploads/sessions/<token>")
+@login_required
+def append_upload_session(token):
+    offset = request.headers.get("Upload-Offset", type=int)
+    if offset is None:
+        raise BadRequest("Upload-Offset header is required")
+    offset, upload = uploads.append(token, current_user.id, request.stream, offset)
+    if upload is None:
+        return json_response({"id": token, "offset": offset})
+    models.db.session.commit()
+    imaging.pipeline.schedule(upload.sha256)
+    response = json_response(
+        {name: getattr(upload, name) for name in UPLOAD_FIELDS}, 201
+    )
+    response.headers["Location"] = url_for("api.get_upload", upload_id=upload.id)
+    return response
+
+
+# สำรองและย้ายข้อมูล (เฉพาะ admin) ผลลัพธ์ของ export ส่งแบบ stream ทีละส่วน
+def download(chunks, mimetype, filename):
+    response = current_app.response_class(
+        stream_with_context(chunks), mimetype=mimetype
+    )
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+@bp.get("/export/notes")
+@acl.roles_required("admin")
+def export_notes():
+    return download(transfer.export_notes(), "application/x-ndjson", "notes.ndjson")
+
+
+@bp.get("/export/uploads")
+@acl.roles_required("admin")
+def export_uploads():
+    archive_format = request.args.get("format", "tar")
+    if archive_format not in transfer.ARCHIVE_FORMATS:
+        raise BadRequest(f"format must be one of {', '.join(transfer.ARCHIVE_FORMATS)}")
+    mimetype = "application/zip" if archive_format == "zip" else "application/x-tar"
+    return download(
+        transfer.export_uploads(archive_format), mimetype, f"uploads.{archive_format}"
+    )
+
+
+def require_content_type(mimetypes):
+    if request.mimetype not in mimetypes:
+        raise UnsupportedMediaType(f"Content-Type must be one of {', '.join(mimetypes)}")
+
+
+# body เป็น NDJSON เหมือนผลของ /export/notes ชุดที่นำเข้าแล้วจะไม่ถูกย้อนกลับถ้าเจอบรรทัดที่ผิด
+@bp.post("/import/notes")
+@acl.roles_required("admin")
+def import_notes():
+    require_content_type(NDJSON_TYPES)
+    request.max_content_length = current_app.config["IMPORT_MAX_CONTENT_LENGTH"]
+    imported = []
+    try:
+        total = transfer.import_notes(request.stream, progress=imported.append)
+    except transfer.InvalidRecord as error:
+        models.db.session.rollback()
+        raise BadRequest(
+            f"Invalid note record on line {error.line}"
+            f" ({imported[-1] if imported else 0} notes imported before it)"
+        )
+    return json_response({"imported": total})
+
+
+# body เป็นไฟล์ tar/zip จาก /export/uploads (เก็บลงไฟล์ชั่วคราวก่อน เพราะ zip ต้อง seek)
+@bp.post("/import/uploads")
+@acl.roles_required("admin")
+def import_uploads():
+    require_content_type(ARCHIVE_TYPES)
+    request.max_content_length = current_app.config["IMPORT_MAX_CONTENT_LENGTH"]
+    with tempfile.TemporaryFile() as spool:
+        shutil.copyfileobj(request.stream, spool)
+        try:
+            result = transfer.import_uploads(spool)
+        except (ValueError, KeyError, TypeError, tarfile.TarError):
+            models.db.session.rollback()
+            raise BadRequest("Invalid uploads archive")
+    return json_response(result)
+
+
+def _names(operation, key):
+    value = operation.get(key)
+    if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+        raise BadRequest(f"{key} must be a list of strings")
+    return value
+
+
+def _selection(operation):
+    ids = operation.get("ids")
+    if ids is not None and (
+        not isinstance(ids, list)
+        or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)
+    ):
+        raise BadRequest("ids must be a list of integers")
+    tag_names = _names(operation, "tags") if "tags" in operation else None
+    return bulk.select_notes(ids, tag_names)
+
+
+def _run_operation(operation):
+    op = operation.get("op")
+    if op == "delete_notes":
+        return {"deleted": bulk.delete_notes(_selection(operation))}
+    if op == "retag":
+        return bulk.retag(
+            _selection(operation),
+            add=_names(operation, "add") if "add" in operation else (),
+            remove=_names(operation, "remove") if "remove" in operation else (),
+        )
+    if op == "merge_tags":
+        target = operation.get("target")
+        if not isinstance(target, str) or not target.strip():
+            raise BadRequest("target must be a tag name")
+        return bulk.merge_tags(_names(operation, "sources"), target)
+    if op == "rename_tag":
+        name, new_name = operation.get("name"), operation.get("to")
+        if not isinstance(name, str) or not isinstance(new_name, str):
+            raise BadRequest("name and to must be tag names")
+        return bulk.rename_tag(name, new_name)
+    if op == "sweep_tags":
+        return {"deleted": bulk.sweep_tags()}
+    raise BadRequest(f"Unknown operation: {op}")
+
+
+# แก้ข้อมูลทีละมาก (เฉพาะ admin) ทุก operation ใน request ทำใน transaction เดียว
+# ถ้า operation ใดผิดจะยกเลิกทั้งหมด ตัวอย่าง body:
+#   {"operations": [
+#       {"op": "delete_notes", "tags": ["old"]},
+#       {"op": "retag", "ids": [1, 2], "add": ["travel"], "remove": ["trip"]},
+#       {"op": "merge_tags", "sources": ["photo", "photos"], "target": "photo"},
+#       {"op": "rename_tag", "name": "food", "to": "cooking"},
+#       {"op": "sweep_tags"}]}
+# เลือก note ด้วย "ids" และ/หรือ "tags" (note ที่มี tag ใดก็ได้ในรายชื่อ)
+@bp.post("/admin/bulk")
+@acl.roles_required("admin")
+def bulk_operations():
+    data = request.get_json(silent=True)
+    operations = data.get("operations") if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        raise BadRequest("Expected a non-empty list of operations")
+    if len(operations) > MAX_BATCH:
+        raise BadRequest(f"At most {MAX_BATCH} operations per request")
+    results = []
+    try:
+        for operation in operations:
+            if not isinstance(operation, dict):
+                raise BadRequest("Each operation must be a JSON object")
+            results.append(dict(_run_operation(operation), op=operation["op"]))
+    except ValueError as error:
+        models.db.session.rollback()
+        raise BadRequest(str(error))
+    except HTTPException:
+        models.db.session.rollback()
+        raise
+    models.db.session.commit()
+    return json_response({"results": results})
+
+
+# ผลการค้นหาแบบ JSON (หน้า HTML คือ /search) ?q=...&tag=...&limit=...&offset=...
+@bp.get("/search")
+def search_notes():
+    q, tag_names, limit, offset = search.parse_args(request.args)
+    results = search.search_notes(q, tag_names, limit, offset)
+    return json_response(
+        {"query": q, "tags": tag_names, "items": search.as_json(results)}
+    )
@@ -0,0 +1,194 @@
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+
+import click
+from flask import Blueprint, abort, current_app, url_for
+
+import compression
+import httpcache
+import imaging
+
+bp = Blueprint("assets", __name__)
+
+# CSS ที่รวมเป็นไฟล์เดียว: ชื่อ bundle -> ไฟล์ต้นฉบับใน Static/ ตามลำดับ
+# ในไฟล์ CSS ให้อ้างรูปด้วย url("/static/<ไฟล์>") ตอน build จะเปลี่ยนเป็นไฟล์ที่ใส่ hash แล้ว
+BUNDLES = {
+    "site.css": ["style.css", "css/login.css"],
+    "home.css": ["css/home.css"],
+    "note.css": ["css/note.css"],
+    "page.css": ["css/page.css"],
+}
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".ico")
+# รูปที่กว้างกว่านี้จะถูกย่อ (ภาพพื้นหลังเต็มจอ)
+MAX_IMAGE_WIDTH = 1920
+JPEG_QUALITY = 80
+ICON_SIZES = [(16, 16), (32, 32), (48, 48)]
+# บีบอัดไว้ล่วงหน้าเฉพาะไฟล์ที่ลดขนาดได้ (jpeg/png บีบอัดมาแล้ว)
+# และเก็บไฟล์ .gz/.br เฉพาะเมื่อเล็กกว่าเดิมอย่างน้อย 10%
+PRECOMPRESS_EXTENSIONS = (".css", ".js", ".svg", ".ico")
+PRECOMPRESS_MAX_RATIO = 0.9
+STATIC_URL = re.compile(r"""url\((['"]?)/static/([^'")]+)\1\)""")
+
+
+def init_app(app):
+    app.config.setdefault(
+        "ASSET_BUILD_PATH", os.path.join(app.root_path, "build", "assets")
+    )
+    app.register_blueprint(bp)
+    app.cli.add_command(build_command)
+    app.jinja_env.globals["asset_url"] = asset_url
+    app.extensions["assets"] = load_manifest(app.config["ASSET_BUILD_PATH"])
+
+
+def load_manifest(root):
+    try:
+        with open(os.path.join(root, "manifest.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+# URL ของ asset: ไฟล์ที่ build แล้ว (ชื่อมี hash) ถ้ามี ไม่เช่นนั้นใช้ไฟล์ต้นฉบับ
+def asset_url(name):
+    built = current_app.extensions["assets"].get(name)
+    if built:
+        return url_for("assets.asset", filename=built)
+    if name in BUNDLES:
+        return url_for("assets.asset", filename=name)
+    return url_for("static", filename=name)
+
+
+@bp.route("/assets/<path:filename>")
+def asset(filename):
+    root = current_app.config["ASSET_BUILD_PATH"]
+    if filename in current_app.extensions["assets"].values():
+        response = compression.send_precompressed(root, filename)
+        return httpcache.set_immutable(response)
+    # ยังไม่ได้ build: รวมไฟล์ต้นฉบับให้ทุกครั้ง (สำหรับตอนพัฒนา)
+    if filename in BUNDLES:
+        response = current_app.response_class(
+            bundle_source(filename), mimetype="text/css"
+        )
+        response.cache_control.no_cache = True
+        return response
+    abort(404)
+
+
+def bundle_source(name):
+    parts = []
+    for source in BUNDLES[name]:
+        with open(os.path.join(current_app.static_folder, source), encoding="utf-8") as f:
+            parts.append(f.read())
+    return "\n".join(parts)
+
+
+def minify_css(text):
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.S)
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+    text = re.sub(r":\s+", ":", text)
+    return text.replace(";}", "}").strip()
+
+
+def fingerprint(name, data):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+# บีบอัดรูปใหม่ด้วย Pillow ใช้ผลลัพธ์เฉพาะเมื่อเล็กกว่าไฟล์เดิม
+def recompress_image(name, data):
+    if not imaging.HAS_PILLOW:
+        return data
+    from PIL import Image
+
+    out = io.BytesIO()
+    with Image.open(io.BytesIO(data)) as image:
+        ext = os.path.splitext(name)[1].lower()
+        if ext == ".ico":
+            image.save(out, "ICO", sizes=ICON_SIZES)
+        elif ext == ".png":
+            image.save(out, "PNG", optimize=True)
+        else:
+            if image.width > MAX_IMAGE_WIDTH:
+                height = round(image.height * MAX_IMAGE_WIDTH / image.width)
+                image = image.resize((MAX_IMAGE_WIDTH, height), Image.LANCZOS)
+            image.convert("RGB").save(
+                out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True
+            )
+    result = out.getvalue()
+    return result if len(result) < len(data) else data
+
+
+def _write(root, name, data):
+    fd, tmp = tempfile.mkstemp(dir=root, prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, os.path.join(root, name))
+
+
+# สร้าง asset ทั้งหมดลงใน root แล้วเขียน manifest.json (ชื่อเดิม -> ชื่อที่มี hash)
+# ไฟล์จาก build ก่อนหน้ายังอยู่ หน้าเว็บที่ cache ไว้จึงยังโหลดได้
+# คืนค่ารายการ (ชื่อ, ขนาดเดิม, ขนาดใหม่, ขนาด .gz, ขนาด .br)
+def build(static_folder, root):
+    os.makedirs(root, exist_ok=True)
+    manifest = {}
+    outputs = {}
+
+    for entry in sorted(os.scandir(static_folder), key=lambda entry: entry.name):
+        if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+            with open(entry.path, "rb") as f:
+                data = f.read()
+            outputs[entry.name] = (len(data), recompress_image(entry.name, data))
+
+    for name, sources in BUNDLES.items():
+        text = []
+        for source in sources:
+            with open(os.path.join(static_folder, source), encoding="utf-8") as f:
+                text.append(f.read())
+        text = "\n".join(text)
+        original = len(text.encode())
+        # อ้างรูปใน bundle ด้วยชื่อที่มี hash ในโฟลเดอร์เดียวกัน
+        text = STATIC_URL.sub(
+            lambda match: f"url({fingerprint(match[2], outputs[match[2]][1])})"
+            if match[2] in outputs
+            else match[0],
+            text,
+        )
+        outputs[name] = (original, minify_css(text).encode())
+
+    results = []
+    for name, (original, data) in outputs.items():
+        built = manifest[name] = fingerprint(name, data)
+        _write(root, built, data)
+        sizes = {}
+        if name.lower().endswith(PRECOMPRESS_EXTENSIONS):
+            for encoding, suffix in compression.SUFFIXES:
+                if encoding in compression.available_encodings():
+                    compressed = compression.compress(data, encoding)
+                    if len(compressed) <= len(data) * PRECOMPRESS_MAX_RATIO:
+                        _write(root, built + suffix, compressed)
+                        sizes[encoding] = len(compressed)
+        results.append((name, original, len(data), sizes.get("gzip"), sizes.get("br")))
+
+    _write(root, "manifest.json", json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest, results
+
+
+@click.command("build-assets")
+def build_command():
+    """รวม/ย่อ CSS, บีบอัดรูปและ favicon และสร้างไฟล์ .gz/.br สำหรับ /assets"""
+    root = current_app.config["ASSET_BUILD_PATH"]
+    manifest, results = build(current_app.static_folder, root)
+    current_app.extensions["assets"] = manifest
+    for name, original, size, gzipped, brotlied in results:
+        variants = "".join(
+            f" {label} {value}"
+            for label, value in (("gz", gzipped), ("br", brotlied))
+            if value
+        )
+        click.echo(f"{name}: {original} -> {size}{variants}")
+    click.echo(f"{len(manifest)} assets written to {root}")
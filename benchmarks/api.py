@@ -0,0 +1,124 @@
+"""เปรียบเทียบความเร็วการแปลง note เป็น JSON: API (tuple ของคอลัมน์ + orjson)
+กับ SerializerMixin.to_dict บน ORM object
+
+    python -m benchmarks.api --notes 1000 --repeat 20
+
+api.query: อ่าน note และ tag จากฐานข้อมูล (ไม่รวมการแปลง)
+api.serialize: สร้าง dict และ encode เป็น JSON จากแถวที่อ่านมาแล้ว (ตัวเลขเป้าหมาย)
+api.endpoint: GET /api/v1/notes?limit=N ทั้ง request (query + serialize + ETag)
+serializer_mixin: โหลด ORM object แล้ว to_dict + json.dumps (รวม query)
+"""
+import argparse
+import json
+import statistics
+import time
+
+from sqlalchemy.orm import DeclarativeBase, relationship, selectinload
+from sqlalchemy_serializer import SerializerMixin
+
+from benchmarks.common import make_app, report
+
+
+def best_of(repeat, func):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {"best_ms": 1000 * min(samples), "median_ms": 1000 * statistics.median(samples)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--notes", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app()
+    import api
+    import models
+    import transfer
+
+    # map ตารางเดิมกับ class ที่ใช้ SerializerMixin เพื่อเป็นตัวเปรียบเทียบ
+    class Base(DeclarativeBase):
+        pass
+
+    class SerializedTag(Base, SerializerMixin):
+        __table__ = models.Tag.__table__
+
+    class SerializedNote(Base, SerializerMixin):
+        __table__ = models.Note.__table__
+        tags = relationship(
+            SerializedTag, secondary=models.note_tag_m2m, overlaps="tags"
+        )
+
+    with app.app_context():
+        transfer.create_notes(
+            [
+                {
+                    "title": f"note {i}",
+                    "description": "lorem ipsum dolor sit amet " * 8,
+                    "tags": [f"tag{i % 37}", f"tag{i % 11}"],
+                }
+                for i in range(args.notes)
+            ]
+        )
+        models.db.session.commit()
+
+    columns = list(api.NOTE_FIELDS)
+    table = models.Note.__table__
+
+    def api_query():
+        rows = models.db.session.execute(
+            models.db.select(*(table.c[name] for name in columns))
+            .order_by(table.c.id)
+            .limit(args.notes)
+        ).all()
+        return rows, api.note_tags([row[0] for row in rows])
+
+    def api_serialize(rows, by_note):
+        items = [dict(zip(columns, row)) for row in rows]
+        for item in items:
+            item["tags"] = by_note.get(item["id"], [])
+        return api.dumps({"items": items})
+
+    def serializer_page():
+        models.db.session.expunge_all()
+        notes = models.db.session.execute(
+            models.db.select(SerializedNote)
+            .options(selectinload(SerializedNote.tags))
+            .order_by(SerializedNote.id)
+            .limit(args.notes)
+        ).scalars()
+        items = [
+            note.to_dict(only=columns + ["tags.name"]) for note in notes
+        ]
+        return json.dumps({"items": items}).encode()
+
+    client = app.test_client()
+    url = f"/api/v1/notes?limit={args.notes}"
+
+    def endpoint():
+        return client.get(url)
+
+    with app.test_request_context():
+        rows, by_note = api_query()
+        body = api_serialize(rows, by_note)
+        # API ส่งได้ครบ N รายการในหน้าเดียว (ไม่ถูกตัดที่ MAX_PAGE_SIZE)
+        assert len(endpoint().get_json()["items"]) == args.notes
+        results = {
+            "notes": args.notes,
+            "bytes": len(body),
+            "encoder": "orjson" if api.orjson is not None else "json",
+            "api": {
+                "query": best_of(args.repeat, api_query),
+                "serialize": best_of(args.repeat, lambda: api_serialize(rows, by_note)),
+                "endpoint": best_of(args.repeat, endpoint),
+            },
+            "serializer_mixin": best_of(args.repeat, serializer_page),
+        }
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""เปรียบเทียบต้นทุนการโหลดผู้ใช้ต่อ request เมื่อเปิด/ปิด principal cache
+
+    python -m benchmarks.auth --requests 2000
+
+ใช้ GET /logout ซึ่งเป็นหน้าที่ต้องล็อกอิน (login_required) แต่ไม่ query อย่างอื่น
+"""
+import argparse
+import time
+
+from benchmarks.common import make_app, report
+
+
+def measure(app, client, requests):
+    import models
+    import sqlcount
+
+    # ไม่ครอบด้วย app_context เพราะ request จะใช้ context (และ flask.g) ร่วมกัน
+    with app.app_context():
+        engine = models.db.engine
+    with sqlcount.count_queries(engine) as statements:
+        start = time.perf_counter()
+        for _ in range(requests):
+            client.get("/logout")
+        elapsed = time.perf_counter() - start
+    return {
+        "us_per_request": 1e6 * elapsed / requests,
+        "queries_per_request": len(statements) / requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = make_app()
+    import acl
+    import models
+
+    with app.app_context():
+        user = models.User(username="bench", name="bench")
+        user.set_password("bench")
+        user.roles = [models.Role(name="user"), models.Role(name="admin")]
+        models.db.session.add(user)
+        models.db.session.commit()
+
+    client = app.test_client()
+    client.post("/login", data={"username": "bench", "password": "bench"})
+
+    ttl = acl.principals.ttl
+    acl.principals.ttl = 0
+    acl.principals.invalidate()
+    uncached = measure(app, client, args.requests)
+    acl.principals.ttl = ttl
+    cached = measure(app, client, args.requests)
+    report(
+        {
+            "requests": args.requests,
+            "uncached": uncached,
+            "cached": cached,
+            "saved_us_per_request": uncached["us_per_request"] - cached["us_per_request"],
+        }
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""เวลาที่ใช้รวม tag สองตัวที่แต่ละตัวมี note 100k รายการ (bulk.merge_tags: INSERT ... SELECT
+และ DELETE คำสั่งเดียว ให้ ON DELETE CASCADE ลบแถวเดิมใน note_tag)
+
+    python -m benchmarks.bulk --notes 100000 --overlap 0.5 --baseline
+
+--overlap คือสัดส่วนของ note ที่มีทั้งสอง tag
+--baseline วัดแบบเดิม (โหลด Note ทีละตัวแล้วแก้ collection ผ่าน ORM) ก่อนแล้ว rollback
+"""
+import argparse
+
+import sqlalchemy as sa
+from sqlalchemy.orm import selectinload
+
+from benchmarks.common import make_app, report, timed
+
+BATCH_SIZE = 5000
+
+
+def populate(notes, overlap):
+    import models
+    import tags
+
+    db = models.db
+    shared = int(notes * overlap)
+    total = 2 * notes - shared
+    source, target = tags.resolve_tags(["merge-source", "merge-target"])
+    for start in range(0, total, BATCH_SIZE):
+        db.session.execute(
+            models.Note.__table__.insert(),
+            [
+                {"title": f"note {i}", "description": "bulk benchmark"}
+                for i in range(start, min(start + BATCH_SIZE, total))
+            ],
+        )
+    ids = db.session.execute(
+        sa.select(models.Note.id).order_by(models.Note.id)
+    ).scalars().all()
+    link = models.note_tag_m2m
+    # note [0, notes) มี tag ต้นทาง และ note [notes - shared, total) มี tag ปลายทาง
+    for tag, chosen in ((source, ids[:notes]), (target, ids[notes - shared :])):
+        for start in range(0, len(chosen), BATCH_SIZE):
+            db.session.execute(
+                link.insert(),
+                [
+                    {"note_id": note_id, "tag_id": tag.id}
+                    for note_id in chosen[start : start + BATCH_SIZE]
+                ],
+            )
+    tags.rebuild_counts(db.session.connection())
+    db.session.commit()
+    return total
+
+
+# แบบเดิม: โหลดทุก note ของ tag ต้นทางพร้อม tag แล้วแก้ทีละตัว
+def merge_with_orm(source_name, target_name):
+    import models
+
+    db = models.db
+    source = db.session.scalar(sa.select(models.Tag).where(models.Tag.name == source_name))
+    target = db.session.scalar(sa.select(models.Tag).where(models.Tag.name == target_name))
+    notes = db.session.scalars(
+        sa.select(models.Note)
+        .where(models.Note.tags.any(id=source.id))
+        .options(selectinload(models.Note.tags))
+    ).all()
+    for note in notes:
+        note.tags.remove(source)
+        if target not in note.tags:
+            note.tags.append(target)
+    db.session.delete(source)
+    db.session.flush()
+
+
+def merge_with_bulk(source_name, target_name):
+    import bulk
+    import models
+
+    result = bulk.merge_tags([source_name], target_name)
+    models.db.session.commit()
+    return result
+
+
+def check(expected):
+    import models
+
+    db = models.db
+    link = models.note_tag_m2m
+    target = db.session.scalar(
+        sa.select(models.Tag).where(models.Tag.name == "merge-target")
+    )
+    return {
+        "source_gone": db.session.scalar(
+            sa.select(sa.func.count()).where(models.Tag.name == "merge-source")
+        )
+        == 0,
+        "target_links": db.session.scalar(
+            sa.select(sa.func.count()).where(link.c.tag_id == target.id)
+        ),
+        "target_note_count": target.note_count,
+        "expected": expected,
+        "dangling_links": db.session.scalar(
+            sa.select(sa.func.count())
+            .select_from(link)
+            .where(~link.c.tag_id.in_(sa.select(models.Tag.id)))
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--notes", type=int, default=100000, help="จำนวน note ต่อ tag")
+    parser.add_argument("--overlap", type=float, default=0.5)
+    parser.add_argument("--baseline", action="store_true")
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        import models
+
+        populate_seconds, total = timed(populate, args.notes, args.overlap)
+        results = {
+            "notes_per_tag": args.notes,
+            "total_notes": total,
+            "populate_seconds": round(populate_seconds, 2),
+        }
+        if args.baseline:
+            seconds, _ = timed(merge_with_orm, "merge-source", "merge-target")
+            models.db.session.rollback()
+            results["orm_merge_seconds"] = round(seconds, 2)
+        seconds, merged = timed(merge_with_bulk, "merge-source", "merge-target")
+        results["bulk_merge_seconds"] = round(seconds, 3)
+        results["merged"] = merged
+        results["check"] = check(total)
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+# สร้างแอปที่ใช้ฐานข้อมูลและที่เก็บไฟล์ชั่วคราว แยกจากข้อมูลจริงใน instance/
+def make_app(workdir=None, **config):
+    workdir = workdir or tempfile.mkdtemp(prefix="susi-bench-")
+    defaults = {
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(workdir, "bench.db"),
+        "BLOB_STORE_PATH": os.path.join(workdir, "blobs"),
+        "DERIVATIVE_PATH": os.path.join(workdir, "derivatives"),
+        "TEMPLATE_CACHE_PATH": os.path.join(workdir, "jinja-cache"),
+        "WTF_CSRF_ENABLED": False,
+    }
+    defaults.update(config)
+    for key, value in defaults.items():
+        os.environ["FLASK_" + key] = value if isinstance(value, str) else json.dumps(value)
+    import main
+
+    return main.create_app()
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    return {
+        "p50_ms": 1000 * statistics.median(samples),
+        "p95_ms": 1000 * samples[int(0.95 * (len(samples) - 1))],
+        "p99_ms": 1000 * samples[int(0.99 * (len(samples) - 1))],
+    }
+
+
+def report(results):
+    json.dump(results, sys.stdout, indent=2, default=str)
+    sys.stdout.write("\n")
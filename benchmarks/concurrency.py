@@ -0,0 +1,105 @@
+"""load test การอ่าน/เขียนพร้อมกันหลาย process บน SQLite ไฟล์เดียว
+
+    python -m benchmarks.concurrency --readers 4 --writers 2 --seconds 10
+
+รันสองรอบ: ไม่ปรับแต่ง (rollback journal ค่าเริ่มต้น) และเปิด WAL + pragma จาก database.py
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks.common import make_app, report
+
+
+def seed(workdir, tuning, notes):
+    app = make_app(workdir, SQLITE_TUNING=tuning)
+    import transfer
+
+    with app.app_context():
+        transfer.import_notes(
+            (
+                '{"title": "note %d", "description": "load test", "tags": ["common"]}' % i
+                for i in range(notes)
+            ),
+            1000,
+        )
+
+
+def worker(role, workdir, tuning, seconds, results):
+    app = make_app(workdir, SQLITE_TUNING=tuning)
+    import sqlalchemy as sa
+    import models
+
+    client = app.test_client()
+    done = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            if role == "read":
+                response = client.get("/tags/common?limit=50")
+                if response.status_code != 200:
+                    raise RuntimeError(response.status_code)
+            else:
+                with app.app_context():
+                    models.db.session.add(
+                        models.Note(title=f"write {os.getpid()} {done}", description="x")
+                    )
+                    models.db.session.commit()
+            done += 1
+        except (sa.exc.OperationalError, RuntimeError):
+            errors += 1
+    results.put((role, done, errors))
+
+
+def run(tuning, args):
+    workdir = tempfile.mkdtemp(prefix="susi-bench-")
+    process = multiprocessing.Process(target=seed, args=(workdir, tuning, args.notes))
+    process.start()
+    process.join()
+
+    results = multiprocessing.Queue()
+    roles = ["read"] * args.readers + ["write"] * args.writers
+    processes = [
+        multiprocessing.Process(
+            target=worker, args=(role, workdir, tuning, args.seconds, results)
+        )
+        for role in roles
+    ]
+    for process in processes:
+        process.start()
+    totals = {"read": [0, 0], "write": [0, 0]}
+    for _ in processes:
+        role, done, errors = results.get()
+        totals[role][0] += done
+        totals[role][1] += errors
+    for process in processes:
+        process.join()
+    return {
+        "reads_per_s": totals["read"][0] / args.seconds,
+        "writes_per_s": totals["write"][0] / args.seconds,
+        "read_errors": totals["read"][1],
+        "write_errors": totals["write"][1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--notes", type=int, default=5000)
+    args = parser.parse_args()
+    multiprocessing.set_start_method("spawn")
+    report(
+        {
+            "workers": {"readers": args.readers, "writers": args.writers},
+            "default": run(False, args),
+            "tuned": run(True, args),
+        }
+    )
+
+
+if __name__ == "__main__":
+    main()
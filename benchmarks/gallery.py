@@ -0,0 +1,77 @@
+"""เปรียบเทียบน้ำหนักหน้า /images และเวลาโหลดรูป ระหว่างไฟล์ต้นฉบับกับ thumbnail
+
+    python -m benchmarks.gallery --images 24
+"""
+import argparse
+import io
+import random
+import re
+
+from benchmarks.common import make_app, report, timed
+
+
+def make_photo(width, height, seed):
+    from PIL import Image
+
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width // 8, height // 8))
+    image.putdata(
+        [
+            (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+            for _ in range(image.width * image.height)
+        ]
+    )
+    image = image.resize((width, height), Image.BICUBIC)
+    buf = io.BytesIO()
+    image.save(buf, "JPEG", quality=92)
+    return buf.getvalue()
+
+
+def fetch_all(client, urls):
+    return sum(len(client.get(url).data) for url in urls)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=24)
+    parser.add_argument("--width", type=int, default=1600)
+    parser.add_argument("--height", type=int, default=1200)
+    args = parser.parse_args()
+
+    app = make_app()
+    import imaging
+
+    client = app.test_client()
+    upload_times = []
+    for i in range(args.images):
+        data = make_photo(args.width, args.height, i)
+        elapsed, _ = timed(
+            client.post,
+            "/upload",
+            data={"file": (io.BytesIO(data), f"photo-{i}.jpg")},
+            content_type="multipart/form-data",
+        )
+        upload_times.append(elapsed)
+    imaging.pipeline.executor.shutdown(wait=True)
+
+    html = client.get("/images").get_data(as_text=True)
+    ids = sorted(set(re.findall(r"/upload/(\d+)/w", html)), key=int)
+    originals = [f"/upload/{i}" for i in ids]
+    # เบราว์เซอร์ที่ DPR 1 และช่อง 300px จะเลือกขนาด 320w จาก srcset
+    thumbnails = [f"/upload/{i}/w320.webp" for i in ids]
+
+    before_time, before_bytes = timed(fetch_all, client, originals)
+    after_time, after_bytes = timed(fetch_all, client, thumbnails)
+    report(
+        {
+            "images": len(ids),
+            "html_bytes": len(html.encode()),
+            "upload_ms_avg": 1000 * sum(upload_times) / len(upload_times),
+            "before": {"image_bytes": before_bytes, "fetch_ms": 1000 * before_time},
+            "after": {"image_bytes": after_bytes, "fetch_ms": 1000 * after_time},
+        }
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""วัด time-to-first-byte และ peak RSS ของหน้ารายการ note เทียบกับขนาดตาราง
+
+    python -m benchmarks.listing --sizes 1000 10000 100000
+
+แต่ละโหมดรันใน process แยกเพื่อให้ค่า peak RSS ไม่ปนกัน:
+  unbounded  render ทุก note ในหน้าเดียว (พฤติกรรมเดิม)
+  paged      keyset pagination หน้าละ 50
+  stream     keyset pagination หน้าละ 500 แบบ stream_template
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import sqlalchemy as sa
+
+from benchmarks.common import make_app, report
+
+MODES = ("unbounded", "paged", "stream")
+
+
+def seed(size):
+    import models
+
+    db = models.db
+    with db.engine.begin() as conn:
+        conn.execute(models.Tag.__table__.insert(), [{"name": "common"}])
+        for start in range(0, size, 10000):
+            rows = [
+                {"title": f"note {i:08d}", "description": "lorem ipsum " * 20}
+                for i in range(start, min(size, start + 10000))
+            ]
+            conn.execute(models.Note.__table__.insert(), rows)
+        conn.execute(
+            sa.text("INSERT INTO note_tag (note_id, tag_id) SELECT id, 1 FROM notes")
+        )
+
+
+def first_byte(client, url):
+    start = time.perf_counter()
+    response = client.get(url, buffered=False)
+    chunks = iter(response.response)
+    size = len(next(chunks, b""))
+    ttfb = time.perf_counter() - start
+    for chunk in chunks:
+        size += len(chunk)
+    response.close()
+    return ttfb, time.perf_counter() - start, size
+
+
+def run_mode(mode):
+    app = make_app(os.environ["BENCH_WORKDIR"])
+    client = app.test_client()
+    if mode == "unbounded":
+        import flask
+        import models
+        from sqlalchemy.orm import selectinload
+
+        start = time.perf_counter()
+        with app.test_request_context("/tags/common"):
+            notes = models.db.session.execute(
+                models.db.select(models.Note)
+                .options(selectinload(models.Note.tags))
+                .order_by(models.Note.title)
+            ).scalars().all()
+            body = flask.render_template("tag_view.html", tag_name="common", notes=notes)
+        ttfb = total = time.perf_counter() - start
+        size = len(body.encode())
+    elif mode == "paged":
+        ttfb, total, size = first_byte(client, "/tags/common")
+    else:
+        ttfb, total, size = first_byte(client, "/tags/common?stream=1&limit=500")
+    return {
+        "ttfb_ms": 1000 * ttfb,
+        "total_ms": 1000 * total,
+        "bytes": size,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--worker", choices=("seed",) + MODES)
+    parser.add_argument("--size", type=int)
+    args = parser.parse_args()
+
+    if args.worker == "seed":
+        with make_app(os.environ["BENCH_WORKDIR"]).app_context():
+            seed(args.size)
+        return
+    if args.worker:
+        json.dump(run_mode(args.worker), sys.stdout)
+        return
+
+    results = {}
+    for size in args.sizes:
+        workdir = tempfile.mkdtemp(prefix="susi-bench-")
+        env = dict(os.environ, BENCH_WORKDIR=workdir)
+        command = [sys.executable, "-m", "benchmarks.listing", "--size", str(size)]
+        subprocess.run(command + ["--worker", "seed"], env=env, check=True)
+        results[size] = {
+            mode: json.loads(
+                subprocess.run(
+                    command + ["--worker", mode],
+                    env=env,
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+            )
+            for mode in MODES
+        }
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""load driver: ยิง traffic แบบผสมเข้าแอปจริง (HTTP server แบบ threaded ใน process นี้)
+
+    python -m benchmarks.seed --notes 100000 --workdir /tmp/susi-100k
+    python -m benchmarks.load --workdir /tmp/susi-100k --concurrency 8 --seconds 30 \\
+        --output results/100k.json
+
+ถ้า workdir ยังไม่มีข้อมูลจะสร้างด้วย benchmarks.seed (--notes) ก่อน
+รายงาน (JSON): throughput, p50/p95/p99 ต่อสถานการณ์และรวม, จำนวน SQL ต่อ request
+ต่อ endpoint (จาก metrics.py) และ peak RSS ของ process (รวม thread ของ driver)
+"""
+import argparse
+import datetime
+import http.client
+import itertools
+import json
+import logging
+import os
+import random
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.parse
+
+import sqlalchemy as sa
+from werkzeug.serving import make_server
+
+from benchmarks import seed
+from benchmarks.common import make_app, percentiles, report
+
+# สถานการณ์และน้ำหนัก (สัดส่วนของ request)
+SCENARIOS = {
+    "browse": 35,
+    "tag": 20,
+    "images": 10,
+    "get_image": 20,
+    "login": 5,
+    "create_note": 10,
+}
+BROWSE_PATHS = ("/", "/contact", "/description", "/faq", "/note")
+
+
+class Client:
+    def __init__(self, port):
+        self.port = port
+        self.cookie = None
+
+    def request(self, method, path, form=None):
+        headers = {}
+        body = None
+        if form is not None:
+            body = urllib.parse.urlencode(form)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        conn = http.client.HTTPConnection("127.0.0.1", self.port)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        finally:
+            conn.close()
+        cookie = response.getheader("Set-Cookie")
+        if cookie:
+            self.cookie = cookie.split(";")[0]
+        return response.status
+
+
+class Driver:
+    def __init__(self, port, users, tag_names, upload_ids, seed_value):
+        self.port = port
+        self.users = users
+        self.tag_names = tag_names
+        self.tag_weights = seed.zipf_cum_weights(len(tag_names))
+        self.upload_ids = upload_ids
+        self.seed = seed_value
+        self.samples = {name: [] for name in SCENARIOS}
+        self.errors = {name: 0 for name in SCENARIOS}
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+
+    # แต่ละสถานการณ์คืนค่า (method, path, form, status ที่ถูกต้อง)
+    def browse(self, rng):
+        return "GET", rng.choice(BROWSE_PATHS), None, 200
+
+    def tag(self, rng):
+        name = rng.choices(self.tag_names, cum_weights=self.tag_weights)[0]
+        return "GET", "/tags/" + urllib.parse.quote(name), None, 200
+
+    def images(self, rng):
+        return "GET", "/images", None, 200
+
+    def get_image(self, rng):
+        return "GET", f"/upload/{rng.choice(self.upload_ids)}", None, 200
+
+    def login(self, rng):
+        form = {"username": rng.choice(self.users), "password": seed.PASSWORD}
+        return "POST", "/login", form, 302
+
+    def create_note(self, rng):
+        form = {
+            "title": seed.sentence(rng, 2, 6).capitalize(),
+            "description": seed.sentence(rng, 5, 80),
+            "tags": ", ".join(
+                rng.choices(self.tag_names, cum_weights=self.tag_weights, k=2)
+            ),
+        }
+        return "POST", "/create_note", form, 302
+
+    def worker(self, index, deadline, limit):
+        rng = random.Random(self.seed * 1000 + index)
+        member = Client(self.port)
+        username = self.users[index % len(self.users)]
+        member.request("POST", "/login", {"username": username, "password": seed.PASSWORD})
+        names = list(SCENARIOS)
+        weights = list(SCENARIOS.values())
+        while time.perf_counter() < deadline and next(self._counter) < limit:
+            name = rng.choices(names, weights)[0]
+            method, path, form, expected = getattr(self, name)(rng)
+            # การ login ใช้ client ใหม่ (ยังไม่ล็อกอิน) ส่วน create_note ใช้ client ที่ล็อกอินแล้ว
+            client = member if name == "create_note" else Client(self.port)
+            start = time.perf_counter()
+            try:
+                status = client.request(method, path, form)
+            except OSError:
+                status = None
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.samples[name].append(elapsed)
+                if status != expected:
+                    self.errors[name] += 1
+
+    def run(self, concurrency, seconds, limit):
+        deadline = time.perf_counter() + seconds
+        threads = [
+            threading.Thread(target=self.worker, args=(i, deadline, limit))
+            for i in range(concurrency)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def queries_per_request(before, after):
+    result = {}
+    for labels, (total, count) in after.items():
+        old_total, old_count = before.get(labels, (0, 0))
+        if count > old_count:
+            result[labels[0]] = (total - old_total) / (count - old_count)
+    return dict(sorted(result.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workdir", help="ใช้ข้อมูลที่สร้างด้วย benchmarks.seed")
+    parser.add_argument("--notes", type=int, default=1000, help="ถ้าต้องสร้างข้อมูลใหม่")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--requests", type=int, default=10**9, help="จำนวนสูงสุด")
+    parser.add_argument("--rounds", type=int, default=4, help="bcrypt work factor")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="susi-bench-")
+    os.environ["DB_POOL_SIZE"] = str(args.concurrency * 2)
+    app = make_app(workdir, BCRYPT_LOG_ROUNDS=args.rounds)
+    import metrics
+    import models
+
+    with app.app_context():
+        db = models.db
+        if not db.session.scalar(sa.select(sa.func.count()).select_from(models.Note)):
+            seed.generate(args.notes, seed=args.seed, rounds=args.rounds)
+        users = db.session.scalars(db.select(models.User.username)).all()
+        tag_names = db.session.scalars(
+            db.select(models.Tag.name).order_by(models.Tag.id)
+        ).all()
+        upload_ids = db.session.scalars(db.select(models.Upload.id)).all()
+        notes = db.session.scalar(sa.select(sa.func.count()).select_from(models.Note))
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    driver = Driver(server.server_port, users, tag_names, upload_ids, args.seed)
+    before = metrics.request_sql_queries.totals()
+    elapsed = driver.run(args.concurrency, args.seconds, args.requests)
+    after = metrics.request_sql_queries.totals()
+    server.shutdown()
+
+    all_samples = [sample for samples in driver.samples.values() for sample in samples]
+    results = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "database": app.config["SQLALCHEMY_DATABASE_URI"],
+            "notes": notes,
+            "users": len(users),
+            "tags": len(tag_names),
+            "uploads": len(upload_ids),
+            "concurrency": args.concurrency,
+            "seconds": elapsed,
+        },
+        "total": dict(
+            requests=len(all_samples),
+            errors=sum(driver.errors.values()),
+            throughput_rps=len(all_samples) / elapsed,
+            **percentiles(all_samples),
+        ),
+        "scenarios": {
+            name: dict(
+                requests=len(samples),
+                errors=driver.errors[name],
+                throughput_rps=len(samples) / elapsed,
+                **percentiles(samples),
+            )
+            for name, samples in driver.samples.items()
+        },
+        "queries_per_request": queries_per_request(before, after),
+        # Linux รายงาน ru_maxrss เป็น KB
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""วัด latency ของการล็อกอิน (p50/p99) ที่ระดับ concurrency ต่างๆ ผ่าน HTTP server จริง
+
+    python -m benchmarks.login --concurrency 1 4 16 64 --requests 200
+
+เทียบโหมด inline (hash ใน thread ของ request, PASSWORD_WORKERS=0)
+กับโหมด process pool ที่มี back-pressure (ตอบ 503 เมื่อคิวเต็ม)
+"""
+import argparse
+import logging
+import os
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import make_server
+
+from benchmarks.common import make_app, report
+
+
+# ไม่ตาม redirect หลังล็อกอินสำเร็จ (วัดเฉพาะ POST /login)
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+opener = urllib.request.build_opener(NoRedirect)
+
+
+def login(url, username):
+    data = urllib.parse.urlencode({"username": username, "password": "secret"}).encode()
+    start = time.perf_counter()
+    try:
+        with opener.open(url, data=data) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as error:
+        status = error.code
+    return time.perf_counter() - start, status
+
+
+def run_level(url, usernames, concurrency, requests):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        results = list(
+            pool.map(lambda i: login(url, usernames[i % len(usernames)]), range(requests))
+        )
+        elapsed = time.perf_counter() - start
+    latencies = sorted(latency for latency, status in results if status == 302)
+    rejected = sum(1 for _, status in results if status == 503)
+    return {
+        "ok": len(latencies),
+        "rejected_503": rejected,
+        "logins_per_s": len(latencies) / elapsed,
+        "p50_ms": 1000 * statistics.median(latencies) if latencies else None,
+        "p99_ms": 1000 * latencies[int(0.99 * (len(latencies) - 1))] if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+
+    # server แบบ threaded ต้องมี connection ใน pool พอสำหรับทุก thread
+    os.environ["DB_POOL_SIZE"] = str(max(args.concurrency))
+    app = make_app(BCRYPT_LOG_ROUNDS=args.rounds)
+    import models
+    import passwords
+
+    with app.app_context():
+        password_hash = passwords._hash("secret", args.rounds)
+        usernames = [f"user{i}" for i in range(args.users)]
+        for username in usernames:
+            models.db.session.add(
+                models.User(username=username, name=username, _password_hash=password_hash)
+            )
+        models.db.session.commit()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/login"
+
+    results = {"rounds": args.rounds}
+    workers = passwords.hasher.workers
+    for mode, pool_workers in (("inline", 0), ("pool", workers)):
+        passwords.hasher.workers = pool_workers
+        results[mode] = {
+            level: run_level(url, usernames, level, args.requests)
+            for level in args.concurrency
+        }
+    server.shutdown()
+    passwords.hasher.shutdown()
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""เปรียบเทียบ requests/sec ของหน้าที่ cache ได้ เมื่อปิด cache และเมื่อใช้ backend แบบ memory / file
+
+    python -m benchmarks.pagecache --requests 2000 --notes 50
+"""
+import argparse
+import tempfile
+import time
+
+from benchmarks.common import make_app, report
+
+PATHS = ["/", "/contact", "/description", "/faq"]
+
+
+def measure(client, path, requests):
+    client.get(path)  # เติม cache ก่อนวัด
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get(path)
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--notes", type=int, default=50)
+    args = parser.parse_args()
+
+    app = make_app()
+    import models
+    import pagecache
+    import transfer
+
+    with app.app_context():
+        user = models.User(username="bench", name="bench")
+        user.set_password("bench")
+        user.roles = [models.Role(name="admin")]
+        models.db.session.add(user)
+        transfer.create_notes(
+            [
+                {
+                    "title": f"note {i}",
+                    "description": "lorem ipsum " * 20,
+                    "tags": ["a", "b"],
+                }
+                for i in range(args.notes)
+            ]
+        )
+        models.db.session.commit()
+
+    anonymous = app.test_client()
+    member = app.test_client()
+    member.post("/login", data={"username": "bench", "password": "bench"})
+
+    backends = {
+        "off": None,
+        "memory": pagecache.MemoryBackend(),
+        "file": pagecache.FileBackend(tempfile.mkdtemp(prefix="susi-bench-")),
+    }
+    results = {"requests": args.requests}
+    for name, backend in backends.items():
+        pagecache.cache.backend = backend
+        rates = {path: measure(anonymous, path, args.requests) for path in PATHS}
+        # หน้า /note ของผู้ที่ล็อกอิน: cache เฉพาะการ์ดของแต่ละ note (ยัง query ทุกครั้ง)
+        rates["/note (fragments)"] = measure(member, "/note", args.requests // 10)
+        results[name] = {path: round(rate) for path, rate in rates.items()}
+    results["stats"] = pagecache.cache.stats()
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""น้ำหนักของหน้า / และ /login (HTML + CSS/รูป/favicon ของเว็บเอง ไม่รวม CDN)
+ก่อน build asset และปิดการบีบอัด เทียบกับหลัง build-assets และบีบอัดตาม Accept-Encoding
+
+    python -m benchmarks.pageweight
+"""
+import argparse
+import re
+import tempfile
+from urllib.parse import urljoin, urlsplit
+
+from benchmarks.common import make_app, report
+
+PAGES = ["/", "/login"]
+ACCEPT_ENCODING = "gzip, deflate, br"
+# ไฟล์ที่เบราว์เซอร์โหลดตาม HTML และ CSS (ไม่นับลิงก์ <a>)
+RESOURCE = re.compile(
+    r"""<link[^>]+href="([^"]+)"|<(?:img|script)[^>]+src="([^"]+)"|url\(['"]?([^'")]+)"""
+)
+
+
+def resources(base, text):
+    for match in RESOURCE.finditer(text):
+        url = urljoin(base, next(group for group in match.groups() if group))
+        if not urlsplit(url).netloc:
+            yield url
+
+
+# ขนาดที่ส่งจริง (หลังบีบอัด) ของหน้าและทุกไฟล์ที่หน้านั้นอ้างถึง
+def page_weight(client, path):
+    headers = {"Accept-Encoding": ACCEPT_ENCODING}
+    seen = {}
+    queue = [path]
+    while queue:
+        url = queue.pop(0)
+        if url in seen:
+            continue
+        response = client.get(url, headers=headers)
+        seen[url] = len(response.get_data())
+        if response.mimetype in ("text/html", "text/css"):
+            # test client ไม่ถอดการบีบอัดให้ จึงขอเนื้อหาเดิมอีกครั้งเพื่อหาไฟล์ที่อ้างถึง
+            text = client.get(url).get_data(as_text=True)
+            queue.extend(resources(url, text))
+    return {
+        "html_bytes": seen[path],
+        "asset_bytes": sum(size for url, size in seen.items() if url != path),
+        "total_bytes": sum(seen.values()),
+        "requests": len(seen),
+        "files": seen,
+    }
+
+
+def measure(app):
+    client = app.test_client()
+    return {path: page_weight(client, path) for path in PAGES}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", action="store_true", help="แสดงขนาดของแต่ละไฟล์")
+    args = parser.parse_args()
+
+    import assets
+
+    build_path = tempfile.mkdtemp(prefix="susi-assets-")
+    before = measure(
+        make_app(COMPRESS_ENABLED=False, ASSET_BUILD_PATH=tempfile.mkdtemp())
+    )
+    app = make_app(COMPRESS_ENABLED=True, ASSET_BUILD_PATH=build_path)
+    with app.app_context():
+        app.extensions["assets"], _ = assets.build(app.static_folder, build_path)
+    after = measure(app)
+
+    results = {}
+    for path in PAGES:
+        if not args.files:
+            before[path].pop("files")
+            after[path].pop("files")
+        results[path] = {
+            "before": before[path],
+            "after": after[path],
+            "reduction": round(
+                1 - after[path]["total_bytes"] / before[path]["total_bytes"], 3
+            ),
+        }
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""วัดความเร็วการค้นหา full-text ที่จำนวน note ต่างๆ
+
+    python -m benchmarks.search --notes 100000 --queries 200
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks.common import make_app, percentiles, report
+
+
+def make_vocabulary(rng, size):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)]
+
+
+def note_lines(rng, vocabulary, count, tag_count):
+    for i in range(count):
+        yield json.dumps(
+            {
+                "title": " ".join(rng.choices(vocabulary, k=4)),
+                "description": " ".join(rng.choices(vocabulary, k=60)),
+                "tags": [f"tag{rng.randrange(tag_count)}" for _ in range(2)],
+            }
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--notes", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng, 20000)
+    app = make_app()
+    import search
+    import transfer
+
+    with app.app_context():
+        start = time.perf_counter()
+        transfer.import_notes(note_lines(rng, vocabulary, args.notes, 50), 5000)
+        import_seconds = time.perf_counter() - start
+
+        cases = {
+            "one_term": lambda: (rng.choice(vocabulary), ()),
+            "two_terms": lambda: (" ".join(rng.sample(vocabulary, 2)), ()),
+            "prefix": lambda: (rng.choice(vocabulary)[:3], ()),
+            "with_tag": lambda: (rng.choice(vocabulary), [f"tag{rng.randrange(50)}"]),
+        }
+        results = {"notes": args.notes, "import_s": import_seconds}
+        for name, make_query in cases.items():
+            samples = []
+            for _ in range(args.queries):
+                text, tag_names = make_query()
+                start = time.perf_counter()
+                search.search_notes(text, tag_names)
+                samples.append(time.perf_counter() - start)
+            results[name] = percentiles(samples)
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""สร้างข้อมูลสังเคราะห์ (users, roles, notes, tags, note_tag, uploads) ตามขนาดที่กำหนด
+
+    python -m benchmarks.seed --notes 100000 --workdir /tmp/susi-100k
+
+ใช้ seed เดียวกันจะได้ข้อมูลเหมือนเดิมทุกครั้ง ความนิยมของ tag เป็นแบบ Zipf
+(tag ไม่กี่ตัวถูกใช้บ่อยมาก) และรูปมีหลายขนาดเหมือนรูปถ่ายจริง
+ผู้ใช้ทุกคนมีรหัสผ่าน "secret" และ user0 เป็น admin
+"""
+import argparse
+import itertools
+import random
+import struct
+import sys
+import time
+import zlib
+
+import sqlalchemy as sa
+
+from benchmarks.common import make_app, report
+
+PASSWORD = "secret"
+BATCH_SIZE = 5000
+# ความกว้าง x ความสูงของรูปที่สุ่มใช้ (จากเล็กแบบ avatar ถึง full HD)
+IMAGE_SIZES = ((250, 230), (640, 480), (800, 600), (1024, 768), (1280, 720), (1920, 1080))
+# จำนวน tag ต่อ note: 0-5 โดยส่วนใหญ่มี 1-3
+TAGS_PER_NOTE = (0, 1, 2, 3, 4, 5)
+TAGS_PER_NOTE_WEIGHTS = (5, 25, 30, 20, 12, 8)
+WORDS = (
+    "today morning evening family friend school work travel food coffee rain "
+    "sun beach city book movie music walk run garden market train holiday "
+    "birthday dinner lunch weekend project idea dream memory photo trip"
+).split()
+
+
+def default_counts(notes):
+    return {
+        "users": max(10, notes // 100),
+        "tags": max(20, int(notes**0.5) * 2),
+        "uploads": max(10, notes // 20),
+    }
+
+
+def zipf_cum_weights(count, exponent=1.1):
+    return list(itertools.accumulate(1 / rank**exponent for rank in range(1, count + 1)))
+
+
+def tag_names(count):
+    return [f"{WORDS[i % len(WORDS)]}{i // len(WORDS) or ''}" for i in range(count)]
+
+
+def sentence(rng, low, high):
+    return " ".join(rng.choices(WORDS, k=rng.randint(low, high)))
+
+
+# PNG สังเคราะห์ที่บีบอัดได้ประมาณรูปถ่ายจริง (สุ่มค่าสีจาก 8 ระดับ)
+def make_png(rng, width, height):
+    levels = bytes(range(0, 256, 32)) * 32
+    row_size = width * 3
+    raw = b"".join(
+        b"\x00" + rng.randbytes(row_size).translate(levels) for _ in range(height)
+    )
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw, 1))
+        + chunk(b"IEND", b"")
+    )
+
+
+def seed_users(rng, count, password_hash):
+    import models
+
+    db = models.db
+    user_role = models.Role(name="user")
+    admin_role = models.Role(name="admin")
+    db.session.add_all([user_role, admin_role])
+    db.session.flush()
+    for start in range(0, count, BATCH_SIZE):
+        ids = db.session.execute(
+            sa.insert(models.User).returning(models.User.id, sort_by_parameter_order=True),
+            [
+                {
+                    "username": f"user{i}",
+                    "name": f"User {i}",
+                    "_password_hash": password_hash,
+                }
+                for i in range(start, min(count, start + BATCH_SIZE))
+            ],
+        ).scalars().all()
+        links = [{"user_id": user_id, "role_id": user_role.id} for user_id in ids]
+        # ทุกๆ 50 คนมี admin หนึ่งคน (รวม user0)
+        links += [
+            {"user_id": user_id, "role_id": admin_role.id}
+            for i, user_id in enumerate(ids, start)
+            if i % 50 == 0
+        ]
+        db.session.execute(models.user_roles.insert(), links)
+    db.session.commit()
+
+
+def seed_notes(rng, count, tag_count, progress):
+    import models
+    import transfer
+
+    names = tag_names(tag_count)
+    cum_weights = zipf_cum_weights(tag_count)
+    for start in range(0, count, BATCH_SIZE):
+        records = []
+        for _ in range(min(BATCH_SIZE, count - start)):
+            k = rng.choices(TAGS_PER_NOTE, TAGS_PER_NOTE_WEIGHTS)[0]
+            records.append(
+                {
+                    "title": sentence(rng, 2, 6).capitalize(),
+                    "description": sentence(rng, 5, 80),
+                    "tags": rng.choices(names, cum_weights=cum_weights, k=k),
+                }
+            )
+        transfer.create_notes(records)
+        models.db.session.commit()
+        progress(start + len(records))
+
+
+def seed_uploads(rng, count, pool_size):
+    import blobstore
+    import models
+
+    pool = []
+    for _ in range(min(count, pool_size)):
+        width, height = rng.choice(IMAGE_SIZES)
+        blob = blobstore.store.save_bytes(make_png(rng, width, height))
+        pool.append((blob, width, height))
+    for start in range(0, count, BATCH_SIZE):
+        rows = []
+        for i in range(start, min(count, start + BATCH_SIZE)):
+            blob, width, height = rng.choice(pool)
+            rows.append(
+                {
+                    "filename": f"IMG_{i:06d}.png",
+                    "sha256": blob.digest,
+                    "size": blob.size,
+                    "mime_type": "image/png",
+                    "width": width,
+                    "height": height,
+                }
+            )
+        models.db.session.execute(sa.insert(models.Upload), rows)
+    models.db.session.commit()
+
+
+# เติมข้อมูลลงฐานข้อมูลของแอป (ต้องเรียกใน app context และฐานข้อมูลยังว่าง)
+def generate(
+    notes,
+    users=None,
+    tags=None,
+    uploads=None,
+    image_pool=20,
+    seed=0,
+    rounds=4,
+    progress=lambda done: None,
+):
+    import passwords
+
+    counts = default_counts(notes)
+    counts.update(
+        {
+            name: value
+            for name, value in (("users", users), ("tags", tags), ("uploads", uploads))
+            if value is not None
+        }
+    )
+    rng = random.Random(seed)
+    timings = {}
+    start = time.perf_counter()
+    seed_users(rng, counts["users"], passwords._hash(PASSWORD, rounds))
+    timings["users_s"] = time.perf_counter() - start
+    start = time.perf_counter()
+    seed_notes(rng, notes, counts["tags"], progress)
+    timings["notes_s"] = time.perf_counter() - start
+    start = time.perf_counter()
+    seed_uploads(rng, counts["uploads"], image_pool)
+    timings["uploads_s"] = time.perf_counter() - start
+    return dict(counts, notes=notes, **timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--notes", type=int, default=1000)
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--tags", type=int)
+    parser.add_argument("--uploads", type=int)
+    parser.add_argument("--image-pool", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rounds", type=int, default=4, help="bcrypt work factor")
+    parser.add_argument("--workdir")
+    args = parser.parse_args()
+
+    app = make_app(args.workdir, BCRYPT_LOG_ROUNDS=args.rounds)
+    with app.app_context():
+        result = generate(
+            args.notes,
+            args.users,
+            args.tags,
+            args.uploads,
+            args.image_pool,
+            args.seed,
+            args.rounds,
+            progress=lambda done: print(f"{done} notes", file=sys.stderr),
+        )
+    result["database"] = app.config["SQLALCHEMY_DATABASE_URI"]
+    report(result)
+
+
+if __name__ == "__main__":
+    main()
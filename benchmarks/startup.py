@@ -0,0 +1,89 @@
+"""วัดเวลาเริ่มระบบใน process ใหม่: import, create_app และ request แรก
+cold = ฐานข้อมูลใหม่และยังไม่มี template cache, warm = รันซ้ำใน workdir เดิม
+
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import report
+
+# เป้าหมายของ warm boot ในส่วนของแอปเอง (import โมดูลของแอป + create_app + request แรก)
+# ไม่รวมเวลาเริ่ม interpreter และ import Flask/SQLAlchemy ซึ่งแยกรายงานเป็น framework_ms
+TARGET_MS = 200
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import flask, flask_login, flask_sqlalchemy, flask_wtf, sqlalchemy.orm
+framework = time.perf_counter()
+import main
+imported = time.perf_counter()
+from benchmarks.common import make_app
+app = make_app(sys.argv[1])
+created = time.perf_counter()
+client = app.test_client()
+for path in ("/", "/login"):
+    assert client.get(path).status_code == 200, path
+done = time.perf_counter()
+print(json.dumps({
+    "framework_ms": 1000 * (framework - start),
+    "import_ms": 1000 * (imported - framework),
+    "create_app_ms": 1000 * (created - imported),
+    "first_request_ms": 1000 * (done - created),
+    "boot_ms": 1000 * (done - framework),
+}))
+"""
+
+
+def run(workdir):
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, workdir],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ).stdout
+    result = json.loads(output.splitlines()[-1])
+    result["process_ms"] = 1000 * (time.perf_counter() - start)
+    return result
+
+
+def summarize(samples):
+    return {
+        name: round(statistics.median(sample[name] for sample in samples), 1)
+        for name in samples[0]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    cold, warm = [], []
+    for _ in range(args.runs):
+        workdir = tempfile.mkdtemp(prefix="susi-bench-")
+        cold.append(run(workdir))
+        warm.append(run(workdir))
+    warm = summarize(warm)
+    report(
+        {
+            "runs": args.runs,
+            "cold": summarize(cold),
+            "warm": warm,
+            "target_ms": TARGET_MS,
+            "within_target": warm["boot_ms"] <= TARGET_MS,
+        }
+    )
+
+
+if __name__ == "__main__":
+    main()
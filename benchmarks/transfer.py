@@ -0,0 +1,116 @@
+"""export แล้ว import ข้อมูลทั้งหมด (notes + tags + uploads) ไปยังฐานข้อมูลใหม่
+และตรวจว่าหน่วยความจำสูงสุดของแต่ละขั้นไม่เกินเพดานที่กำหนด
+
+    python -m benchmarks.transfer --notes 100000 --uploads 5000 --image-pool 200
+
+ใช้ tracemalloc วัด peak ของหน่วยความจำที่ Python จองในแต่ละขั้น
+ถ้าใช้หน่วยความจำคงที่ peak จะไม่โตตามจำนวน note หรือขนาดรวมของรูป
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import make_app, report
+from benchmarks.seed import generate
+
+MB = 1024 * 1024
+
+
+def measured(func, *args, **kwargs):
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {"seconds": round(elapsed, 2), "peak_mb": round(peak / MB, 1)}, result
+
+
+def write_all(path, chunks, mode):
+    with open(path, mode) as f:
+        for chunk in chunks:
+            f.write(chunk)
+    return os.path.getsize(path)
+
+
+def summary():
+    import models
+    import sqlalchemy as sa
+
+    db = models.db
+    return {
+        "notes": db.session.scalar(sa.select(sa.func.count()).select_from(models.Note)),
+        "tags": db.session.scalar(sa.select(sa.func.count()).select_from(models.Tag)),
+        "links": db.session.scalar(
+            sa.select(sa.func.count()).select_from(models.note_tag_m2m)
+        ),
+        "uploads": db.session.scalar(
+            sa.select(sa.func.count()).select_from(models.Upload)
+        ),
+        "tag_counts": db.session.scalar(sa.select(sa.func.sum(models.Tag.note_count))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--notes", type=int, default=20000)
+    parser.add_argument("--uploads", type=int, default=1000)
+    parser.add_argument("--image-pool", type=int, default=50)
+    parser.add_argument("--format", choices=("tar", "zip"), default="tar")
+    parser.add_argument("--max-memory-mb", type=float, default=64)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="susi-bench-")
+    notes_path = os.path.join(workdir, "notes.ndjson")
+    archive_path = os.path.join(workdir, f"uploads.{args.format}")
+    phases = {}
+
+    source = make_app(os.path.join(workdir, "source"))
+    import transfer
+
+    with source.app_context():
+        generate(
+            args.notes,
+            uploads=args.uploads,
+            image_pool=args.image_pool,
+            progress=lambda done: print(f"{done} notes", file=sys.stderr),
+        )
+        before = summary()
+        phases["export_notes"], size = measured(
+            write_all, notes_path, transfer.export_notes(), "w"
+        )
+        phases["export_notes"]["bytes"] = size
+        phases["export_uploads"], size = measured(
+            write_all, archive_path, transfer.export_uploads(args.format), "wb"
+        )
+        phases["export_uploads"]["bytes"] = size
+
+    target = make_app(os.path.join(workdir, "target"))
+    with target.app_context():
+        with open(notes_path, encoding="utf-8") as f:
+            phases["import_notes"], _ = measured(transfer.import_notes, f)
+        with open(archive_path, "rb") as f:
+            phases["import_uploads"], _ = measured(transfer.import_uploads, f)
+        after = summary()
+
+    peak = max(phase["peak_mb"] for phase in phases.values())
+    report(
+        {
+            "phases": phases,
+            "source": before,
+            "target": after,
+            "round_trip_ok": before == after,
+            "peak_mb": peak,
+            "max_memory_mb": args.max_memory_mb,
+            "within_ceiling": peak <= args.max_memory_mb,
+        }
+    )
+
+
+if __name__ == "__main__":
+    main()
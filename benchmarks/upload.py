@@ -0,0 +1,170 @@
+"""ตรวจว่าหน่วยความจำสูงสุดระหว่างอัปโหลดไม่โตตามขนาดไฟล์ (ผ่าน HTTP server จริง)
+
+    python -m benchmarks.upload --sizes 1 500
+
+วัดทั้งฟอร์ม /upload (multipart) และ upload session ของ API (PATCH ทีละส่วน)
+ใช้ tracemalloc วัด peak ของหน่วยความจำที่ Python จองระหว่างแต่ละการอัปโหลด
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import tracemalloc
+import urllib.parse
+
+from werkzeug.serving import make_server
+
+from benchmarks.common import make_app, report
+
+MB = 1024 * 1024
+PNG_HEADER = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR" + struct.pack(">II", 1, 1)
+BLOCK = os.urandom(MB)
+
+
+# สร้างข้อมูลไฟล์ทีละ block (ไม่สร้างทั้งไฟล์ในหน่วยความจำ)
+def file_blocks(start, end):
+    position = start
+    while position < end:
+        if position < len(PNG_HEADER):
+            piece = PNG_HEADER[position:] + BLOCK[: MB - len(PNG_HEADER)]
+        else:
+            piece = BLOCK
+        piece = piece[: end - position]
+        yield piece
+        position += len(piece)
+
+
+def request(port, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request(method, path, body=body, headers=headers or {})
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    return response, data
+
+
+def login(port):
+    body = urllib.parse.urlencode({"username": "bench", "password": "bench"})
+    response, _ = request(
+        port,
+        "POST",
+        "/login",
+        body,
+        {"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    return response.getheader("Set-Cookie").split(";")[0]
+
+
+def upload_form(port, cookie, size):
+    boundary = "benchboundary"
+    head = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="bench.png"\r\n'
+        "Content-Type: image/png\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+
+    def body():
+        yield head
+        yield from file_blocks(0, size)
+        yield tail
+
+    response, _ = request(
+        port,
+        "POST",
+        "/upload",
+        body(),
+        {
+            "Cookie": cookie,
+            "Content-Type": f"multipart/form-data; boundary={boundary}",
+            "Content-Length": str(len(head) + size + len(tail)),
+        },
+    )
+    return response.status
+
+
+def upload_session(port, cookie, size, chunk_size):
+    response, data = request(
+        port,
+        "POST",
+        "/api/v1/uploads/sessions",
+        json.dumps({"filename": "bench.png", "size": size}),
+        {"Cookie": cookie, "Content-Type": "application/json"},
+    )
+    location = response.getheader("Location")
+    offset = 0
+    while offset < size:
+        end = min(size, offset + chunk_size)
+        response, data = request(
+            port,
+            "PATCH",
+            location,
+            file_blocks(offset, end),
+            {
+                "Cookie": cookie,
+                "Upload-Offset": str(offset),
+                "Content-Length": str(end - offset),
+            },
+        )
+        offset = end
+    return response.status
+
+
+def measure(func, *args):
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    status = func(*args)
+    elapsed = time.perf_counter() - start
+    return {
+        "status": status,
+        "seconds": round(elapsed, 2),
+        "peak_mb": round((tracemalloc.get_traced_memory()[1] - before) / MB, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100], help="MB")
+    parser.add_argument("--chunk", type=int, default=32, help="MB ต่อ PATCH")
+    args = parser.parse_args()
+
+    largest = max(args.sizes) * MB
+    app = make_app(
+        MAX_CONTENT_LENGTH=max(largest, args.chunk * MB) + MB,
+        UPLOAD_MAX_FILE_SIZE=largest,
+        BCRYPT_LOG_ROUNDS=4,
+    )
+    import models
+
+    with app.app_context():
+        user = models.User(username="bench", name="bench")
+        user.set_password("bench")
+        models.db.session.add(user)
+        models.db.session.commit()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+    cookie = login(port)
+
+    tracemalloc.start()
+    results = {}
+    for size_mb in args.sizes:
+        size = size_mb * MB
+        results[f"{size_mb}MB"] = {
+            "form": measure(upload_form, port, cookie, size),
+            "session": measure(upload_session, port, cookie, size, args.chunk * MB),
+        }
+    tracemalloc.stop()
+    server.shutdown()
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
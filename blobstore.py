@@ -0,0 +1,138 @@
+import hashlib
+import io
+import os
+import re
+import struct
+import tempfile
+from collections import namedtuple
+
+# ขนาด chunk ที่ใช้อ่าน/เขียนไฟล์ (ไม่โหลดทั้งไฟล์เข้าหน่วยความจำ)
+CHUNK_SIZE = 64 * 1024
+# ชื่อไฟล์ใน store คือ sha256 แบบ hex ตัวพิมพ์เล็กเท่านั้น
+DIGEST = re.compile(r"[0-9a-f]{64}")
+
+Blob = namedtuple("Blob", ["digest", "size"])
+ImageInfo = namedtuple("ImageInfo", ["mime_type", "width", "height"])
+
+
+# เนื้อหาที่บันทึกไม่ตรงกับ digest ที่คาดไว้ (ไฟล์ไม่ถูกเก็บ)
+class DigestMismatch(ValueError):
+    pass
+
+
+# ที่เก็บไฟล์แบบ content-addressed: ไฟล์ถูกเก็บตาม sha256 ของเนื้อหา
+# ไฟล์ที่เหมือนกันจะถูกเก็บเพียงครั้งเดียว
+class BlobStore:
+    def __init__(self, root=None):
+        self.root = root
+
+    def init_app(self, app):
+        self.root = app.config.setdefault(
+            "BLOB_STORE_PATH", os.path.join(app.instance_path, "blobs")
+        )
+        os.makedirs(os.path.join(self.root, "tmp"), exist_ok=True)
+
+    # digest ต้องเป็น sha256 เสมอ (กันค่าอย่าง "/etc/passwd" หรือ "../" ที่มาจากข้อมูลภายนอก)
+    def path(self, digest):
+        if not isinstance(digest, str) or not DIGEST.fullmatch(digest):
+            raise ValueError(f"Invalid blob digest: {digest!r}")
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        if not isinstance(digest, str) or not DIGEST.fullmatch(digest):
+            return False
+        return os.path.isfile(self.path(digest))
+
+    def open(self, digest):
+        return open(self.path(digest), "rb")
+
+    # เขียน stream ลงไฟล์ชั่วคราวทีละ chunk พร้อมคำนวณ hash แล้วย้ายเข้าที่
+    # ถ้าระบุ expected และ hash ไม่ตรง จะลบไฟล์ชั่วคราวแล้ว raise DigestMismatch
+    def save(self, stream, expected=None):
+        sha = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"))
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    sha.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+            digest = sha.hexdigest()
+            if expected is not None and digest != expected:
+                raise DigestMismatch(f"Expected {expected!r}, got {digest!r}")
+            self._move_into_place(tmp_path, digest)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return Blob(digest, size)
+
+    # รับไฟล์ที่เขียนเสร็จแล้ว (ต้องอยู่บน filesystem เดียวกัน) เข้า store โดยไม่คัดลอกซ้ำ
+    def adopt(self, path):
+        sha = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                sha.update(chunk)
+                size += len(chunk)
+        digest = sha.hexdigest()
+        self._move_into_place(path, digest)
+        return Blob(digest, size)
+
+    def _move_into_place(self, path, digest):
+        target = self.path(digest)
+        if os.path.exists(target):
+            os.unlink(path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(path, target)
+
+    def save_bytes(self, data):
+        return self.save(io.BytesIO(data))
+
+    def delete(self, digest):
+        try:
+            os.unlink(self.path(digest))
+        except FileNotFoundError:
+            pass
+
+    def probe(self, digest):
+        with self.open(digest) as f:
+            return probe_image(f)
+
+
+# อ่านชนิดและขนาดของรูปภาพ (PNG/JPEG) จาก header โดยไม่ต้องใช้ไลบรารีภายนอก
+def probe_image(f):
+    head = f.read(26)
+    if head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+        width, height = struct.unpack(">II", head[16:24])
+        return ImageInfo("image/png", width, height)
+    if head[:3] == b"\xff\xd8\xff":
+        f.seek(2)
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                break
+            if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+                continue
+            length_bytes = f.read(2)
+            if len(length_bytes) < 2:
+                break
+            (length,) = struct.unpack(">H", length_bytes)
+            # SOF0..SOF15 ยกเว้น DHT, JPG, DAC
+            if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+                sof = f.read(5)
+                if len(sof) < 5:
+                    break
+                height, width = struct.unpack(">HH", sof[1:5])
+                return ImageInfo("image/jpeg", width, height)
+            f.seek(length - 2, os.SEEK_CUR)
+        return ImageInfo("image/jpeg", None, None)
+    return ImageInfo("application/octet-stream", None, None)
+
+
+store = BlobStore()
@@ -0,0 +1,160 @@
+from collections import Counter
+
+import click
+import sqlalchemy as sa
+
+import models
+import tags
+
+# จำนวน id สูงสุดที่ระบุได้ในหนึ่งการเลือก (ไม่ให้เกินจำนวน parameter ที่ SQLite รับได้)
+MAX_IDS = 10000
+
+# แก้ note/tag ทีละหลายแถวด้วย DELETE/UPDATE/INSERT ... SELECT คำสั่งเดียว ไม่โหลด ORM object
+# ทุกฟังก์ชันทำงานใน transaction ของ db.session ผู้เรียกต้อง commit เอง
+# แถวใน note_tag ของ note/tag ที่ถูกลบหายไปเองด้วย ON DELETE CASCADE
+# คำสั่งทั้งหมดผ่าน session.execute จึงถูกจับโดย do_orm_execute ของ pagecache และ tags
+# (ล้าง cache หน้าเว็บและ index ของ tag เมื่อ commit) ส่วน tags.note_count ปรับเองในนี้
+
+
+def init_app(app):
+    app.cli.add_command(sweep_command)
+
+
+def _execute(statement, params=None):
+    return models.db.session.execute(statement, params)
+
+
+def _tag_ids(names):
+    names = tags.normalize(names)
+    if not names:
+        return []
+    table = models.Tag.__table__
+    return list(
+        _execute(sa.select(table.c.id).where(table.c.name.in_(names))).scalars()
+    )
+
+
+# note ที่เลือก: ตาม id หรือ note ที่มี tag ใดก็ได้ในรายชื่อ (ใช้เป็น subquery ของคำสั่งอื่น)
+def select_notes(ids=None, tag_names=None):
+    if ids is None and tag_names is None:
+        raise ValueError("Select notes by ids or by tags")
+    if ids is not None and len(ids) > MAX_IDS:
+        raise ValueError(f"At most {MAX_IDS} ids per selection")
+    notes = models.Note.__table__
+    link = models.note_tag_m2m
+    criteria = []
+    if ids is not None:
+        criteria.append(notes.c.id.in_(ids))
+    if tag_names is not None:
+        criteria.append(
+            notes.c.id.in_(
+                sa.select(link.c.note_id).where(link.c.tag_id.in_(_tag_ids(tag_names)))
+            )
+        )
+    return sa.select(notes.c.id).where(*criteria)
+
+
+def delete_notes(selection):
+    link = models.note_tag_m2m
+    # ลดจำนวนของทุก tag ที่ note เหล่านี้ใช้ ก่อนที่ cascade จะลบแถวใน note_tag
+    deltas = {
+        tag_id: -count
+        for tag_id, count in _execute(
+            sa.select(link.c.tag_id, sa.func.count())
+            .where(link.c.note_id.in_(selection))
+            .group_by(link.c.tag_id)
+        )
+    }
+    notes = models.Note.__table__
+    result = _execute(notes.delete().where(notes.c.id.in_(selection)))
+    tags.adjust_counts(models.db.session.connection(), deltas)
+    return result.rowcount
+
+
+def delete_tags(tag_ids):
+    table = models.Tag.__table__
+    return _execute(table.delete().where(table.c.id.in_(tag_ids))).rowcount
+
+
+# ใส่ tag ให้ note ที่เลือกซึ่งยังไม่มี tag นั้น และเอา tag ออกจาก note ที่เลือก
+# คืนจำนวนแถวที่เพิ่ม/ลบใน note_tag
+def retag(selection, add=(), remove=()):
+    notes = models.Note.__table__
+    link = models.note_tag_m2m
+    deltas = Counter()
+    for tag in tags.resolve_tags(add):
+        deltas[tag.id] += _execute(
+            link.insert().from_select(
+                ["note_id", "tag_id"],
+                sa.select(notes.c.id, sa.literal(tag.id)).where(
+                    notes.c.id.in_(selection),
+                    notes.c.id.not_in(
+                        sa.select(link.c.note_id).where(link.c.tag_id == tag.id)
+                    ),
+                ),
+            )
+        ).rowcount
+    for tag_id in _tag_ids(remove):
+        deltas[tag_id] -= _execute(
+            link.delete().where(link.c.tag_id == tag_id, link.c.note_id.in_(selection))
+        ).rowcount
+    tags.adjust_counts(models.db.session.connection(), deltas)
+    return {
+        "added": sum(delta for delta in deltas.values() if delta > 0),
+        "removed": -sum(delta for delta in deltas.values() if delta < 0),
+    }
+
+
+# ย้าย note ของ tag ต้นทางทั้งหมดไปที่ tag ปลายทาง (สร้างถ้ายังไม่มี) แล้วลบ tag ต้นทาง
+def merge_tags(source_names, target_name):
+    (target,) = tags.resolve_tags([target_name])
+    source_ids = [tag_id for tag_id in _tag_ids(source_names) if tag_id != target.id]
+    if not source_ids:
+        return {"target": target.id, "moved": 0, "deleted": 0}
+    link = models.note_tag_m2m
+    moved = _execute(
+        link.insert().from_select(
+            ["note_id", "tag_id"],
+            sa.select(link.c.note_id, sa.literal(target.id))
+            .where(
+                link.c.tag_id.in_(source_ids),
+                link.c.note_id.not_in(
+                    sa.select(link.c.note_id).where(link.c.tag_id == target.id)
+                ),
+            )
+            .distinct(),
+        )
+    ).rowcount
+    tags.adjust_counts(models.db.session.connection(), {target.id: moved})
+    return {"target": target.id, "moved": moved, "deleted": delete_tags(source_ids)}
+
+
+# เปลี่ยนชื่อ tag ถ้ามี tag ชื่อใหม่อยู่แล้วจะรวมเข้าด้วยกัน
+def rename_tag(name, new_name):
+    new_name = (new_name or "").strip()
+    if not new_name:
+        raise ValueError("New tag name must not be empty")
+    if _tag_ids([new_name]):
+        return merge_tags([name], new_name)
+    table = models.Tag.__table__
+    renamed = _execute(
+        table.update().where(table.c.name == name.strip()).values(name=new_name)
+    ).rowcount
+    return {"renamed": renamed}
+
+
+# ลบ tag ที่ไม่มี note ใช้แล้ว
+def sweep_tags():
+    table = models.Tag.__table__
+    link = models.note_tag_m2m
+    return _execute(
+        table.delete().where(~sa.exists().where(link.c.tag_id == table.c.id))
+    ).rowcount
+
+
+@click.command("sweep-tags")
+def sweep_command():
+    """ลบ tag ที่ไม่มี note ใช้"""
+    deleted = sweep_tags()
+    models.db.session.commit()
+    click.echo(f"{deleted} unused tags deleted")
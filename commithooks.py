@@ -0,0 +1,55 @@
+import sqlalchemy as sa
+
+
+# เรียก callback หลัง commit สำเร็จ เมื่อ transaction นั้นแก้ข้อมูลที่สนใจ (ใช้ล้าง cache)
+# collect(session) คืนสิ่งที่เปลี่ยนจาก object ที่กำลังจะ flush (เช่น id ของแถว)
+# insert/update/delete แบบ bulk ผ่าน session.execute ไม่ผ่าน flush จึงดูจาก statement แทน:
+# ถ้าเขียนตารางใน tables ถือว่าเปลี่ยนทั้งหมด (None)
+# สิ่งที่เปลี่ยนสะสมใน session.info[key] จนถึง commit และถูกทิ้งเมื่อ rollback
+class CommitHook:
+    def __init__(self, key, collect, callback, tables=()):
+        self.key = key
+        self.collect = collect
+        self.callback = callback
+        self.tables = frozenset(tables)
+
+    def register(self, session):
+        if sa.event.contains(session, "after_commit", self._after_commit):
+            return
+        sa.event.listen(session, "before_flush", self._before_flush)
+        if self.tables:
+            sa.event.listen(session, "do_orm_execute", self._collect_statement)
+        sa.event.listen(session, "after_commit", self._after_commit)
+        sa.event.listen(session, "after_soft_rollback", self._discard)
+
+    def _add(self, session, changes):
+        session.info.setdefault(self.key, set()).update(changes)
+
+    def _before_flush(self, session, flush_context, instances):
+        changes = self.collect(session)
+        if changes:
+            self._add(session, changes)
+
+    def _collect_statement(self, orm_execute_state):
+        if not (
+            orm_execute_state.is_insert
+            or orm_execute_state.is_update
+            or orm_execute_state.is_delete
+        ):
+            return
+        table = getattr(orm_execute_state.statement, "table", None)
+        if getattr(table, "name", None) in self.tables:
+            self._add(orm_execute_state.session, {None})
+
+    def _after_commit(self, session):
+        changes = session.info.pop(self.key, None)
+        if changes:
+            self.callback(changes)
+
+    def _discard(self, session, previous_transaction):
+        session.info.pop(self.key, None)
+
+
+# วัตถุที่ session จะเขียนใน flush นี้ (เพิ่ม แก้ หรือลบ)
+def pending(session):
+    return list(session.new) + list(session.dirty) + list(session.deleted)
@@ -0,0 +1,113 @@
+import gzip
+import mimetypes
+import os
+
+from flask import current_app, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # ใช้ gzip อย่างเดียวถ้าไม่ได้ติดตั้ง brotli
+    brotli = None
+
+# ชนิดเนื้อหาที่บีบอัดแล้วได้ผล (รูปภาพ jpeg/png/webp บีบอัดมาแล้ว)
+COMPRESSIBLE_MIMETYPES = frozenset(
+    {
+        "text/html",
+        "text/css",
+        "text/plain",
+        "text/javascript",
+        "application/javascript",
+        "application/json",
+        "application/x-ndjson",
+        "image/svg+xml",
+        "image/x-icon",
+        "image/vnd.microsoft.icon",
+    }
+)
+# นามสกุลของไฟล์ที่บีบอัดไว้ล่วงหน้า (เรียงตามลำดับที่เลือกใช้ก่อน)
+SUFFIXES = (("br", ".br"), ("gzip", ".gz"))
+
+
+def init_app(app):
+    app.config.setdefault("COMPRESS_ENABLED", True)
+    # response ที่เล็กกว่านี้ส่งไปเลย (ประหยัดได้ไม่คุ้มเวลาบีบอัด)
+    app.config.setdefault("COMPRESS_MIN_SIZE", 1024)
+    app.config.setdefault("COMPRESS_GZIP_LEVEL", 6)
+    app.config.setdefault("COMPRESS_BROTLI_QUALITY", 5)
+    app.after_request(compress_response)
+
+
+def available_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+# encoding ที่ client รับได้และมีค่า q มากที่สุด (ถ้าเท่ากันเลือก br ก่อน)
+def negotiate(encodings):
+    best, best_quality = None, 0
+    for encoding in encodings:
+        quality = request.accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding, gzip_level=9, brotli_quality=11):
+    if encoding == "br":
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, gzip_level, mtime=0)
+
+
+# บีบอัด HTML/JSON ที่สร้างขึ้นใน request ตาม Accept-Encoding
+# ไม่แตะ response แบบ stream หรือไฟล์ (send_file) และ response ที่มี Content-Encoding แล้ว
+def compress_response(response):
+    config = current_app.config
+    if (
+        not config["COMPRESS_ENABLED"]
+        or response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    if len(data) < config["COMPRESS_MIN_SIZE"]:
+        return response
+    encoding = negotiate(available_encodings())
+    if encoding is None:
+        return response
+    response.set_data(
+        compress(
+            data,
+            encoding,
+            config["COMPRESS_GZIP_LEVEL"],
+            config["COMPRESS_BROTLI_QUALITY"],
+        )
+    )
+    response.headers["Content-Encoding"] = encoding
+    # ETag ของเนื้อหาเดิมยังใช้ตรวจ If-None-Match ได้ แต่ไม่ตรงกันทุก byte อีกต่อไป
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+# ส่งไฟล์ static โดยเลือกไฟล์ .br/.gz ที่บีบอัดไว้แล้วถ้ามีและ client รับได้
+def send_precompressed(directory, filename, **kwargs):
+    path = os.path.join(directory, filename)
+    variants = [
+        encoding for encoding, suffix in SUFFIXES if os.path.isfile(path + suffix)
+    ]
+    encoding = negotiate(variants) if variants else None
+    if encoding is None:
+        response = send_from_directory(directory, filename, **kwargs)
+    else:
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        response = send_from_directory(
+            directory, filename + dict(SUFFIXES)[encoding], mimetype=mimetype, **kwargs
+        )
+        response.headers["Content-Encoding"] = encoding
+    if variants:
+        response.vary.add("Accept-Encoding")
+    return response
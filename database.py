@@ -0,0 +1,100 @@
+import os
+import weakref
+
+import sqlalchemy as sa
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+# ขนาด pool ตามชนิด worker ของ gunicorn:
+# sync ใช้ทีละ request, gthread ใช้เท่าจำนวน thread, gevent/eventlet ใช้พร้อมกันได้หลาย request
+# worker_class เป็น None เมื่อไม่ได้รันผ่าน gunicorn.conf.py (app.run / flask run ซึ่งใช้
+# thread ต่อ request และ response แบบ stream ถือ connection ไว้จนส่งเสร็จ)
+def default_pool_size(worker_class, threads):
+    if worker_class is None:
+        return 10
+    if worker_class in ("gevent", "eventlet"):
+        return 20
+    if worker_class == "gthread":
+        return max(1, threads)
+    return 1
+
+
+# ตั้งค่าการเชื่อมต่อฐานข้อมูลจาก environment (เรียกก่อน db.init_app)
+# ค่าใน app.config ที่ตั้งไว้ก่อนแล้วจะไม่ถูกทับ
+def configure(app):
+    config = app.config
+    url = os.environ.get("DATABASE_URL", "sqlite:///database.db")
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://") :]
+    config.setdefault("SQLALCHEMY_DATABASE_URI", url)
+    config.setdefault("SQLITE_TUNING", os.environ.get("SQLITE_TUNING", "1") != "0")
+    config.setdefault("SQLITE_BUSY_TIMEOUT_MS", _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    config.setdefault("SQLITE_MMAP_SIZE", _env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+    config.setdefault("SQLITE_CACHE_SIZE_KB", _env_int("SQLITE_CACHE_SIZE_KB", 64 * 1024))
+
+    worker_class = os.environ.get("WORKER_CLASS")
+    threads = _env_int("WEB_THREADS", 1)
+    pool_size = _env_int("DB_POOL_SIZE", default_pool_size(worker_class, threads))
+
+    url = sa.engine.make_url(config["SQLALCHEMY_DATABASE_URI"])
+    options = config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {})
+    if url.get_backend_name() == "sqlite":
+        # ให้ pysqlite รอ lock เท่ากับ busy_timeout ด้วย
+        options.setdefault("connect_args", {}).setdefault(
+            "timeout", config["SQLITE_BUSY_TIMEOUT_MS"] / 1000
+        )
+        if url.database in (None, "", ":memory:"):
+            return
+    else:
+        options.setdefault("pool_pre_ping", True)
+        options.setdefault("pool_recycle", 1800)
+    options.setdefault("pool_size", pool_size)
+    options.setdefault("max_overflow", pool_size)
+
+
+# ตั้ง PRAGMA ให้ทุก connection ของ SQLite ที่เปิดใหม่
+# foreign_keys เปิดเสมอ (SQLite ปิดไว้เป็นค่าเริ่มต้น) เพื่อให้ ON DELETE CASCADE ทำงาน
+# WAL ทำให้ผู้อ่านไม่ถูก block โดยผู้เขียน และ synchronous=NORMAL ปลอดภัยเมื่อใช้คู่กับ WAL
+def install_pragmas(engine, config):
+    if engine.dialect.name != "sqlite":
+        return
+
+    pragmas = ["PRAGMA foreign_keys=ON"]
+    if config["SQLITE_TUNING"]:
+        pragmas += [
+            "PRAGMA journal_mode=WAL",
+            "PRAGMA synchronous=NORMAL",
+            f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+            f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+            f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_SIZE_KB'])}",
+            "PRAGMA temp_store=MEMORY",
+        ]
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    sa.event.listen(engine, "connect", set_pragmas)
+
+
+# process ที่ fork ออกมา (เช่น worker ของ gunicorn ที่ใช้ preload_app) ต้องไม่ใช้ connection
+# ที่เปิดไว้ก่อน fork ร่วมกับ process หลัก จึงทิ้ง pool เดิมใน process ลูก
+def dispose_after_fork(engine):
+    if not hasattr(os, "register_at_fork"):
+        return
+    ref = weakref.ref(engine)
+
+    def reset():
+        engine = ref()
+        if engine is not None:
+            engine.dispose(close=False)
+
+    os.register_at_fork(after_in_child=reset)
@@ -1,4 +1,3 @@
-from wtforms_sqlalchemy.orm import model_form
 from flask_wtf import FlaskForm
 from wtforms import Field, widgets, validators, fields
 import models
@@ -6,13 +5,49 @@ from flask_wtf import FlaskForm, file
 from wtforms import StringField, PasswordField, SubmitField
 from wtforms.validators import DataRequired, EqualTo
 
+# ฟอร์มที่สร้างจาก model (model_form) จะถูกสร้างครั้งแรกที่มีการใช้ แล้วเก็บไว้ใช้ซ้ำ
+# การ import forms จึงไม่ต้องไล่อ่าน model ทุกตัวตอนเริ่มแอป
+_builders = {}
+
+
+def lazy_form(name):
+    def register(builder):
+        _builders[name] = builder
+        return builder
+
+    return register
+
+
+def __getattr__(name):
+    builder = _builders.get(name)
+    if builder is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    form_class = builder()
+    globals()[name] = form_class
+    return form_class
+
+
+# สร้างฟอร์มทั้งหมดไว้ก่อน (ใช้ก่อน fork worker)
+def preload():
+    for name in _builders:
+        if name not in globals():
+            __getattr__(name)
+
+
+def _model_form(model, exclude):
+    from wtforms_sqlalchemy.orm import model_form
+
+    return model_form(
+        model, base_class=FlaskForm, exclude=exclude, db_session=models.db.session
+    )
+
+
 # ฟอร์มการลงทะเบียนและเข้าสู่ระบบ
-BaseUserForm = model_form(
-    models.User,
-    base_class=FlaskForm,
-    exclude=["created_date", "updated_date", "status", "_password_hash"],
-    db_session=models.db.session,
-)
+@lazy_form("BaseUserForm")
+def _user_form():
+    return _model_form(
+        models.User, ["created_date", "updated_date", "status", "_password_hash"]
+    )
 
 
 class LoginForm(FlaskForm):
@@ -20,6 +55,11 @@ class LoginForm(FlaskForm):
     password = fields.PasswordField("Password", [validators.DataRequired()])
 
 
+# ยืนยันการลบ (มีแค่ CSRF token)
+class ConfirmForm(FlaskForm):
+    pass
+
+
 class RegisterForm(FlaskForm):
     name = StringField('Name', validators=[DataRequired()])
     username = StringField('Username', validators=[DataRequired()])
@@ -57,45 +97,51 @@ class TagListField(Field):
             return ""
 
 
-BaseNoteForm = model_form(
-    models.Note,
-    base_class=FlaskForm,
-    exclude=["created_date", "updated_date"],
-    db_session=models.db.session,
-)
+@lazy_form("NoteForm")
+def _note_form():
+    class NoteForm(_model_form(models.Note, ["created_date", "updated_date"])):
+        tags = TagListField("Tags")
 
-BaseTagsForm = model_form(
-    models.Tag,
-    base_class=FlaskForm,
-    exclude=["created_date", "updated_date"],
-    db_session=models.db.session,
-)
+    return NoteForm
 
 
-class NoteForm(BaseNoteForm):
-    tags = TagListField("Tags")
+@lazy_form("TagsForm")
+def _tags_form():
+    class TagsForm(
+        _model_form(models.Tag, ["created_date", "updated_date", "note_count"])
+    ):
+        tags = TagListField("Tags")
 
+    return TagsForm
 
-class TagsForm(BaseTagsForm):
-    tags = TagListField("Tags")
 
-
-BaseUploadForm = model_form(
-    models.Upload,
-    base_class=FlaskForm,
-    db_session=models.db.session,
-    exclude=["created_date", "updated_date", "status", "filename"],
-)
-
-
-class UploadForm(BaseUploadForm):
-    file = fields.FileField(
-        "Upload team image (png or jpg) , Recommended image size:250(px) x 230(px)",
-        validators=[
-            file.FileAllowed(["png", "jpg", "jpeg"], "You can use onlyjpg , png"),
+@lazy_form("UploadForm")
+def _upload_form():
+    base = _model_form(
+        models.Upload,
+        [
+            "created_date",
+            "updated_date",
+            "status",
+            "filename",
+            "sha256",
+            "size",
+            "mime_type",
+            "width",
+            "height",
         ],
     )
 
+    class UploadForm(base):
+        file = fields.FileField(
+            "Upload team image (png or jpg) , Recommended image size:250(px) x 230(px)",
+            validators=[
+                file.FileAllowed(["png", "jpg", "jpeg"], "You can use onlyjpg , png"),
+            ],
+        )
+
+    return UploadForm
+
 # ฟอร์มสำหรับการสร้างไดอารี่
 class DiaryEntryForm(FlaskForm):
     title = fields.StringField("Title", [validators.DataRequired()])
@@ -0,0 +1,27 @@
+# โหมด preforked: สร้างแอปครั้งเดียวใน process หลัก (import, ตรวจ migration, ฟอร์ม, template)
+# แล้วจึง fork worker ซึ่งใช้หน่วยความจำส่วนนี้ร่วมกันแบบ copy-on-write
+#
+#     gunicorn -c gunicorn.conf.py
+#
+# WORKER_CLASS และ WEB_THREADS ใช้กำหนดขนาด pool ของฐานข้อมูลด้วย (ดู database.py)
+import gc
+import os
+
+wsgi_app = "main:create_app()"
+preload_app = True
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+# ให้แอปที่สร้างใน process นี้รู้จำนวน worker (pagecache ใช้ file backend เมื่อมีหลายตัว)
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = os.environ.get("WORKER_CLASS", "sync")
+threads = int(os.environ.get("WEB_THREADS", 1))
+# แอปที่สร้างใน process นี้ใช้ค่าเดียวกันกำหนดขนาด pool (ไม่มีค่านี้ถือว่าเป็น dev server)
+os.environ["WORKER_CLASS"] = worker_class
+
+
+def when_ready(server):
+    import main
+
+    main.warm_up(server.app.wsgi())
+    # ไม่ให้ GC ของ worker ไปแตะ object ที่สร้างก่อน fork (ลดการ copy หน้าหน่วยความจำ)
+    gc.freeze()
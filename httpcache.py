@@ -0,0 +1,87 @@
+import datetime
+import hashlib
+import os
+from functools import lru_cache
+
+from flask import current_app, request
+
+# อายุ cache หนึ่งปีสำหรับ URL ที่เนื้อหาไม่มีวันเปลี่ยน
+ONE_YEAR = 365 * 24 * 60 * 60
+
+
+def init_app(app):
+    app.url_defaults(version_static_url)
+    app.after_request(cache_static_response)
+
+
+@lru_cache(maxsize=256)
+def _file_hash(path, mtime, size):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()[:12]
+
+
+# คืนค่าเวอร์ชันของไฟล์ static จาก hash ของเนื้อหา (คำนวณใหม่เมื่อไฟล์เปลี่ยนเท่านั้น)
+def static_version(filename):
+    path = os.path.join(current_app.static_folder, filename)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return _file_hash(path, stat.st_mtime_ns, stat.st_size)
+
+
+# เติม ?v=<hash> ให้ทุก url_for('static', ...) เพื่อให้ cache แบบ immutable ได้
+def version_static_url(endpoint, values):
+    if endpoint != "static" or "v" in values or "filename" not in values:
+        return
+    version = static_version(values["filename"])
+    if version:
+        values["v"] = version
+
+
+def cache_static_response(response):
+    if (
+        request.endpoint == "static"
+        and request.args.get("v")
+        and response.status_code in (200, 206, 304)
+    ):
+        set_immutable(response)
+    return response
+
+
+def set_immutable(response):
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = ONE_YEAR
+    response.cache_control.immutable = True
+    return response
+
+
+def as_utc(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.replace(microsecond=0)
+
+
+# ตอบ 304 ได้ทันทีจาก ETag / Last-Modified โดยไม่ต้องเปิดไฟล์
+# คืนค่า None ถ้าต้องส่งเนื้อหาเต็ม
+def not_modified(etag, last_modified=None):
+    last_modified = as_utc(last_modified)
+    if request.if_none_match:
+        fresh = request.if_none_match.contains(etag)
+    elif last_modified and request.if_modified_since:
+        fresh = last_modified <= request.if_modified_since
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    return set_immutable(response)
@@ -0,0 +1,81 @@
+import importlib.util
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import blobstore
+
+# ความกว้างของ thumbnail ที่สร้างได้ (จำกัดไว้เพื่อไม่ให้ใครสั่งสร้างขนาดใดก็ได้)
+WIDTHS = (160, 320, 640)
+FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+QUALITY = 80
+# Pillow ถูก import ตอนสร้างรูปครั้งแรกเพื่อให้แอปเริ่มเร็วขึ้น
+# ถ้าไม่ได้ติดตั้งจะใช้ไฟล์ต้นฉบับแทน thumbnail
+HAS_PILLOW = importlib.util.find_spec("PIL") is not None
+
+
+# สร้างรูปย่อ (derivative) จากไฟล์ใน blobstore และเก็บไว้บนดิสก์
+# งานสร้างรูปทำใน thread pool เพื่อไม่ให้ request ของการอัปโหลดช้า
+class ImagePipeline:
+    def __init__(self):
+        self.root = None
+        self.executor = None
+
+    def init_app(self, app):
+        self.root = app.config.setdefault(
+            "DERIVATIVE_PATH", os.path.join(app.instance_path, "derivatives")
+        )
+        os.makedirs(self.root, exist_ok=True)
+        self.executor = ThreadPoolExecutor(
+            max_workers=app.config.setdefault("IMAGE_WORKERS", 2),
+            thread_name_prefix="imaging",
+        )
+
+    @property
+    def available(self):
+        return HAS_PILLOW
+
+    def path(self, digest, width, fmt):
+        return os.path.join(self.root, digest[:2], f"{digest}-{width}.{fmt}")
+
+    # ส่งงานสร้างรูปทุกขนาดไปทำเบื้องหลัง
+    def schedule(self, digest):
+        if self.available:
+            return self.executor.submit(self.build_all, digest)
+
+    def build_all(self, digest):
+        for width in WIDTHS:
+            for fmt in FORMATS:
+                self.get(digest, width, fmt)
+
+    # คืน path ของรูปย่อ ถ้ายังไม่มีจะสร้างทันที (lazy)
+    def get(self, digest, width, fmt):
+        target = self.path(digest, width, fmt)
+        if os.path.exists(target):
+            return target
+        from PIL import Image, ImageOps
+
+        pil_format = FORMATS[fmt][0]
+        with Image.open(blobstore.store.path(digest)) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.width > width:
+                height = max(1, round(image.height * width / image.width))
+                image = image.resize((width, height), Image.LANCZOS)
+            if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+            try:
+                with os.fdopen(fd, "wb") as tmp:
+                    image.save(tmp, pil_format, quality=QUALITY, optimize=True)
+                os.replace(tmp_path, target)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        return target
+
+
+pipeline = ImagePipeline()
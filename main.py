@@ -1,51 +1,137 @@
+import math
+import os
+
 import flask
+import jinja2
 import models
 import forms
-from forms import DiaryEntryForm
 from flask_login import login_required, login_user, logout_user, LoginManager
 from flask import render_template, redirect, url_for, flash, abort
 import acl
+import blobstore
+import httpcache
+import imaging
 from flask import Response, send_file, abort
+from flask_login import current_user
+from sqlalchemy.orm import selectinload
+import sqlcount
+import pagination
+import tags
+import transfer
+import search
+import passwords
+import api
+import bulk
+import assets
+import compression
+import pagecache
+import metrics
+import uploads
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import UnsupportedMediaType
 
-app = flask.Flask(__name__)
-app.config["SECRET_KEY"] = "This is secret key"
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///database.db"
-models.init_app(app)
+bp = flask.Blueprint("site", __name__)
 
-@app.route("/")
-def index():
+
+# สร้างแอป (ใช้กับ flask --app main, gunicorn "main:create_app()" และ benchmark)
+def create_app(config=None):
+    app = flask.Flask(__name__, static_folder="Static", static_url_path="/static")
+    app.config["SECRET_KEY"] = "This is secret key"
+    # ค่าจาก environment ที่ขึ้นต้นด้วย FLASK_ จะทับค่าข้างบน เช่น FLASK_SQLALCHEMY_DATABASE_URI
+    # ฐานข้อมูลตั้งค่าจาก DATABASE_URL (ดู database.py) ค่าเริ่มต้นคือ sqlite:///database.db
+    app.config.from_prefixed_env()
+    if config:
+        app.config.update(config)
+    # ต้องตั้งก่อนที่ app.jinja_env จะถูกสร้าง
+    app.jinja_options = dict(app.jinja_options, bytecode_cache=template_cache(app))
+    models.init_app(app)
+    uploads.init_app(app)
+    httpcache.init_app(app)
+    imaging.pipeline.init_app(app)
+    sqlcount.init_app(app)
+    transfer.init_app(app)
+    search.init_app(app)
+    tags.init_app(app)
+    api.init_app(app)
+    bulk.init_app(app)
+    pagecache.cache.init_app(app)
+    metrics.init_app(app)
+    assets.init_app(app)
+    # ลงทะเบียนหลัง metrics เพื่อให้เวลาบีบอัดรวมอยู่ในเวลาของ request
+    compression.init_app(app)
+    app.register_blueprint(bp)
+    return app
+
+
+# เก็บ template ที่ compile แล้วลงดิสก์ process ใหม่จึงไม่ต้อง parse template ซ้ำ
+def template_cache(app):
+    path = app.config.setdefault(
+        "TEMPLATE_CACHE_PATH", os.path.join(app.instance_path, "jinja-cache")
+    )
+    if not path:
+        return None
+    os.makedirs(path, exist_ok=True)
+    return jinja2.FileSystemBytecodeCache(path)
+
+
+# งานที่ทำก่อน fork worker (gunicorn preload_app) เพื่อให้ทุก worker ใช้ผลร่วมกัน
+def warm_up(app):
+    forms.preload()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+# โหลด tags ของทุก note ด้วย query เดียว (selectinload) แทนการ lazy load ทีละ note
+# และแบ่งหน้าแบบ keyset ตาม (title, id)
+def notes_with_tags(*criteria):
     db = models.db
-    notes = db.session.execute(
-        db.select(models.Note).order_by(models.Note.title)
-    ).scalars()
+    return pagination.keyset_page(
+        db.select(models.Note)
+        .options(selectinload(models.Note.tags))
+        .where(*criteria),
+        [models.Note.title, models.Note.id],
+    )
+
+@bp.route("/")
+@pagecache.cached(anonymous_only=True)
+@sqlcount.query_budget(3)
+def index():
+    notes = notes_with_tags()
     return render_template("index.html", notes=notes)
 
-@app.route("/detail")
+@bp.route("/detail")
 @login_required
 def detail():
     return render_template("detail.html")
 
-@app.route("/login", methods=["GET", "POST"])
+@bp.route("/login", methods=["GET", "POST"])
 def login():
     form = forms.LoginForm()
     if form.validate_on_submit():
-        user = models.User.query.filter_by(username=form.username.data).first()
+        username = form.username.data
+        ip = flask.request.remote_addr
+        # ปฏิเสธทันทีถ้าล็อกอินผิดบ่อยเกินไป ก่อนจะเสียเวลา hash
+        passwords.throttle.check(username, ip)
+        user = models.User.query.filter_by(username=username).first()
         if user and user.check_password(form.password.data):
+            passwords.throttle.succeeded(username)
+            # บันทึก hash ใหม่ถ้า check_password ปรับ work factor ให้
+            models.db.session.commit()
             login_user(user)
-            return redirect(url_for("index"))
+            return redirect(url_for("site.index"))
         else:
+            passwords.throttle.failed(username, ip)
             flash("Invalid username or password", "error")
     return render_template("login.html", form=form)
 
-@app.route("/logout", methods=["GET", "POST"])
+@bp.route("/logout", methods=["GET", "POST"])
 @login_required
 def logout():
     if flask.request.method == "POST":
         logout_user()
-        return redirect(url_for("index"))
+        return redirect(url_for("site.index"))
     return render_template("logout.html")
 
-@app.route("/register", methods=["GET", "POST"])
+@bp.route("/register", methods=["GET", "POST"])
 def register():
     form = forms.RegisterForm()
     if form.validate_on_submit():
@@ -62,13 +148,13 @@ def register():
         models.db.session.add(user)
         models.db.session.commit()
         flash("Registration successful", "success")
-        return redirect(url_for("login"))
+        return redirect(url_for("site.login"))
     return render_template("register.html", form=form)
 
-@app.route("/diary/create", methods=["GET", "POST"])
+@bp.route("/diary/create", methods=["GET", "POST"])
 @login_required
 def create_diary_entry():
-    form = DiaryEntryForm()
+    form = forms.DiaryEntryForm()
     if form.validate_on_submit():
         entry = models.Note(
             title=form.title.data,
@@ -78,28 +164,53 @@ def create_diary_entry():
         models.db.session.add(entry)
         models.db.session.commit()
         flash("Diary entry created", "success")
-        return redirect(url_for("index"))
+        return redirect(url_for("site.index"))
     return render_template("create_diary_entry.html", form=form)
 
-@app.route("/note")
+@bp.route("/note")
+@sqlcount.query_budget(3)
 def note():
-    db = models.db
-    notes = db.session.execute(
-        db.select(models.Note).order_by(models.Note.title)
-    ).scalars()
-    return render_template("note.html", notes=notes)
+    # ผู้ใช้ที่ยังไม่ล็อกอินจะไม่เห็นรายการ note จึงไม่ต้อง query
+    notes = notes_with_tags() if current_user.is_authenticated else []
+    return pagination.render_listing("note.html", notes=notes)
 
-@app.route("/page")
+@bp.route("/page")
 @acl.roles_required("admin")
 def page():
     return render_template("page.html")
 
-@app.route("/page2")
+@bp.route("/page2")
 @login_required
 def page2():
     return render_template("page2.html")
 
-@app.route("/tags/<tag_name>")
+# tag cloud จาก index ใน memory (tags.note_count) ไม่ต้อง GROUP BY ทุก request
+@bp.route("/tags")
+def tag_cloud():
+    top = tags.index.top(flask.current_app.config["TAG_CLOUD_SIZE"])
+    # ขนาดตัวอักษร 1-5 ตาม log ของจำนวน note (top เรียงจากมากไปน้อย)
+    scale = math.log(top[0][1]) if top and top[0][1] > 1 else 1
+    cloud = [
+        (name, count, 1 + round(4 * math.log(count) / scale))
+        for name, count in sorted(top, key=lambda item: item[0].casefold())
+    ]
+    return render_template("tag_cloud.html", cloud=cloud)
+
+@bp.route("/tags/suggest")
+def suggest_tags():
+    limit = flask.current_app.config["TAG_SUGGEST_LIMIT"]
+    limit = max(1, min(flask.request.args.get("limit", limit, type=int), 100))
+    prefix = flask.request.args.get("prefix", "").strip()
+    return {
+        "prefix": prefix,
+        "tags": [
+            {"name": name, "count": count}
+            for name, count in tags.index.suggest(prefix, limit)
+        ],
+    }
+
+@bp.route("/tags/<tag_name>")
+@sqlcount.query_budget(4)
 def tags_view(tag_name):
     db = models.db
     tag = (
@@ -109,12 +220,10 @@ def tags_view(tag_name):
     )
     if not tag:
         abort(404, description="Tag not found")
-    notes = db.session.execute(
-        db.select(models.Note).where(models.Note.tags.any(id=tag.id))
-    ).scalars()
-    return render_template("tag_view.html", tag_name=tag_name, notes=notes)
+    notes = notes_with_tags(models.Note.tags.any(id=tag.id))
+    return pagination.render_listing("tag_view.html", tag_name=tag_name, notes=notes)
 
-@app.route("/tags/<tag_id>/update_tags", methods=["GET", "POST"])
+@bp.route("/tags/<tag_id>/update_tags", methods=["GET", "POST"])
 def update_tags(tag_id):
     db = models.db
     tag = (
@@ -126,23 +235,26 @@ def update_tags(tag_id):
     form_name = tag.name
     if form.validate_on_submit():
         form.populate_obj(tag)
-        db.session.commit()
-        return redirect(url_for("index"))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # ชื่อ tag ต้องไม่ซ้ำกับ tag อื่น
+            db.session.rollback()
+            flash("Tag name already exists", "error")
+        else:
+            return redirect(url_for("site.index"))
     return render_template("update_tags.html", form=form, form_name=form_name)
 
-@app.route("/tags/<tag_id>/delete_tags", methods=["GET", "POST"])
+# ลบด้วย DELETE คำสั่งเดียว แถวใน note_tag ถูกลบตามด้วย ON DELETE CASCADE
+@bp.route("/tags/<int:tag_id>/delete_tags", methods=["POST"])
+@acl.roles_required("admin")
 def delete_tags(tag_id):
-    db = models.db
-    tag = (
-        db.session.execute(db.select(models.Tag).where(models.Tag.id == tag_id))
-        .scalars()
-        .first()
-    )
-    db.session.delete(tag)
-    db.session.commit()
-    return redirect(url_for("index"))
+    confirmed_or_abort()
+    bulk.delete_tags([tag_id])
+    models.db.session.commit()
+    return redirect(url_for("site.index"))
 
-@app.route("/create_note", methods=["GET", "POST"])
+@bp.route("/create_note", methods=["GET", "POST"])
 @login_required
 def create_note():
     db = models.db
@@ -150,23 +262,13 @@ def create_note():
     if form.validate_on_submit():
         note = models.Note()
         form.populate_obj(note)
-        note.tags = []
-        for tag_name in form.tags.data:
-            tag = (
-                db.session.execute(db.select(models.Tag).where(models.Tag.name == tag_name))
-                .scalars()
-                .first()
-            )
-            if not tag:
-                tag = models.Tag(name=tag_name)
-                db.session.add(tag)
-            note.tags.append(tag)
+        note.tags = tags.resolve_tags(form.tags.data)
         db.session.add(note)
         db.session.commit()
-        return redirect(url_for("note"))
+        return redirect(url_for("site.note"))
     return render_template("create_note.html", form=form)
 
-@app.route("/tags/<tag_id>/update_note", methods=["GET", "POST"])
+@bp.route("/tags/<tag_id>/update_note", methods=["GET", "POST"])
 def update_note(tag_id):
     db = models.db
     note = (
@@ -178,86 +280,165 @@ def update_note(tag_id):
     )
     form = forms.NoteForm()
     if form.validate_on_submit():
+        # แปลงชื่อ tag เป็น Tag ก่อน populate (note เดิมรับ str ใน collection ไม่ได้)
+        form.tags.data = tags.resolve_tags(form.tags.data)
         form.populate_obj(note)
         db.session.commit()
-        return redirect(url_for("index"))
+        return redirect(url_for("site.index"))
     return render_template("update_note.html", form=form, note=note)
 
-@app.route("/tags/<tag_id>/delete_note", methods=["GET", "POST"])
+# การลบทั้งหมดเป็น POST จากหน้ายืนยัน (เฉพาะ admin)
+DELETE_ACTIONS = {
+    "delete_note": "Delete the first note tagged",
+    "delete_tags": "Delete the tag (notes are kept)",
+    "delete": "Delete every note tagged",
+}
+
+@bp.route("/tags/<int:tag_id>/confirm/<action>")
+@acl.roles_required("admin")
+def confirm_delete(tag_id, action):
+    if action not in DELETE_ACTIONS:
+        abort(404)
+    tag = models.db.session.get(models.Tag, tag_id)
+    if tag is None:
+        abort(404, description="Tag not found")
+    return render_template(
+        "confirm_delete.html",
+        form=forms.ConfirmForm(),
+        tag=tag,
+        message=DELETE_ACTIONS[action],
+        action=url_for(f"site.{action}", tag_id=tag_id),
+    )
+
+def confirmed_or_abort():
+    if not forms.ConfirmForm().validate_on_submit():
+        abort(400, description="Invalid or missing CSRF token")
+
+# ลบ note แรกที่มี tag นี้ โดยไม่โหลด note และ tag ของมันขึ้นมาก่อน
+@bp.route("/tags/<int:tag_id>/delete_note", methods=["POST"])
+@acl.roles_required("admin")
 def delete_note(tag_id):
-    db = models.db
-    note = (
-        db.session.execute(
-            db.select(models.Note).where(models.Note.tags.any(id=tag_id))
-        )
-        .scalars()
-        .first()
+    confirmed_or_abort()
+    link = models.note_tag_m2m
+    bulk.delete_notes(
+        models.db.select(link.c.note_id)
+        .where(link.c.tag_id == tag_id)
+        .order_by(link.c.note_id)
+        .limit(1)
     )
-    db.session.delete(note)
-    db.session.commit()
-    return redirect(url_for("index"))
+    models.db.session.commit()
+    return redirect(url_for("site.index"))
 
-@app.route("/tags/<tag_id>/delete", methods=["GET", "POST"])
+# ลบทุก note ที่มี tag นี้ด้วย DELETE คำสั่งเดียว
+@bp.route("/tags/<int:tag_id>/delete", methods=["POST"])
+@acl.roles_required("admin")
 def delete(tag_id):
-    db = models.db
-    note = (
-        db.session.execute(
-            db.select(models.Note).where(models.Note.tags.any(id=tag_id))
-        )
-        .scalars()
-        .first()
-    )
-    db.session.delete(note)
-    db.session.commit()
-    return redirect(url_for("index"))
+    confirmed_or_abort()
+    link = models.note_tag_m2m
+    bulk.delete_notes(models.db.select(link.c.note_id).where(link.c.tag_id == tag_id))
+    models.db.session.commit()
+    return redirect(url_for("site.index"))
 
-@app.route("/images")
+@bp.route("/images")
+@sqlcount.query_budget(2)
 def images():
-    db = models.db
-    images = db.session.execute(
-        db.select(models.Upload).order_by(models.Upload.filename)
-    ).scalars()
-    return render_template("images.html", images=images)
+    images = pagination.keyset_page(
+        models.db.select(models.Upload),
+        [models.Upload.filename, models.Upload.id],
+    )
+    return pagination.render_listing(
+        "images.html", images=images, thumbnail_widths=imaging.WIDTHS
+    )
 
-@app.route("/upload", methods=["GET", "POST"])
+@bp.route("/upload", methods=["GET", "POST"])
 def upload():
     form = forms.UploadForm()
     db = models.db
-    file_ = models.Upload()
     if form.validate_on_submit():
-        file_ = models.Upload(
-            filename=form.file.data.filename,
-            data=form.file.data.read(),
-        )
-        db.session.add(file_)
+        # werkzeug เก็บไฟล์ที่ใหญ่กว่า 500KB ไว้ใน temp file แล้ว จึงอ่านต่อเป็น chunk ได้
+        # โดยไม่โหลดทั้งไฟล์เข้าหน่วยความจำ (ไฟล์ใหญ่เกินกำหนดจะได้ 413)
+        try:
+            file_ = uploads.ingest(form.file.data.stream, form.file.data.filename)
+        except UnsupportedMediaType as error:
+            flash(error.description, "error")
+            return render_template("upload.html", form=form), 415
         db.session.commit()
-        return redirect(url_for("index"))
+        imaging.pipeline.schedule(file_.sha256)
+        return redirect(url_for("site.index"))
     return render_template("upload.html", form=form)
 
-@app.route("/upload/<int:file_id>", methods=["GET"])
+@bp.route("/upload/<int:file_id>", methods=["GET"])
 def get_image(file_id):
-    file_ = models.Upload.query.get(file_id)
-    if not file_ or not file_.data:
+    file_ = models.db.session.get(models.Upload, file_id)
+    if not file_ or not file_.sha256 or not blobstore.store.exists(file_.sha256):
         abort(404, description="File not found")
-    return Response(
-        file_.data,
-        headers={
-            "Content-Disposition": f'inline;filename="{file_.filename}"',
-            "Content-Type": "application/octet-stream",
-        },
+    # ไฟล์ของ upload แต่ละ id ไม่เปลี่ยน จึงใช้ sha256 เป็น ETag และตอบ 304 ก่อนเปิดไฟล์
+    response = httpcache.not_modified(file_.sha256, file_.created_date)
+    if response:
+        return response
+    # send_file ส่งไฟล์จากดิสก์แบบ stream (ใช้ sendfile ถ้า server รองรับ) และรองรับ Range/206
+    response = send_file(
+        blobstore.store.path(file_.sha256),
+        mimetype=file_.mime_type,
+        download_name=file_.filename,
+        conditional=True,
+        etag=file_.sha256,
+        last_modified=httpcache.as_utc(file_.created_date),
+    )
+    return httpcache.set_immutable(response)
+
+@bp.route("/upload/<int:file_id>/w<int:width>.<fmt>", methods=["GET"])
+def get_thumbnail(file_id, width, fmt):
+    if width not in imaging.WIDTHS or fmt not in imaging.FORMATS:
+        abort(404, description="Size not available")
+    file_ = models.db.session.get(models.Upload, file_id)
+    if not file_ or not file_.sha256 or not blobstore.store.exists(file_.sha256):
+        abort(404, description="File not found")
+    if not imaging.pipeline.available:
+        return redirect(url_for("site.get_image", file_id=file_id))
+    etag = f"{file_.sha256}-{width}.{fmt}"
+    response = httpcache.not_modified(etag, file_.created_date)
+    if response:
+        return response
+    try:
+        path = imaging.pipeline.get(file_.sha256, width, fmt)
+    except OSError:
+        # ไฟล์ต้นฉบับไม่ใช่รูปที่ Pillow อ่านได้
+        return redirect(url_for("site.get_image", file_id=file_id))
+    response = send_file(
+        path,
+        mimetype=imaging.FORMATS[fmt][1],
+        conditional=True,
+        etag=etag,
+        last_modified=httpcache.as_utc(file_.created_date),
+    )
+    return httpcache.set_immutable(response)
+
+@bp.route("/search")
+def search_view():
+    q, tag_names, limit, offset = search.parse_args(flask.request.args)
+    results = search.search_notes(q, tag_names, limit, offset)
+    return render_template(
+        "search.html", q=q, tag_names=tag_names, results=results,
+        limit=limit, offset=offset,
     )
 
-@app.route("/contact")
+@bp.route("/contact")
+@pagecache.cached()
 def contact():
     return render_template("contact.html")
 
-@app.route("/description")
+@bp.route("/description")
+@pagecache.cached()
 def description():
     return render_template("description.html")
 
-@app.route("/faq")
+@bp.route("/faq")
+@pagecache.cached()
 def faq():
     return render_template("faq.html")
 
+# dev server ของ werkzeug ใช้ thread ต่อ request: pool ของฐานข้อมูลจึงใช้ขนาดสำหรับ
+# thread (10 + overflow 10, ดู database.default_pool_size) ปรับได้ด้วย DB_POOL_SIZE
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
\ No newline at end of file
@@ -0,0 +1,253 @@
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request, template_rendered
+from flask import before_render_template
+from flask_login import current_user
+from werkzeug.exceptions import Forbidden, Unauthorized
+
+import pagecache
+import sqlcount
+
+# ช่วงเวลาเป็นวินาที (ค่าเดียวกับ client ของ Prometheus)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # ต่อชุด label: [จำนวนในแต่ละ bucket (ไม่สะสม), ผลรวม, จำนวนทั้งหมด]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            item = self._values.get(labels)
+            if item is None:
+                item = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    item[0][i] += 1
+                    break
+            item[1] += value
+            item[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    # {labels: (ผลรวม, จำนวน)} สำหรับอ่านค่าในโปรแกรม เช่น benchmark
+    def totals(self):
+        with self._lock:
+            return {labels: (item[1], item[2]) for labels, item in self._values.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket in zip(self.buckets, counts):
+                    cumulative += bucket
+                    le = _labels(self.labels, labels, [("le", _number(bound))])
+                    lines.append(f"{self.name}_bucket{le} {cumulative}")
+                le = _labels(self.labels, labels, [("le", "+Inf")])
+                lines.append(f"{self.name}_bucket{le} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {total!r}")
+                lines.append(f"{self.name}_count{_labels(self.labels, labels)} {count}")
+        return lines
+
+
+request_seconds = Histogram(
+    "http_request_duration_seconds",
+    "Time spent in the view and response hooks per endpoint.",
+    ("endpoint", "method", "status"),
+)
+request_sql_queries = Histogram(
+    "http_request_sql_queries",
+    "SQL statements executed per request.",
+    ("endpoint",),
+    QUERY_COUNT_BUCKETS,
+)
+request_sql_seconds = Histogram(
+    "http_request_sql_duration_seconds",
+    "Total SQL time per request.",
+    ("endpoint",),
+)
+template_seconds = Histogram(
+    "template_render_duration_seconds",
+    "Jinja render time per template.",
+    ("template",),
+)
+password_seconds = Histogram(
+    "password_hash_duration_seconds",
+    "bcrypt hash/check time including queueing for the process pool.",
+    ("operation",),
+)
+profiled_requests = Counter(
+    "profiled_requests_total", "Requests run under the debug profiler.", ("endpoint",)
+)
+
+METRICS = [
+    request_seconds,
+    request_sql_queries,
+    request_sql_seconds,
+    template_seconds,
+    password_seconds,
+    profiled_requests,
+]
+
+# cProfile ทำงานได้ทีละตัวต่อ process จึง profile ได้ทีละ request
+_profile_lock = threading.Lock()
+
+
+def init_app(app):
+    app.config.setdefault("METRICS_TOKEN", None)
+    app.config.setdefault("PROFILE_HEADER", "X-Profile")
+    app.config.setdefault("PROFILE_DIR", None)
+    app.config.setdefault("PROFILE_LIMIT", 30)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_stop_profiler)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+
+def _start_request():
+    g.metrics_start = time.perf_counter()
+    # โหมด profile ใช้ได้เฉพาะตอน debug และต้องส่ง header มาเอง
+    if (
+        current_app.debug
+        and request.headers.get(current_app.config["PROFILE_HEADER"])
+        and _profile_lock.acquire(blocking=False)
+    ):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+# วัดถึงตอนที่ view คืน response (ไม่รวมเวลาส่ง body ของ response แบบ stream)
+def _finish_request(response):
+    start = g.pop("metrics_start", None)
+    if start is None:
+        return response
+    endpoint = request.endpoint or "none"
+    profiler = _stop_profiler()
+    if profiler is not None:
+        _dump_profile(profiler, endpoint)
+    request_seconds.observe(
+        time.perf_counter() - start, endpoint, request.method, response.status_code
+    )
+    # จำนวนและเวลาของคำสั่ง SQL นับโดย sqlcount
+    request_sql_queries.observe(len(sqlcount.statements()), endpoint)
+    request_sql_seconds.observe(sqlcount.seconds(), endpoint)
+    return response
+
+
+# ปิด profiler เสมอ แม้ request จะจบด้วย error ก่อนถึง after_request
+def _stop_profiler(error=None):
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        _profile_lock.release()
+    return profiler
+
+
+def _dump_profile(profiler, endpoint):
+    profiled_requests.inc(endpoint)
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats("cumulative").print_stats(current_app.config["PROFILE_LIMIT"])
+    current_app.logger.warning(
+        "profile for %s %s\n%s", request.method, request.path, out.getvalue()
+    )
+    directory = current_app.config["PROFILE_DIR"]
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        stats.dump_stats(os.path.join(directory, f"{endpoint}-{time.time_ns()}.prof"))
+
+
+def _before_render(sender, template, context, **extra):
+    if has_request_context():
+        g.setdefault("template_starts", []).append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    if has_request_context() and g.get("template_starts"):
+        template_seconds.observe(
+            time.perf_counter() - g.template_starts.pop(), template.name or "<string>"
+        )
+
+
+def render():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    stats = pagecache.cache.stats()
+    for name in ("hits", "misses"):
+        lines.append(f"# TYPE page_cache_{name}_total counter")
+        lines.append(f"page_cache_{name}_total {stats[name]}")
+    return "\n".join(lines) + "\n"
+
+
+# เปิดให้ Prometheus ด้วย "Authorization: Bearer <METRICS_TOKEN>" หรือผู้ใช้ที่เป็น admin
+def metrics_view():
+    token = current_app.config["METRICS_TOKEN"]
+    supplied = request.headers.get("Authorization", "")
+    if token and hmac.compare_digest(supplied, f"Bearer {token}"):
+        pass
+    elif not current_user.is_authenticated:
+        raise Unauthorized("You must be logged in to access this resource.")
+    elif not current_user.has_role("admin"):
+        raise Forbidden("You do not have permission to access this resource.")
+    return current_app.response_class(
+        render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
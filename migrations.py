@@ -0,0 +1,253 @@
+import click
+import sqlalchemy as sa
+from flask import current_app
+
+import models
+import blobstore
+import search
+import tags
+
+# ตารางเก็บเวอร์ชันของ schema (แยกจาก db.metadata เพื่อไม่ให้ create_all ยุ่งกับมัน)
+metadata = sa.MetaData()
+schema_version = sa.Table(
+    "schema_version",
+    metadata,
+    sa.Column("version", sa.Integer, nullable=False),
+)
+
+# รายการ migration เรียงตามลำดับ เวอร์ชันคือลำดับในรายการ (เริ่มที่ 1)
+# ทุกขั้นต้องรันซ้ำได้โดยไม่เสียหาย เพราะฐานข้อมูลใหม่ถูกสร้างด้วย create_all แล้ว
+MIGRATIONS = []
+
+
+def migration(func):
+    MIGRATIONS.append(func)
+    return func
+
+
+def current_version(conn):
+    schema_version.create(conn, checkfirst=True)
+    version = conn.scalar(sa.select(schema_version.c.version))
+    if version is None:
+        conn.execute(schema_version.insert().values(version=0))
+        version = 0
+    return version
+
+
+# ตรวจ schema ครั้งเดียวตอนสร้างแอป (ใน gunicorn preload_app ทำที่ process หลักก่อน fork)
+# AUTO_MIGRATE=False: ไม่แก้ schema เอง แค่เตือนถ้ายังไม่ได้รัน flask upgrade-db
+def init_app(app):
+    app.cli.add_command(upgrade_command)
+    with app.app_context():
+        if app.config.setdefault("AUTO_MIGRATE", True):
+            upgrade()
+        else:
+            check()
+
+
+def check():
+    with models.db.engine.begin() as conn:
+        version = current_version(conn)
+    if version < len(MIGRATIONS):
+        current_app.logger.warning(
+            "Database schema is at version %s, expected %s. Run 'flask upgrade-db'.",
+            version,
+            len(MIGRATIONS),
+        )
+
+
+def upgrade():
+    engine = models.db.engine
+    with engine.begin() as conn:
+        version = current_version(conn)
+    # ฐานข้อมูลที่เป็นเวอร์ชันล่าสุดแล้วไม่ต้องทำอะไรต่อ
+    if version >= len(MIGRATIONS):
+        return version
+    # สร้างตารางที่ยังไม่มี (ฐานข้อมูลใหม่) ก่อนรัน migration ที่ค้างอยู่
+    with engine.begin() as conn:
+        models.db.metadata.create_all(conn)
+    for number, step in enumerate(MIGRATIONS, start=1):
+        if number <= version:
+            continue
+        with engine.begin() as conn:
+            step(conn)
+            conn.execute(schema_version.update().values(version=number))
+    return len(MIGRATIONS)
+
+
+@click.command("upgrade-db")
+def upgrade_command():
+    """สร้าง/อัปเกรด schema ของฐานข้อมูลเป็นเวอร์ชันล่าสุด"""
+    click.echo(f"schema version {upgrade()}")
+
+
+def _columns(conn, table):
+    return {c["name"] for c in sa.inspect(conn).get_columns(table)}
+
+
+# 1: ย้ายข้อมูลไฟล์จากคอลัมน์ uploads.data ไปไว้ใน blob store
+@migration
+def move_upload_blobs(conn):
+    columns = _columns(conn, "uploads")
+    for name, type_ in [
+        ("sha256", "VARCHAR(64)"),
+        ("size", "INTEGER"),
+        ("mime_type", "VARCHAR"),
+        ("width", "INTEGER"),
+        ("height", "INTEGER"),
+    ]:
+        if name not in columns:
+            conn.execute(sa.text(f"ALTER TABLE uploads ADD COLUMN {name} {type_}"))
+    conn.execute(
+        sa.text("CREATE INDEX IF NOT EXISTS ix_uploads_sha256 ON uploads (sha256)")
+    )
+    if "data" not in columns:
+        return
+
+    # อ่านทีละแถวเพื่อไม่ต้องโหลด blob ทั้งหมดเข้าหน่วยความจำพร้อมกัน
+    ids = conn.execute(
+        sa.text("SELECT id FROM uploads WHERE data IS NOT NULL")
+    ).scalars().all()
+    for upload_id in ids:
+        data = conn.execute(
+            sa.text("SELECT data FROM uploads WHERE id = :id"), {"id": upload_id}
+        ).scalar()
+        blob = blobstore.store.save_bytes(data)
+        info = blobstore.store.probe(blob.digest)
+        conn.execute(
+            sa.text(
+                "UPDATE uploads SET sha256 = :sha256, size = :size,"
+                " mime_type = :mime_type, width = :width, height = :height,"
+                " data = NULL WHERE id = :id"
+            ),
+            {
+                "id": upload_id,
+                "sha256": blob.digest,
+                "size": blob.size,
+                "mime_type": info.mime_type,
+                "width": info.width,
+                "height": info.height,
+            },
+        )
+    conn.execute(sa.text("ALTER TABLE uploads DROP COLUMN data"))
+
+
+# 2: index สำหรับแบ่งหน้าแบบ keyset
+@migration
+def add_listing_indexes(conn):
+    conn.execute(
+        sa.text("CREATE INDEX IF NOT EXISTS ix_notes_title_id ON notes (title, id)")
+    )
+    conn.execute(
+        sa.text(
+            "CREATE INDEX IF NOT EXISTS ix_uploads_filename_id"
+            " ON uploads (filename, id)"
+        )
+    )
+
+
+# 3: รวม tag ที่ชื่อซ้ำกันให้เหลือ id ที่เล็กที่สุด แล้วสร้าง unique index บน tags.name
+@migration
+def unique_tag_names(conn):
+    keep = "SELECT name, MIN(id) AS id FROM tags GROUP BY name"
+    conn.execute(
+        sa.text(
+            "INSERT INTO note_tag (note_id, tag_id)"
+            " SELECT DISTINCT nt.note_id, keep.id FROM note_tag nt"
+            " JOIN tags t ON t.id = nt.tag_id"
+            f" JOIN ({keep}) keep ON keep.name = t.name"
+            " WHERE t.id <> keep.id AND NOT EXISTS ("
+            "  SELECT 1 FROM note_tag x"
+            "  WHERE x.note_id = nt.note_id AND x.tag_id = keep.id)"
+        )
+    )
+    conn.execute(
+        sa.text(
+            "DELETE FROM note_tag WHERE tag_id NOT IN"
+            " (SELECT MIN(id) FROM tags GROUP BY name)"
+        )
+    )
+    conn.execute(
+        sa.text("DELETE FROM tags WHERE id NOT IN (SELECT MIN(id) FROM tags GROUP BY name)")
+    )
+    conn.execute(sa.text("CREATE UNIQUE INDEX IF NOT EXISTS ix_tags_name ON tags (name)"))
+
+
+# 4: full-text index ของ note (เฉพาะ SQLite ที่มี FTS5)
+@migration
+def add_notes_search_index(conn):
+    if conn.dialect.name == "sqlite":
+        search.rebuild_index(conn)
+
+
+# 5: จำนวน note ต่อ tag (tags.note_count) นับจาก note_tag ที่มีอยู่
+@migration
+def add_tag_note_counts(conn):
+    if "note_count" not in _columns(conn, "tags"):
+        conn.execute(
+            sa.text("ALTER TABLE tags ADD COLUMN note_count INTEGER NOT NULL DEFAULT 0")
+        )
+    conn.execute(
+        sa.text("CREATE INDEX IF NOT EXISTS ix_tags_note_count ON tags (note_count)")
+    )
+    tags.rebuild_counts(conn)
+
+
+# 6: ON DELETE CASCADE บน note_tag และ user_roles และ index ของ note_tag.tag_id
+# SQLite แก้ foreign key ของตารางเดิมไม่ได้ จึงสร้างตารางใหม่แล้วคัดลอกข้อมูล
+# (ไม่มีตารางใดอ้างถึงตารางกลางทั้งสอง จึงทำได้แม้เปิด foreign_keys อยู่)
+# แถวที่อ้างถึง note/tag/user/role ที่ถูกลบไปแล้วจะไม่ถูกคัดลอก
+@migration
+def cascade_association_tables(conn):
+    for table in (models.note_tag_m2m, models.user_roles):
+        foreign_keys = sa.inspect(conn).get_foreign_keys(table.name)
+        if foreign_keys and all(
+            fk["options"].get("ondelete", "").upper() == "CASCADE"
+            for fk in foreign_keys
+        ):
+            continue
+        if conn.dialect.name == "sqlite":
+            _rebuild_table(conn, table)
+        else:
+            for fk in foreign_keys:
+                conn.execute(
+                    sa.text(f"ALTER TABLE {table.name} DROP CONSTRAINT {fk['name']}")
+                )
+            for constraint in table.foreign_key_constraints:
+                conn.execute(sa.schema.AddConstraint(constraint))
+    conn.execute(
+        sa.text("CREATE INDEX IF NOT EXISTS ix_note_tag_tag_id ON note_tag (tag_id)")
+    )
+    tags.rebuild_counts(conn)
+
+
+
+# 7: index ของ uploads ตาม (coalesce(filename, ''), id) แทน (filename, id)
+# (แบ่งหน้าแบบ keyset ข้าม filename ที่เป็น NULL ไม่ได้ ดู pagination.sort_key)
+@migration
+def index_uploads_filename_key(conn):
+    conn.execute(sa.text("DROP INDEX IF EXISTS ix_uploads_filename_id"))
+    conn.execute(
+        sa.text(
+            "CREATE INDEX IF NOT EXISTS ix_uploads_filename_key"
+            " ON uploads (coalesce(filename, ''), id)"
+        )
+    )
+
+def _rebuild_table(conn, table):
+    columns = [column.name for column in table.columns]
+    conn.execute(sa.text(f"ALTER TABLE {table.name} RENAME TO {table.name}_old"))
+    table.create(conn)
+    exists = " AND ".join(
+        f"EXISTS (SELECT 1 FROM {fk.column.table.name} p"
+        f" WHERE p.{fk.column.name} = o.{fk.parent.name})"
+        for fk in table.foreign_keys
+    )
+    conn.execute(
+        sa.text(
+            f"INSERT INTO {table.name} ({', '.join(columns)})"
+            f" SELECT {', '.join('o.' + name for name in columns)}"
+            f" FROM {table.name}_old o WHERE {exists}"
+        )
+    )
+    conn.execute(sa.text(f"DROP TABLE {table.name}_old"))
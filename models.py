@@ -4,37 +4,46 @@ from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 from sqlalchemy_serializer import SerializerMixin
 from sqlalchemy.ext.hybrid import hybrid_property
-from flask_bcrypt import Bcrypt
 from flask_login import UserMixin
 import sqlalchemy as sa
 from acl import init_acl
+import blobstore
+import database
+import migrations
+import passwords
 from werkzeug.security import generate_password_hash, check_password_hash
 
-# สร้าง instance ของ SQLAlchemy และ Bcrypt
-bcrypt = Bcrypt()
-
+# สร้าง instance ของ SQLAlchemy (การ hash รหัสผ่านอยู่ใน passwords.py)
 db = SQLAlchemy()
 
 def init_app(app):
+    database.configure(app)
     db.init_app(app)
-    init_acl(app)
     with app.app_context():
-        db.create_all()
+        database.install_pragmas(db.engine, app.config)
+        database.dispose_after_fork(db.engine)
+    init_acl(app)
+    passwords.init_app(app)
+    blobstore.store.init_app(app)
+    migrations.init_app(app)
 
 # ตารางกลางสำหรับความสัมพันธ์ Many-to-Many ระหว่าง Note และ Tag
+# ลบ note หรือ tag แล้วแถวใน note_tag ถูกลบตาม (ON DELETE CASCADE)
+# index ของ tag_id ใช้หา note ของ tag และให้ cascade ตอนลบ tag ไม่ต้องอ่านทั้งตาราง
 note_tag_m2m = sa.Table(
     "note_tag",
     db.metadata,
-    sa.Column("note_id", sa.ForeignKey("notes.id"), primary_key=True),
-    sa.Column("tag_id", sa.ForeignKey("tags.id"), primary_key=True),
+    sa.Column("note_id", sa.ForeignKey("notes.id", ondelete="CASCADE"), primary_key=True),
+    sa.Column("tag_id", sa.ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+    sa.Index("ix_note_tag_tag_id", "tag_id"),
 )
 
 # ตารางกลางสำหรับความสัมพันธ์ Many-to-Many ระหว่าง User และ Role
 user_roles = sa.Table(
     "user_roles",
     db.metadata,
-    sa.Column("user_id", sa.ForeignKey("users.id"), primary_key=True),
-    sa.Column("role_id", sa.ForeignKey("roles.id"), primary_key=True),
+    sa.Column("user_id", sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    sa.Column("role_id", sa.ForeignKey("roles.id", ondelete="CASCADE"), primary_key=True),
 )
 
 # โมเดล Role
@@ -59,11 +68,15 @@ class User(db.Model, UserMixin):
 
     # ตั้งค่ารหัสผ่าน
     def set_password(self, password):
-        self._password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self._password_hash = passwords.hasher.hash(password)
 
-    # ตรวจสอบรหัสผ่าน
+    # ตรวจสอบรหัสผ่าน (ถ้า work factor ของ hash เดิมไม่ตรงกับค่าปัจจุบันจะ hash ใหม่ให้)
     def check_password(self, password):
-        return bcrypt.check_password_hash(self._password_hash, password)
+        if not passwords.hasher.check(self._password_hash, password):
+            return False
+        if passwords.hasher.needs_rehash(self._password_hash):
+            self.set_password(password)
+        return True
 
     # ตรวจสอบว่าผู้ใช้มีบทบาทหรือไม่
     def has_role(self, role_name):
@@ -73,12 +86,17 @@ class User(db.Model, UserMixin):
 class Tag(db.Model):
     __tablename__ = "tags"
     id: Mapped[int] = mapped_column(sa.Integer, primary_key=True)
-    name: Mapped[str] = mapped_column(sa.String, nullable=False)
+    name: Mapped[str] = mapped_column(sa.String, nullable=False, unique=True, index=True)
+    # จำนวน note ที่ใช้ tag นี้ (ปรับทีละส่วนใน tags.py ไม่ต้อง GROUP BY note_tag)
+    note_count: Mapped[int] = mapped_column(
+        sa.Integer, nullable=False, default=0, server_default="0", index=True
+    )
     created_date = mapped_column(sa.DateTime(timezone=True), server_default=func.now())
 
 # โมเดล Note
 class Note(db.Model):
     __tablename__ = "notes"
+    __table_args__ = (sa.Index("ix_notes_title_id", "title", "id"),)
     id: Mapped[int] = mapped_column(sa.Integer, primary_key=True)
     title: Mapped[str] = mapped_column(sa.String, nullable=False)
     description: Mapped[str] = mapped_column(sa.Text)
@@ -90,11 +108,22 @@ class Note(db.Model):
         server_onupdate=func.now(),
     )
 
-# โมเดล Upload
+# โมเดล Upload (เก็บเฉพาะข้อมูลของไฟล์ ตัวไฟล์อยู่ใน blobstore ตาม sha256)
 class Upload(db.Model):
     __tablename__ = "uploads"
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String)
-    data = db.Column(db.LargeBinary)
+    sha256 = db.Column(db.String(64), index=True)
+    size = db.Column(db.Integer)
+    mime_type = db.Column(db.String)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
     created_date = mapped_column(sa.DateTime(timezone=True), server_default=func.now())
     updated_date = mapped_column(sa.DateTime(timezone=True), server_default=func.now())
+
+# index สำหรับแบ่งหน้าตามชื่อไฟล์ (filename เป็น NULL ได้ จึงเรียงด้วย coalesce เหมือน pagination)
+sa.Index(
+    "ix_uploads_filename_key",
+    sa.func.coalesce(Upload.filename, sa.literal_column("''")),
+    Upload.id,
+)
@@ -0,0 +1,213 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, request
+from flask_login import current_user
+from markupsafe import Markup
+
+import commithooks
+import models
+from ttlcache import TTLCache
+
+# ตารางที่ถ้ามีการเขียนแล้ว commit จะล้าง cache ทั้งหมด
+WATCHED_TABLES = frozenset({"notes", "tags", "uploads", "note_tag"})
+
+
+# เก็บใน memory ของ process แบบ LRU + TTL
+# ล้างได้เฉพาะใน process ที่ commit เท่านั้น: ถ้ามีหลาย worker ตัวอื่นจะยังส่งหน้าเดิม
+# ได้นานถึง PAGE_CACHE_TTL จึงใช้เป็นค่าเริ่มต้นเฉพาะเมื่อมี worker เดียว (ดู default_backend)
+class MemoryBackend(TTLCache):
+    def __init__(self, maxsize=512, ttl=300):
+        super().__init__(maxsize, ttl)
+
+
+# เก็บเป็นไฟล์ในเครื่อง ใช้ร่วมกันได้ทุก worker process (ล้างจาก process ใดก็มีผลกับทุกตัว)
+# อายุของ entry นับจาก mtime และ LRU ใช้ atime ที่อัปเดตเองเมื่ออ่าน
+class FileBackend:
+    def __init__(self, path, maxsize=4096, ttl=300):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._writes = 0
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, hashlib.sha256(repr(key).encode()).hexdigest())
+
+    def get(self, key):
+        path = self._file(key)
+        try:
+            stat = os.stat(path)
+            if stat.st_mtime + self.ttl < time.time():
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                stored_key, value = pickle.load(f)
+            os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return value if stored_key == key else None
+
+    def set(self, key, value):
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((key, value), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._file(key))
+        self._writes += 1
+        if self._writes % 64 == 0:
+            self._prune()
+
+    def _entries(self):
+        with os.scandir(self.path) as entries:
+            return [entry for entry in entries if not entry.name.startswith(".")]
+
+    def _prune(self):
+        entries = self._entries()
+        if len(entries) <= self.maxsize:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_atime)
+        for entry in entries[: len(entries) - self.maxsize]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def clear(self):
+        for entry in self._entries():
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+# backend เริ่มต้น: "file" เมื่อ gunicorn มีหลาย worker (WEB_CONCURRENCY, ดู gunicorn.conf.py)
+# เพื่อให้การล้าง cache หลัง commit มีผลกับทุก worker ไม่เช่นนั้นใช้ "memory"
+def default_backend():
+    workers = os.environ.get("WEB_CONCURRENCY")
+    return "file" if workers and int(workers) > 1 else "memory"
+
+
+# cache ของหน้าเว็บและชิ้นส่วน template พร้อมตัวนับ hit/miss
+# เปลี่ยน backend ได้ผ่าน PAGE_CACHE_BACKEND ("memory", "file" หรือ "none")
+# หรือกำหนด cache.backend เป็น object ที่มี get/set/clear เอง
+class PageCache:
+    def __init__(self):
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        kind = app.config.setdefault("PAGE_CACHE_BACKEND", default_backend())
+        size = app.config.setdefault("PAGE_CACHE_SIZE", 512)
+        ttl = app.config.setdefault("PAGE_CACHE_TTL", 300)
+        if kind == "memory":
+            self.backend = MemoryBackend(size, ttl)
+        elif kind == "file":
+            path = app.config.setdefault(
+                "PAGE_CACHE_PATH", os.path.join(app.instance_path, "pagecache")
+            )
+            self.backend = FileBackend(path, size, ttl)
+        elif kind == "none":
+            self.backend = None
+        else:
+            raise ValueError(f"Unknown PAGE_CACHE_BACKEND: {kind!r}")
+        app.jinja_env.globals["cached_fragment"] = self.fragment
+
+        _hook.register(models.db.session)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        if self.backend is None:
+            return None
+        value = self.backend.get(key)
+        self._count(value is not None)
+        return value
+
+    def set(self, key, value):
+        if self.backend is not None:
+            self.backend.set(key, value)
+
+    def invalidate(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+    # ใช้ใน template: {% call cached_fragment("note-card", note.id) %}...{% endcall %}
+    def fragment(self, *key, caller):
+        key = ("fragment",) + key + (audience(),)
+        html = self.get(key)
+        if html is None:
+            html = str(caller())
+            self.set(key, html)
+        return Markup(html)
+
+
+cache = PageCache()
+
+
+# ผู้ใช้ที่เห็นหน้าเดียวกันได้: ยังไม่ล็อกอิน หรือกลุ่มตาม role
+def audience():
+    if not current_user.is_authenticated:
+        return ("anonymous",)
+    return ("user",) + tuple(sorted(current_user.roles))
+
+
+# cache ผลลัพธ์ทั้งหน้า (เฉพาะ GET ที่ตอบ 200) key ตาม URL และ audience()
+# anonymous_only=True: cache เฉพาะผู้ที่ยังไม่ล็อกอิน
+def cached(anonymous_only=False):
+    def wrapper(func):
+        @wraps(func)
+        def wrapped(*args, **kwargs):
+            if request.method != "GET" or (
+                anonymous_only and current_user.is_authenticated
+            ):
+                return func(*args, **kwargs)
+            key = ("page", request.full_path, audience())
+            stored = cache.get(key)
+            if stored is not None:
+                body, mimetype = stored
+                response = current_app.response_class(body, mimetype=mimetype)
+                response.headers["X-Cache"] = "HIT"
+                return response
+            response = current_app.make_response(func(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                cache.set(key, (response.get_data(), response.mimetype))
+                response.headers["X-Cache"] = "MISS"
+            return response
+
+        return wrapped
+
+    return wrapper
+
+
+# ล้าง cache ทั้งหมดเมื่อ commit การแก้ Note/Tag/Upload หรือการเขียนตารางใน WATCHED_TABLES
+def _changed(session):
+    for obj in commithooks.pending(session):
+        if isinstance(obj, (models.Note, models.Tag, models.Upload)):
+            return {None}
+    return None
+
+
+_hook = commithooks.CommitHook(
+    "page_cache_stale", _changed, lambda changes: cache.invalidate(), WATCHED_TABLES
+)
@@ -0,0 +1,116 @@
+import base64
+import binascii
+import json
+
+import sqlalchemy as sa
+from flask import current_app, request, stream_template, render_template
+from werkzeug.exceptions import BadRequest
+
+import models
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# จำนวนแถวที่ดึงจากฐานข้อมูลต่อครั้ง (selectinload ก็โหลดทีละชุดเท่านี้)
+FETCH_SIZE = 100
+# ชนิดของค่าที่ cursor เก็บได้ (ค่าของคอลัมน์ที่ใช้เรียง ไม่มี None ดู sort_key)
+CURSOR_TYPES = (str, int, float)
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise BadRequest("Invalid cursor")
+    if not isinstance(values, list) or not all(
+        isinstance(value, CURSOR_TYPES) and not isinstance(value, bool)
+        for value in values
+    ):
+        raise BadRequest("Invalid cursor")
+    return values
+
+
+def _nullable_text(column):
+    column = column.expression
+    return getattr(column, "nullable", False) and column.type.python_type is str
+
+
+# นิพจน์ที่ใช้เรียงและเทียบ: คอลัมน์ข้อความที่เป็น NULL ได้ใช้ coalesce(column, '')
+# เพราะ (NULL, id) > (...) ไม่เป็นจริงเลย หน้าจะจบที่แถวที่เป็น NULL
+# (ต้องมี index ของนิพจน์เดียวกัน เช่น ix_uploads_filename_key)
+def sort_key(column):
+    if _nullable_text(column):
+        return sa.func.coalesce(column, sa.literal_column("''"))
+    return column
+
+
+def _cursor_value(item, column):
+    value = getattr(item, column.key)
+    return "" if value is None and _nullable_text(column) else value
+
+
+# ผลลัพธ์หนึ่งหน้า: query จะรันตอนเริ่มวนลูป (ภายใน session ของตอน render จริง
+# ซึ่งสำคัญสำหรับโหมด stream) และวนได้ทีละแถวโดยไม่ต้องโหลดทั้งหน้าเข้าหน่วยความจำ
+# next_cursor จะมีค่าหลังจากวนลูปจนจบแล้ว (ถ้ามีหน้าถัดไป)
+class Page:
+    def __init__(self, statement, columns, limit):
+        self._statement = statement
+        self._columns = columns
+        self.limit = limit
+        self.next_cursor = None
+
+    def __iter__(self):
+        last = None
+        result = models.db.session.execute(self._statement).scalars()
+        for count, item in enumerate(result):
+            if count == self.limit:
+                self.next_cursor = encode_cursor(
+                    [_cursor_value(last, column) for column in self._columns]
+                )
+                break
+            last = item
+            yield item
+
+
+def page_limit(maximum=MAX_PAGE_SIZE):
+    limit = request.args.get("limit", PAGE_SIZE, type=int)
+    return max(1, min(limit, maximum))
+
+
+# แบ่งหน้าแบบ keyset: WHERE (col1, col2) > (ค่าจาก cursor) ORDER BY col1, col2 LIMIT n
+# columns ต้องเป็นชุดที่ไม่ซ้ำกัน (เช่นลงท้ายด้วย id) และมี index ครอบคลุม
+def keyset_page(statement, columns, after=None, limit=None):
+    if after is None:
+        after = request.args.get("after")
+    limit = limit or page_limit()
+    keys = [sort_key(column) for column in columns]
+    statement = statement.order_by(*keys)
+    if after:
+        values = decode_cursor(after)
+        # ชนิดต้องตรงกับคอลัมน์ด้วย ไม่เช่นนั้นฐานข้อมูลบางตัวจะ error ตอนเปรียบเทียบ
+        if len(values) != len(columns) or not all(
+            isinstance(value, column.type.python_type)
+            for value, column in zip(values, columns)
+        ):
+            raise BadRequest("Invalid cursor")
+        statement = statement.where(sa.tuple_(*keys) > sa.tuple_(*values))
+    statement = statement.limit(limit + 1).execution_options(yield_per=FETCH_SIZE)
+    return Page(statement, columns, limit)
+
+
+# render หน้ารายการ; ถ้าเปิด STREAM_TEMPLATES หรือส่ง ?stream=1 จะส่ง HTML ออกไปทีละส่วน
+# ระหว่างที่ยังอ่านแถวจากฐานข้อมูลอยู่
+def render_listing(template, **context):
+    stream = request.args.get("stream")
+    if stream is None:
+        stream = current_app.config.get("STREAM_TEMPLATES", False)
+    else:
+        stream = stream not in ("", "0", "false")
+    if stream:
+        return current_app.response_class(stream_template(template, **context))
+    return render_template(template, **context)
@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as PoolTimeout
+
+import bcrypt
+from flask import current_app
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+
+import metrics
+
+# bcrypt ใช้รหัสผ่านแค่ 72 byte แรก (ตัดเหมือนเวอร์ชันเก่าเพื่อให้ hash เดิมยังตรวจได้)
+MAX_PASSWORD_BYTES = 72
+
+
+def _encode(password):
+    return password.encode("utf-8")[:MAX_PASSWORD_BYTES]
+
+
+# ฟังก์ชันที่รันใน process ลูก (ต้องอยู่ระดับ module เพื่อให้ pickle ได้)
+def _hash(password, rounds):
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _check(password, password_hash):
+    try:
+        return bcrypt.checkpw(_encode(password), password_hash.encode("utf-8"))
+    except ValueError:
+        return False
+
+
+def hash_rounds(password_hash):
+    try:
+        return int(password_hash.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+# รัน bcrypt ใน process pool ที่จำกัดขนาด เพื่อไม่ให้ thread ของ request แย่ง CPU/GIL กัน
+# ถ้างานค้างเกิน queue_depth จะตอบ 503 พร้อม Retry-After ทันทีแทนการรอ
+# และถ้ารอผลเกิน timeout วินาทีก็ตอบ 503 เช่นกัน
+class PasswordHasher:
+    def __init__(self):
+        self.workers = 0
+        self.queue_depth = 0
+        self.timeout = 10
+        self._executor = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault("BCRYPT_LOG_ROUNDS", 12)
+        self.workers = app.config.setdefault("PASSWORD_WORKERS", os.cpu_count() or 1)
+        self.queue_depth = app.config.setdefault("PASSWORD_QUEUE_DEPTH", self.workers * 4)
+        self.timeout = app.config.setdefault("PASSWORD_TIMEOUT", 10)
+        self._slots = threading.BoundedSemaphore(self.queue_depth)
+
+    # สร้าง pool หลัง fork ของ gunicorn เท่านั้น (และสร้างใหม่ถ้า pid เปลี่ยน)
+    def _pool(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+        if not self._slots.acquire(blocking=False):
+            raise ServiceUnavailable(
+                "Too many password checks in progress, try again shortly.",
+                retry_after=1,
+            )
+        try:
+            future = self._pool().submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # คืน slot เมื่องานเสร็จจริง (งานที่รอจนหมดเวลายังใช้ process ใน pool อยู่)
+        future.add_done_callback(lambda future: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except PoolTimeout:
+            # งานที่ยังไม่เริ่มจะถูกยกเลิกและคืน slot ทันที
+            future.cancel()
+            raise ServiceUnavailable(
+                "Password check timed out, try again shortly.",
+                retry_after=self.timeout,
+            )
+
+    def hash(self, password):
+        with metrics.password_seconds.time("hash"):
+            return self._run(_hash, password, current_app.config["BCRYPT_LOG_ROUNDS"])
+
+    def check(self, password_hash, password):
+        with metrics.password_seconds.time("check"):
+            return self._run(_check, password, password_hash)
+
+    def needs_rehash(self, password_hash):
+        return hash_rounds(password_hash) != current_app.config["BCRYPT_LOG_ROUNDS"]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+# จำกัดจำนวนครั้งที่ล็อกอินผิดต่อ username และต่อ IP ภายในช่วงเวลา (sliding window)
+# ตรวจก่อนเริ่ม hash จึงปฏิเสธได้โดยแทบไม่เสีย CPU
+# ตัวนับอยู่ใน memory ของแต่ละ process: ถ้า gunicorn มี N worker การล็อกอินผิดที่ถูกส่งไป
+# หลาย worker จะถูกปฏิเสธหลังผิดได้ถึง LOGIN_MAX_FAILURES_PER_* x N ครั้ง
+# ตั้งค่าให้เหมาะกับจำนวน worker (WEB_CONCURRENCY)
+class LoginThrottle:
+    def __init__(self, per_username=5, per_ip=20, window=300):
+        self.per_username = per_username
+        self.per_ip = per_ip
+        self.window = window
+        self._failures = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.per_username = app.config.setdefault("LOGIN_MAX_FAILURES_PER_USERNAME", 5)
+        self.per_ip = app.config.setdefault("LOGIN_MAX_FAILURES_PER_IP", 20)
+        self.window = app.config.setdefault("LOGIN_FAILURE_WINDOW", 300)
+
+    def _recent(self, key, now):
+        failures = self._failures.get(key)
+        if not failures:
+            return 0
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return 0
+        return len(failures)
+
+    def check(self, username, ip):
+        now = time.monotonic()
+        with self._lock:
+            if (
+                self._recent(("user", username), now) >= self.per_username
+                or self._recent(("ip", ip), now) >= self.per_ip
+            ):
+                raise TooManyRequests(
+                    "Too many failed login attempts, try again later.",
+                    retry_after=self.window,
+                )
+
+    def failed(self, username, ip):
+        now = time.monotonic()
+        with self._lock:
+            # กันไม่ให้ตารางโตไม่จำกัดเมื่อมีการเดา username จำนวนมาก
+            if len(self._failures) > 10000:
+                for key in list(self._failures):
+                    self._recent(key, now)
+            self._failures[("user", username)].append(now)
+            self._failures[("ip", ip)].append(now)
+
+    def succeeded(self, username):
+        with self._lock:
+            self._failures.pop(("user", username), None)
+
+
+hasher = PasswordHasher()
+throttle = LoginThrottle()
+
+
+def init_app(app):
+    hasher.init_app(app)
+    throttle.init_app(app)
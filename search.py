@@ -0,0 +1,174 @@
+import click
+import sqlalchemy as sa
+from markupsafe import Markup, escape
+
+import models
+import tags
+
+# ใช้ตัวอักษรควบคุมเป็นตัวคั่นผลไฮไลต์ แล้วค่อยแปลงเป็น <mark> หลัง escape HTML
+MARK_START = "\x02"
+MARK_END = "\x03"
+# tokenizer แบบ trigram ค้นหาคำย่อยได้ทุกภาษา (ภาษาไทยไม่มีช่องว่างระหว่างคำ)
+# แต่ละคำค้นต้องยาวอย่างน้อย 3 ตัวอักษร
+MIN_TERM_LENGTH = 3
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+
+def init_app(app):
+    app.cli.add_command(rebuild_command)
+
+
+def is_supported():
+    return models.db.engine.dialect.name == "sqlite"
+
+
+# สร้างตาราง FTS5 ที่อ้างอิงเนื้อหาจากตาราง notes และ trigger สำหรับอัปเดต index ทีละแถว
+def create_index(conn):
+    conn.execute(
+        sa.text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5("
+            "title, description, content='notes', content_rowid='id',"
+            " tokenize='trigram')"
+        )
+    )
+    conn.execute(
+        sa.text(
+            "CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN"
+            " INSERT INTO notes_fts (rowid, title, description)"
+            " VALUES (new.id, new.title, new.description);"
+            " END"
+        )
+    )
+    conn.execute(
+        sa.text(
+            "CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN"
+            " INSERT INTO notes_fts (notes_fts, rowid, title, description)"
+            " VALUES ('delete', old.id, old.title, old.description);"
+            " END"
+        )
+    )
+    conn.execute(
+        sa.text(
+            "CREATE TRIGGER IF NOT EXISTS notes_fts_au"
+            " AFTER UPDATE OF title, description ON notes BEGIN"
+            " INSERT INTO notes_fts (notes_fts, rowid, title, description)"
+            " VALUES ('delete', old.id, old.title, old.description);"
+            " INSERT INTO notes_fts (rowid, title, description)"
+            " VALUES (new.id, new.title, new.description);"
+            " END"
+        )
+    )
+
+
+def rebuild_index(conn):
+    create_index(conn)
+    conn.execute(sa.text("INSERT INTO notes_fts (notes_fts) VALUES ('rebuild')"))
+
+
+# แปลงข้อความที่ผู้ใช้พิมพ์เป็น query ของ FTS5 (ทุกคำต้องพบ, ใส่ "" กัน syntax พิเศษ)
+def match_expression(text):
+    terms = [term for term in (text or "").split() if len(term) >= MIN_TERM_LENGTH]
+    return " AND ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _highlight(value):
+    value = str(escape(value or ""))
+    return Markup(value.replace(MARK_START, "<mark>").replace(MARK_END, "</mark>"))
+
+
+# จำกัดผลลัพธ์เฉพาะ note ที่มี tag ใด tag หนึ่งในรายการ
+TAG_FILTER = (
+    " AND EXISTS (SELECT 1 FROM note_tag JOIN tags ON tags.id = note_tag.tag_id"
+    " WHERE note_tag.note_id = notes.id AND tags.name IN :tag_names)"
+)
+
+
+# อ่านเงื่อนไขค้นหาจาก query string (ใช้ทั้งหน้า /search และ /api/v1/search)
+# q, tag (ระบุซ้ำได้หรือคั่นด้วย ,), limit และ offset
+def parse_args(args):
+    limit = max(1, min(args.get("limit", SEARCH_LIMIT, type=int), MAX_SEARCH_LIMIT))
+    offset = max(0, args.get("offset", 0, type=int))
+    tag_names = tags.normalize(
+        name for value in args.getlist("tag") for name in value.split(",")
+    )
+    return args.get("q", ""), tag_names, limit, offset
+
+
+# ผลลัพธ์ของ search_notes ในรูปที่แปลงเป็น JSON ได้ (title/snippet เป็น HTML ที่ escape แล้ว)
+def as_json(results):
+    return [
+        dict(result, title=str(result["title"]), snippet=str(result["snippet"]))
+        for result in results
+    ]
+
+
+# ค้นหา note เรียงตามคะแนน BM25 (title มีน้ำหนักมากกว่า description)
+# คืนค่า list ของ dict: id, title, snippet (Markup), rank
+def search_notes(text, tag_names=(), limit=SEARCH_LIMIT, offset=0):
+    expression = match_expression(text)
+    if not expression:
+        return []
+    if not is_supported():
+        return _search_like(text, tag_names, limit, offset)
+    statement = sa.text(
+        "SELECT notes.id,"
+        f" highlight(notes_fts, 0, '{MARK_START}', '{MARK_END}') AS title,"
+        f" snippet(notes_fts, 1, '{MARK_START}', '{MARK_END}', '…', 16) AS snippet,"
+        " bm25(notes_fts, 10.0, 1.0) AS rank"
+        " FROM notes_fts JOIN notes ON notes.id = notes_fts.rowid"
+        " WHERE notes_fts MATCH :expression"
+        + (TAG_FILTER if tag_names else "")
+        + " ORDER BY rank LIMIT :limit OFFSET :offset"
+    )
+    params = {"expression": expression, "limit": limit, "offset": offset}
+    if tag_names:
+        statement = statement.bindparams(
+            sa.bindparam("tag_names", list(tag_names), expanding=True)
+        )
+    rows = models.db.session.execute(statement, params)
+    return [
+        {
+            "id": row.id,
+            "title": _highlight(row.title),
+            "snippet": _highlight(row.snippet),
+            "rank": row.rank,
+        }
+        for row in rows
+    ]
+
+
+# ฐานข้อมูลอื่นที่ไม่มี FTS5: ค้นด้วย LIKE (ไม่มีการจัดอันดับ)
+def _search_like(text, tag_names, limit, offset):
+    Note = models.Note
+    statement = models.db.select(Note.id, Note.title, Note.description)
+    for term in text.split():
+        if len(term) >= MIN_TERM_LENGTH:
+            pattern = f"%{term}%"
+            statement = statement.where(
+                sa.or_(Note.title.ilike(pattern), Note.description.ilike(pattern))
+            )
+    if tag_names:
+        statement = statement.where(
+            Note.tags.any(models.Tag.name.in_(list(tag_names)))
+        )
+    statement = statement.order_by(Note.title, Note.id).limit(limit).offset(offset)
+    return [
+        {
+            "id": row.id,
+            "title": escape(row.title),
+            "snippet": escape((row.description or "")[:200]),
+            "rank": None,
+        }
+        for row in models.db.session.execute(statement)
+    ]
+
+
+@click.command("rebuild-search")
+def rebuild_command():
+    """สร้าง full-text index ของ note ใหม่ทั้งหมด"""
+    if not is_supported():
+        raise click.ClickException("Full-text index requires SQLite FTS5")
+    with models.db.engine.begin() as conn:
+        rebuild_index(conn)
+    click.echo("search index rebuilt")
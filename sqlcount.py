@@ -0,0 +1,88 @@
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import sqlalchemy as sa
+from flask import current_app, g, has_app_context
+
+import models
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+# นับคำสั่ง SQL และเวลาที่ใช้ในแต่ละ request (เก็บใน flask.g จึงไม่ปนกันระหว่าง thread)
+# metrics อ่านค่าจากที่นี่ (statements() และ seconds()) ไม่ได้นับซ้ำเอง
+def init_app(app):
+    with app.app_context():
+        engine = models.db.engine
+        if not sa.event.contains(engine, "before_cursor_execute", _record):
+            sa.event.listen(engine, "before_cursor_execute", _record)
+            sa.event.listen(engine, "after_cursor_execute", _finish)
+
+
+def _record(conn, cursor, statement, parameters, context, executemany):
+    # connection หนึ่งรันทีละคำสั่ง จึงเก็บเวลาเริ่มไว้ค่าเดียว
+    conn.info["query_start"] = time.perf_counter()
+    if has_app_context():
+        g.setdefault("sql_statements", []).append(statement)
+
+
+def _finish(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info.pop("query_start", None)
+    if start is not None and has_app_context():
+        g.sql_seconds = g.get("sql_seconds", 0.0) + time.perf_counter() - start
+
+
+def statements():
+    if not has_app_context():
+        return []
+    return g.get("sql_statements", [])
+
+
+# เวลารวมที่รอฐานข้อมูล (วินาที) ของคำสั่งที่ทำเสร็จแล้วใน app context นี้
+def seconds():
+    if not has_app_context():
+        return 0.0
+    return g.get("sql_seconds", 0.0)
+
+
+# ใช้ใน test / benchmark: นับคำสั่ง SQL ทั้งหมดที่รันภายในบล็อก with
+@contextmanager
+def count_queries(engine=None):
+    engine = engine or models.db.engine
+    recorded = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        recorded.append(statement)
+
+    sa.event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield recorded
+    finally:
+        sa.event.remove(engine, "before_cursor_execute", record)
+
+
+# กำหนดจำนวนคำสั่ง SQL สูงสุดของ route (รวมการ render template)
+# ถ้าเกิน: โหมด strict จะ raise QueryBudgetExceeded ไม่เช่นนั้นจะเขียน warning ลง log
+def query_budget(limit):
+    def wrapper(func):
+        @wraps(func)
+        def wrapped(*args, **kwargs):
+            start = len(statements())
+            result = func(*args, **kwargs)
+            used = statements()[start:]
+            if len(used) > limit:
+                message = (
+                    f"{func.__name__} ran {len(used)} SQL statements"
+                    f" (budget {limit}):\n" + "\n".join(used)
+                )
+                if current_app.config.get("QUERY_BUDGET_STRICT", current_app.testing):
+                    raise QueryBudgetExceeded(message)
+                current_app.logger.warning(message)
+            return result
+
+        return wrapped
+
+    return wrapper
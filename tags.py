@@ -0,0 +1,217 @@
+import bisect
+import heapq
+import importlib
+import threading
+import time
+from collections import Counter
+
+import click
+import sqlalchemy as sa
+
+import commithooks
+import models
+
+# จำนวนชื่อสูงสุดต่อหนึ่ง IN (...) เพื่อไม่ให้เกินจำนวน parameter ที่ฐานข้อมูลรับได้
+IN_BATCH = 500
+# ตารางที่ถ้ามีการเขียนแล้ว commit จะต้องสร้าง index ของ tag ใหม่
+# (รวม notes เพราะลบ note แบบ bulk แล้วแถวใน note_tag ถูกลบตามด้วย cascade)
+WATCHED_TABLES = frozenset({"notes", "tags", "note_tag"})
+
+
+def normalize(names):
+    result = []
+    seen = set()
+    for name in names:
+        name = (name or "").strip()
+        if name and name not in seen:
+            seen.add(name)
+            result.append(name)
+    return result
+
+
+def _insert_ignore(bind):
+    dialect = bind.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        # import เฉพาะ dialect ที่ใช้ (sqlalchemy.dialects.postgresql ใช้เวลา import นาน)
+        insert = importlib.import_module(f"sqlalchemy.dialects.{dialect}").insert
+        return insert(models.Tag).on_conflict_do_nothing(index_elements=["name"])
+    return sa.insert(models.Tag)
+
+
+def _select_by_name(names):
+    db = models.db
+    found = {}
+    for start in range(0, len(names), IN_BATCH):
+        chunk = names[start : start + IN_BATCH]
+        for tag in db.session.execute(
+            db.select(models.Tag).where(models.Tag.name.in_(chunk))
+        ).scalars():
+            found[tag.name] = tag
+    return found
+
+
+# แปลงรายชื่อ tag เป็น object Tag ตามลำดับเดิม
+# ค้นหาทั้งหมดด้วย IN ครั้งเดียว แล้วสร้างเฉพาะที่ยังไม่มีด้วย INSERT ... ON CONFLICT DO NOTHING
+# (ถ้ามีคนสร้างชื่อเดียวกันพร้อมกัน unique index จะกันไม่ให้ซ้ำ)
+def resolve_tags(names):
+    names = normalize(names)
+    if not names:
+        return []
+    session = models.db.session
+    found = _select_by_name(names)
+    missing = [name for name in names if name not in found]
+    if missing:
+        session.execute(
+            _insert_ignore(session.get_bind()), [{"name": name} for name in missing]
+        )
+        found.update(_select_by_name(missing))
+    return [found[name] for name in names]
+
+
+# จำนวน note ของแต่ละ tag เก็บใน tags.note_count และปรับทีละส่วนเมื่อ Note.tags เปลี่ยน
+# (ORM: ดูจาก history ของ collection ตอน flush, bulk insert: เรียก adjust_counts เอง)
+def init_app(app):
+    app.config.setdefault("TAG_SUGGEST_LIMIT", 10)
+    app.config.setdefault("TAG_CLOUD_SIZE", 100)
+    app.config.setdefault("TAG_INDEX_TTL", 60)
+    app.cli.add_command(rebuild_counts_command)
+    index.ttl = app.config["TAG_INDEX_TTL"]
+
+    session = models.db.session
+    if not sa.event.contains(session, "after_flush", _apply_counts):
+        sa.event.listen(session, "after_flush", _apply_counts)
+    _hook.register(session)
+
+
+# deltas: {tag_id: จำนวนที่เพิ่ม/ลด} ใช้ UPDATE แบบบวกค่าเดิม จึงไม่ชนกับ request อื่นที่แก้พร้อมกัน
+def adjust_counts(connection, deltas):
+    rows = [
+        {"tag_id": tag_id, "delta": delta} for tag_id, delta in deltas.items() if delta
+    ]
+    if not rows:
+        return
+    table = models.Tag.__table__
+    connection.execute(
+        table.update()
+        .where(table.c.id == sa.bindparam("tag_id"))
+        .values(note_count=table.c.note_count + sa.bindparam("delta")),
+        rows,
+    )
+
+
+# นับใหม่ทั้งหมดจาก note_tag (ใช้ใน migration และเมื่อแก้ note_tag ตรง ๆ)
+def rebuild_counts(connection):
+    table = models.Tag.__table__
+    link = models.note_tag_m2m
+    connection.execute(
+        table.update().values(
+            note_count=sa.select(sa.func.count())
+            .where(link.c.tag_id == table.c.id)
+            .scalar_subquery()
+        )
+    )
+
+
+# คำนวณจำนวนที่เปลี่ยนของแต่ละ tag จาก history ของ Note.tags (ใช้ใน _apply_counts)
+# และคืนว่า index ต้องสร้างใหม่เมื่อจำนวนหรือ Tag เปลี่ยน
+def _collect_counts(session):
+    deltas = Counter()
+    for note in list(session.new) + list(session.dirty):
+        if isinstance(note, models.Note) and note not in session.deleted:
+            history = sa.inspect(note).attrs.tags.history
+            deltas.update(history.added)
+            deltas.subtract(history.deleted)
+    for note in session.deleted:
+        if isinstance(note, models.Note):
+            note.tags  # โหลด collection ก่อน ถ้ายังไม่ได้โหลด history จะว่าง
+            history = sa.inspect(note).attrs.tags.history
+            deltas.subtract(list(history.unchanged) + list(history.deleted))
+    # แทนที่ค่าเดิมทุกครั้ง จึงไม่เหลือค่าจาก flush ที่ rollback ไปแล้ว
+    session.info["tag_count_deltas"] = deltas
+    if deltas or any(
+        isinstance(obj, models.Tag) for obj in commithooks.pending(session)
+    ):
+        return {None}
+    return None
+
+
+# หลัง flush แล้ว tag ใหม่จึงมี id
+def _apply_counts(session, flush_context):
+    deltas = session.info.pop("tag_count_deltas", None)
+    if deltas:
+        adjust_counts(
+            session.connection(), {tag.id: delta for tag, delta in deltas.items()}
+        )
+
+
+_hook = commithooks.CommitHook(
+    "tag_index_stale",
+    _collect_counts,
+    lambda changes: index.invalidate(),
+    WATCHED_TABLES,
+)
+
+
+# index ของ tag ทั้งหมดใน memory เรียงตามชื่อตัวพิมพ์เล็ก ค้นหาคำขึ้นต้นด้วย bisect
+# สร้างใหม่เมื่อมีการ commit ที่แก้ tag ใน process นี้ หรือเมื่อครบ ttl วินาที
+# (worker process อื่นจะเห็นการเปลี่ยนแปลงภายใน ttl)
+class TagIndex:
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        # (ชื่อตัวพิมพ์เล็ก, [(ชื่อ, จำนวน)], เรียงตามจำนวน, ผลที่ค้นแล้ว) เปลี่ยนทั้งชุดพร้อมกัน
+        self._data = ([], [], [], {})
+        self._expires = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._expires = 0
+
+    def _load(self):
+        if self._expires > time.monotonic():
+            return self._data
+        with self._lock:
+            if self._expires <= time.monotonic():
+                rows = models.db.session.execute(
+                    sa.select(models.Tag.name, models.Tag.note_count).where(
+                        models.Tag.note_count > 0
+                    )
+                ).all()
+                entries = sorted((name.casefold(), name, count) for name, count in rows)
+                pairs = [(name, count) for _, name, count in entries]
+                self._data = (
+                    [entry[0] for entry in entries],
+                    pairs,
+                    sorted(pairs, key=lambda pair: (-pair[1], pair[0])),
+                    {},
+                )
+                self._expires = time.monotonic() + self.ttl
+            return self._data
+
+    # tag ที่ขึ้นต้นด้วย prefix (ไม่สนตัวพิมพ์) เรียงจากจำนวน note มากไปน้อย
+    def suggest(self, prefix, limit=10):
+        keys, pairs, _, found = self._load()
+        prefix = prefix.casefold()
+        result = found.get((prefix, limit))
+        if result is None:
+            start = bisect.bisect_left(keys, prefix)
+            end = bisect.bisect_left(keys, prefix + "\U0010ffff", start)
+            result = heapq.nlargest(limit, pairs[start:end], key=lambda pair: pair[1])
+            if len(found) >= 4096:
+                found.clear()
+            found[(prefix, limit)] = result
+        return result
+
+    # tag ที่มี note มากที่สุด (สำหรับหน้า tag cloud)
+    def top(self, limit=100):
+        return self._load()[2][:limit]
+
+
+index = TagIndex()
+
+
+@click.command("rebuild-tag-counts")
+def rebuild_counts_command():
+    """นับจำนวน note ของทุก tag ใหม่จากตาราง note_tag"""
+    with models.db.engine.begin() as conn:
+        rebuild_counts(conn)
+    click.echo("tag counts rebuilt")
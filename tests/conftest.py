@@ -0,0 +1,80 @@
+import io
+import os
+import struct
+import sys
+import zlib
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import models
+
+
+# แอปที่ใช้ฐานข้อมูลและที่เก็บไฟล์ใน tmp_path (bcrypt รอบต่ำและไม่ใช้ process pool)
+@pytest.fixture
+def app(tmp_path):
+    app = main.create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + str(tmp_path / "test.db"),
+            "BLOB_STORE_PATH": str(tmp_path / "blobs"),
+            "DERIVATIVE_PATH": str(tmp_path / "derivatives"),
+            "TEMPLATE_CACHE_PATH": "",
+            "ASSET_BUILD_PATH": str(tmp_path / "assets"),
+            "WTF_CSRF_ENABLED": False,
+            "BCRYPT_LOG_ROUNDS": 4,
+            "PASSWORD_WORKERS": 0,
+        }
+    )
+    yield app
+    with app.app_context():
+        models.db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def create_user(app, username, roles=("user",)):
+    with app.app_context():
+        db = models.db
+        user = models.User(username=username, name=username)
+        user.set_password("secret")
+        for name in roles:
+            role = db.session.scalar(db.select(models.Role).where(models.Role.name == name))
+            user.roles.append(role or models.Role(name=name))
+        db.session.add(user)
+        db.session.commit()
+
+
+def login(client, username):
+    response = client.post("/login", data={"username": username, "password": "secret"})
+    assert response.status_code == 302
+
+
+# PNG ขนาด width x height (สีเดียว) สำหรับทดสอบการอัปโหลด
+def make_png(width=64, height=48):
+    raw = b"".join(b"\x00" + b"\x80\x40\x20" * width for _ in range(height))
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
+
+
+def add_upload(app, filename="photo.png", data=None):
+    import uploads
+
+    with app.app_context():
+        upload = uploads.ingest(io.BytesIO(data or make_png()), filename)
+        models.db.session.commit()
+        return upload.id
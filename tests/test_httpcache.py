@@ -0,0 +1,76 @@
+import re
+from urllib.parse import urljoin, urlsplit
+
+import assets
+from conftest import add_upload, make_png
+
+# URL ทั้งหมดที่เบราว์เซอร์โหลดจากหน้า (src, srcset และ <link href>) เฉพาะของเว็บเอง
+URL = re.compile(r'(?:\ssrc|<link[^>]+href)="([^"]+)"|srcset="([^"]+)"')
+CSS_URL = re.compile(r"""url\(['"]?([^'")]+)""")
+
+
+def page_resources(html):
+    urls = set()
+    for src, srcset in URL.findall(html):
+        if srcset:
+            urls.update(part.split()[0] for part in srcset.split(","))
+        elif src.startswith("/") and not src.startswith("//"):
+            urls.add(src)
+    return {url for url in urls if not urlsplit(url).netloc}
+
+
+def test_repeat_visit_to_images_sends_no_image_bytes(app, client):
+    # เหมือนตอน deploy: build asset ก่อน (CSS และรูปพื้นหลังได้ชื่อที่มี hash)
+    with app.app_context():
+        app.extensions["assets"], _ = assets.build(
+            app.static_folder, app.config["ASSET_BUILD_PATH"]
+        )
+    for number, size in enumerate([(40, 30), (80, 60), (120, 90)]):
+        add_upload(app, f"photo{number}.png", make_png(*size))
+
+    html = client.get("/images").get_data(as_text=True)
+    urls = page_resources(html)
+    image_urls = [url for url in urls if url.startswith("/upload/")]
+    assert len(image_urls) >= 3
+
+    etags = {}
+    queue = sorted(urls)
+    while queue:
+        url = queue.pop()
+        if url in etags:
+            continue
+        response = client.get(url)
+        if response.mimetype == "text/css":
+            css = response.get_data(as_text=True)
+            queue.extend(urljoin(url, ref) for ref in CSS_URL.findall(css))
+        if response.status_code == 302:
+            # รูปย่อที่สร้างไม่ได้ redirect ไปที่ไฟล์ต้นฉบับ
+            continue
+        assert response.status_code == 200, url
+        assert response.headers.get("ETag"), url
+        assert "max-age" in response.headers.get("Cache-Control", ""), url
+        etags[url] = response.headers["ETag"]
+        response.close()
+    assert any(url.startswith("/upload/") for url in etags)
+    assert any(url.endswith(".jpg") for url in etags)
+
+    for url, etag in etags.items():
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304, url
+        assert response.get_data() == b"", url
+
+
+def test_original_image_has_mime_type_and_strong_etag(app, client):
+    upload_id = add_upload(app)
+    response = client.get(f"/upload/{upload_id}")
+    assert response.mimetype == "image/png"
+    assert not response.headers["ETag"].startswith("W/")
+    assert "immutable" in response.headers["Cache-Control"]
+    last_modified = response.headers["Last-Modified"]
+    response.close()
+
+    response = client.get(
+        f"/upload/{upload_id}", headers={"If-Modified-Since": last_modified}
+    )
+    assert response.status_code == 304
+    assert response.get_data() == b""
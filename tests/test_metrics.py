@@ -0,0 +1,27 @@
+import re
+
+import metrics
+import sqlcount
+from conftest import create_user, login
+
+
+def metric_value(name, endpoint):
+    match = re.search(
+        rf'^{name}{{endpoint="{re.escape(endpoint)}"}} (\S+)$', metrics.render(), re.M
+    )
+    return float(match.group(1)) if match else 0.0
+
+
+def test_request_sql_metrics_come_from_sqlcount(app, client):
+    create_user(app, "reader")
+    login(client, "reader")
+    client.get("/note")  # โหลดผู้ใช้เข้า cache ก่อน
+    queries = metric_value("http_request_sql_queries_sum", "site.note")
+    seconds = metric_value("http_request_sql_duration_seconds_sum", "site.note")
+    with app.app_context(), sqlcount.count_queries() as recorded:
+        assert client.get("/note").status_code == 200
+    assert len(recorded) > 0
+    assert metric_value("http_request_sql_queries_sum", "site.note") - queries == len(
+        recorded
+    )
+    assert metric_value("http_request_sql_duration_seconds_sum", "site.note") > seconds
@@ -0,0 +1,91 @@
+import pytest
+import sqlalchemy as sa
+
+import api
+import models
+import pagination
+import transfer
+from conftest import create_user, login
+
+# cursor ที่ถูกแก้มา (ชนิดของค่าไม่ตรง) ต้องได้ 400 ไม่ใช่ 500
+BAD_CURSORS = [
+    [{"a": 1}, 1],
+    [[1], 1],
+    ["note", "1"],
+    [1, 1],
+    [True, 1],
+    [None, 1],
+    {"title": "note"},
+    ["note"],
+]
+
+
+@pytest.fixture
+def reader(app, client):
+    with app.app_context():
+        for number in range(3):
+            models.db.session.add(models.Note(title=f"note {number}", description=""))
+        models.db.session.commit()
+    create_user(app, "reader")
+    login(client, "reader")
+    return client
+
+
+@pytest.mark.parametrize("values", BAD_CURSORS)
+@pytest.mark.parametrize("url", ["/note", "/images", "/api/v1/notes"])
+def test_bad_cursor_is_rejected(reader, url, values):
+    response = reader.get(url, query_string={"after": pagination.encode_cursor(values)})
+    assert response.status_code == 400
+
+
+def test_next_page_follows_cursor(reader):
+    response = reader.get("/api/v1/notes", query_string={"limit": 2})
+    data = response.get_json()
+    assert [item["title"] for item in data["items"]] == ["note 0", "note 1"]
+    response = reader.get(
+        "/api/v1/notes", query_string={"limit": 2, "after": data["next"]}
+    )
+    assert [item["title"] for item in response.get_json()["items"]] == ["note 2"]
+    assert reader.get("/note", query_string={"after": "not base64!"}).status_code == 400
+
+
+def test_api_pages_go_up_to_1000_notes(app, client):
+    with app.app_context():
+        transfer.create_notes([{"title": f"n{i}"} for i in range(1005)])
+        models.db.session.commit()
+    data = client.get("/api/v1/notes", query_string={"limit": 5000}).get_json()
+    assert len(data["items"]) == api.MAX_PAGE_SIZE == 1000
+    assert data["next"]
+    # หน้า HTML ยังจำกัดที่ pagination.MAX_PAGE_SIZE
+    with app.test_request_context("/note?limit=5000"):
+        assert pagination.page_limit() == pagination.MAX_PAGE_SIZE
+
+
+def test_keyset_pages_through_null_filenames(app):
+    with app.app_context():
+        table = models.Upload.__table__
+        models.db.session.execute(
+            table.insert(),
+            [{"filename": name} for name in ("b.png", None, "a.png", None, "")],
+        )
+        models.db.session.commit()
+        seen, after = [], None
+        while True:
+            with app.test_request_context():
+                page = pagination.keyset_page(
+                    models.db.select(models.Upload),
+                    [models.Upload.filename, models.Upload.id],
+                    after=after,
+                    limit=1,
+                )
+                seen.extend(upload.filename for upload in page)
+            after = page.next_cursor
+            if after is None:
+                break
+        # NULL เรียงเหมือนข้อความว่าง (ก่อนชื่ออื่น) และไม่ทำให้การแบ่งหน้าหยุดกลางทาง
+        assert seen == [None, None, "", "a.png", "b.png"]
+        sql = page._statement.compile(
+            models.db.engine, compile_kwargs={"literal_binds": True}
+        )
+        plan = models.db.session.execute(sa.text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        assert "ix_uploads_filename_key" in str(plan)
@@ -0,0 +1,30 @@
+import threading
+import time
+
+import pytest
+from werkzeug.exceptions import ServiceUnavailable
+
+import passwords
+
+
+@pytest.fixture
+def hasher():
+    hasher = passwords.PasswordHasher()
+    hasher.workers = 1
+    hasher.timeout = 0.5
+    hasher._slots = threading.BoundedSemaphore(1)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_timeout_is_503_and_keeps_slot_until_job_ends(hasher):
+    hasher._run(time.sleep, 0)  # เริ่ม process ใน pool ก่อนจับเวลา
+    with pytest.raises(ServiceUnavailable) as timed_out:
+        hasher._run(time.sleep, 1.5)
+    assert timed_out.value.retry_after == hasher.timeout
+    # งานเดิมยังรันอยู่ จึงยังไม่มี slot ว่าง
+    with pytest.raises(ServiceUnavailable) as busy:
+        hasher._run(time.sleep, 0)
+    assert busy.value.retry_after == 1
+    time.sleep(1.5)
+    assert hasher._run(time.sleep, 0) is None
@@ -0,0 +1,24 @@
+import models
+import tags
+
+
+def test_search_page_and_api_use_the_same_parameters(app, client):
+    with app.app_context():
+        for title, names in [("Bangkok trip", ["travel"]), ("Bangkok food", ["food"])]:
+            note = models.Note(title=title, description="street market")
+            note.tags = tags.resolve_tags(names)
+            models.db.session.add(note)
+        models.db.session.commit()
+
+    query = {"q": "bangkok", "tag": "travel,food", "limit": 1, "offset": 1}
+    data = client.get("/api/v1/search", query_string=query).get_json()
+    assert data["query"] == "bangkok"
+    assert data["tags"] == ["travel", "food"]
+    assert len(data["items"]) == 1
+    assert "<mark>" in data["items"][0]["title"]
+    page = client.get("/search", query_string=query)
+    assert page.status_code == 200
+    assert data["items"][0]["id"] != client.get(
+        "/api/v1/search", query_string=dict(query, offset=0)
+    ).get_json()["items"][0]["id"]
+    assert client.get("/search.json").status_code == 404
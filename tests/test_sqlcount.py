@@ -0,0 +1,55 @@
+import re
+
+import pytest
+
+import models
+import sqlcount
+import tags
+from conftest import add_upload, create_user, login
+
+# TESTING=True: route ที่รัน SQL เกิน query_budget จะ raise QueryBudgetExceeded
+# (ไม่ถูกแปลงเป็น 500) test จึงล้มทันทีเมื่อมี N+1 query กลับมา
+LISTING_URLS = ["/", "/note", "/note?limit=100", "/tags/travel", "/images"]
+
+
+@pytest.fixture
+def populated(app):
+    with app.app_context():
+        for number in range(40):
+            note = models.Note(title=f"note {number:02}", description="text")
+            note.tags = tags.resolve_tags(
+                ["travel", f"tag{number % 7}", f"other{number % 3}"]
+            )
+            models.db.session.add(note)
+        models.db.session.commit()
+    for number in range(5):
+        add_upload(app, f"photo{number}.png")
+    create_user(app, "reader")
+    create_user(app, "boss", roles=("user", "admin"))
+    return app
+
+
+@pytest.mark.parametrize("username", [None, "reader", "boss"])
+def test_listing_routes_stay_within_query_budget(populated, client, username):
+    assert populated.testing
+    if username:
+        login(client, username)
+    for url in LISTING_URLS:
+        response = client.get(url)
+        assert response.status_code == 200, url
+    # หน้าถัดไปของการแบ่งหน้าแบบ keyset ใช้จำนวน query เท่าเดิม
+    if username:
+        html = client.get("/note?limit=10").get_data(as_text=True)
+        next_url = re.search(r'href="(/note\?after=[^"]+)"', html)[1]
+        assert client.get(next_url.replace("&amp;", "&")).status_code == 200
+
+def test_budget_is_enforced_in_testing(app, client):
+    @sqlcount.query_budget(1)
+    def two_queries():
+        models.db.session.execute(models.db.select(models.Note)).all()
+        models.db.session.execute(models.db.select(models.Tag)).all()
+        return "ok"
+
+    app.add_url_rule("/two-queries", view_func=two_queries)
+    with pytest.raises(sqlcount.QueryBudgetExceeded):
+        client.get("/two-queries")
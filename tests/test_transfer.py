@@ -0,0 +1,102 @@
+import io
+import json
+import os
+import tarfile
+
+import pytest
+
+import blobstore
+import models
+from conftest import create_user, login, make_png
+
+NDJSON = {"Content-Type": "application/x-ndjson"}
+
+
+@pytest.fixture
+def admin(app, client):
+    create_user(app, "boss", roles=("user", "admin"))
+    login(client, "boss")
+    return client
+
+
+def ndjson(*records):
+    return "".join(
+        (record if isinstance(record, str) else json.dumps(record)) + "\n"
+        for record in records
+    )
+
+
+def note_count(app):
+    with app.app_context():
+        return models.db.session.scalar(
+            models.db.select(models.db.func.count()).select_from(models.Note)
+        )
+
+
+@pytest.mark.parametrize(
+    "bad",
+    [
+        {"title": None},
+        {"title": "  "},
+        {"title": "b", "description": {"x": 1}},
+        {"title": "b", "tags": "travel"},
+        {"title": "b", "tags": ["ok", 1]},
+        {"title": "b", "created_date": "yesterday"},
+        [1, 2],
+        "not json",
+    ],
+)
+def test_invalid_note_is_400_with_line_number(app, admin, bad):
+    response = admin.post(
+        "/api/v1/import/notes", data=ndjson({"title": "a"}, bad), headers=NDJSON
+    )
+    assert response.status_code == 400
+    assert "line 2" in response.get_json()["description"]
+    assert note_count(app) == 0
+
+
+def test_import_notes(app, admin):
+    response = admin.post(
+        "/api/v1/import/notes",
+        data=ndjson({"title": "a", "tags": ["travel"]}, {"title": "b"}),
+        headers=NDJSON,
+    )
+    assert response.get_json() == {"imported": 2}
+    with app.app_context():
+        names = models.db.session.scalars(models.db.select(models.Tag.name)).all()
+    assert names == ["travel"]
+
+
+def test_import_requires_content_type(app, admin):
+    # ฟอร์ม HTML จากเว็บอื่นส่งได้แค่ text/plain, multipart หรือ urlencoded
+    response = admin.post(
+        "/api/v1/import/notes",
+        data=ndjson({"title": "a"}),
+        headers={"Content-Type": "text/plain"},
+    )
+    assert response.status_code == 415
+    assert note_count(app) == 0
+    response = admin.post(
+        "/api/v1/import/uploads", data=b"x", headers={"Content-Type": "text/plain"}
+    )
+    assert response.status_code == 415
+
+
+def test_mismatched_blob_is_not_stored(app, admin):
+    data = make_png(2, 2)
+    wrong = "0" * 64
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode="w") as tar:
+        info = tarfile.TarInfo("blobs/" + wrong)
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    response = admin.post(
+        "/api/v1/import/uploads",
+        data=archive.getvalue(),
+        headers={"Content-Type": "application/x-tar"},
+    )
+    assert response.get_json() == {"blobs": 0, "uploads": 0, "skipped": 1}
+    root = app.config["BLOB_STORE_PATH"]
+    assert [name for _, _, files in os.walk(root) for name in files] == []
+    with app.app_context():
+        assert not blobstore.store.exists(wrong)
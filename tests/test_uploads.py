@@ -0,0 +1,199 @@
+import io
+import tracemalloc
+
+import pytest
+from werkzeug.test import EnvironBuilder
+
+import blobstore
+import imaging
+import models
+import uploads
+from conftest import create_user, login
+
+MB = 1024 * 1024
+PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+# peak ของหน่วยความจำที่ยอมรับได้ต่อการอัปโหลด ไม่ขึ้นกับขนาดไฟล์
+MAX_PEAK = 4 * MB
+
+
+# ส่วน [start, end) ของไฟล์ PNG ขนาด size byte ที่สร้างข้อมูลตอนถูกอ่าน
+# (ไม่มีทั้งไฟล์ในหน่วยความจำ) seek ได้เพื่อให้ test client หาความยาวของ body ได้
+class GeneratedFile(io.RawIOBase):
+    block = bytes(range(256)) * 256
+
+    def __init__(self, size, start=0, end=None, header=PNG_HEADER):
+        self.start = start
+        self.end = size if end is None else end
+        self.header = header
+        self.position = start
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position - self.start
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: self.start, io.SEEK_CUR: self.position, io.SEEK_END: self.end}
+        self.position = min(max(base[whence] + offset, self.start), self.end)
+        return self.tell()
+
+    def readinto(self, buffer):
+        count = min(len(buffer), self.end - self.position)
+        written = 0
+        while written < count:
+            if self.position < len(self.header):
+                piece = self.header[self.position :]
+            else:
+                offset = (self.position - len(self.header)) % len(self.block)
+                piece = self.block[offset:]
+            piece = piece[: count - written]
+            buffer[written : written + len(piece)] = piece
+            written += len(piece)
+            self.position += len(piece)
+        return written
+
+
+def upload_in_parts(client, size, part_size):
+    response = client.post(
+        "/api/v1/uploads/sessions", json={"filename": "big.png", "size": size}
+    )
+    assert response.status_code == 201
+    path = response.headers["Location"]
+    for offset in range(0, size, part_size):
+        end = min(offset + part_size, size)
+        response = client.patch(
+            path,
+            input_stream=io.BufferedReader(GeneratedFile(size, offset, end)),
+            headers={"Upload-Offset": str(offset)},
+        )
+        assert response.status_code == (201 if end == size else 200), response.get_json()
+    return response.get_json()
+
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        return tracemalloc.get_traced_memory()[1], result
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.fixture
+def user_client(app, client, monkeypatch):
+    # ไม่สร้างรูปย่อใน thread เบื้องหลัง (หน่วยความจำของ Pillow จะปนกับที่วัด)
+    monkeypatch.setattr(imaging.pipeline, "schedule", lambda digest: None)
+    create_user(app, "uploader")
+    login(client, "uploader")
+    return client
+
+
+def test_peak_memory_is_the_same_for_1mb_and_500mb(app, user_client):
+    part_size = app.config["MAX_CONTENT_LENGTH"]
+    small_peak, small = peak_memory(upload_in_parts, user_client, 1 * MB, part_size)
+    large_peak, large = peak_memory(upload_in_parts, user_client, 500 * MB, part_size)
+
+    assert small["size"] == 1 * MB
+    assert large["size"] == 500 * MB
+    assert small_peak < MAX_PEAK
+    assert large_peak < MAX_PEAK
+    # ไฟล์ใหญ่ขึ้น 500 เท่า แต่หน่วยความจำแทบไม่เพิ่ม
+    assert large_peak < small_peak + MB
+
+
+def test_form_upload_streams_to_disk(app, user_client):
+    # body แบบ multipart ถูกสร้างลงไฟล์ชั่วคราวก่อนเริ่มวัด
+    def multipart(size):
+        return EnvironBuilder(
+            path="/upload",
+            method="POST",
+            data={"file": (io.BufferedReader(GeneratedFile(size)), "photo.png")},
+        ).get_environ()
+
+    small_peak, response = peak_memory(user_client.open, multipart(1 * MB))
+    assert response.status_code == 302
+    large_peak, response = peak_memory(user_client.open, multipart(24 * MB))
+    assert response.status_code == 302
+    assert large_peak < MAX_PEAK
+    assert large_peak < small_peak + MB
+
+
+def test_rejects_too_large_and_wrong_type(app, user_client):
+    limit = app.config["UPLOAD_MAX_FILE_SIZE"]
+    # ขนาดที่แจ้งเกินกำหนด: ปฏิเสธก่อนรับข้อมูล
+    response = user_client.post(
+        "/api/v1/uploads/sessions", json={"filename": "huge.png", "size": limit + 1}
+    )
+    assert response.status_code == 413
+
+    # ส่งข้อมูลเกินขนาดที่แจ้งไว้
+    token = user_client.post(
+        "/api/v1/uploads/sessions", json={"filename": "a.png", "size": 1000}
+    ).get_json()["id"]
+    response = user_client.patch(
+        f"/api/v1/uploads/sessions/{token}",
+        data=GeneratedFile(2000).read(),
+        headers={"Upload-Offset": "0"},
+    )
+    assert response.status_code == 413
+    assert user_client.get(f"/api/v1/uploads/sessions/{token}").get_json()["offset"] == 0
+
+    # ไฟล์ใหญ่กว่า UPLOAD_MAX_FILE_SIZE (หยุดระหว่างอ่าน stream)
+    app.config["UPLOAD_MAX_FILE_SIZE"] = 1 * MB
+    response = user_client.post(
+        "/upload",
+        data={"file": (io.BufferedReader(GeneratedFile(2 * MB)), "photo.png")},
+    )
+    assert response.status_code == 413
+
+    # request ใหญ่กว่า MAX_CONTENT_LENGTH (ปฏิเสธจาก Content-Length)
+    app.config["MAX_CONTENT_LENGTH"] = 1 * MB
+    response = user_client.post(
+        "/upload",
+        data={"file": (io.BufferedReader(GeneratedFile(2 * MB)), "photo.png")},
+    )
+    assert response.status_code == 413
+
+    # นามสกุล .png แต่เนื้อหาไม่ใช่รูป (ตรวจจาก magic bytes)
+    not_image = b"GIF89a" + b"\x00" * 1000
+    response = user_client.post(
+        "/upload", data={"file": (io.BytesIO(not_image), "photo.png")}
+    )
+    assert response.status_code == 415
+    token = user_client.post(
+        "/api/v1/uploads/sessions", json={"filename": "b.png", "size": len(not_image)}
+    ).get_json()["id"]
+    response = user_client.patch(
+        f"/api/v1/uploads/sessions/{token}",
+        data=not_image,
+        headers={"Upload-Offset": "0"},
+    )
+    assert response.status_code == 415
+
+
+def test_concurrent_part_with_same_offset_is_rejected(app, user_client):
+    size = 2 * 1024
+    data = GeneratedFile(size).read()
+    path = user_client.post(
+        "/api/v1/uploads/sessions", json={"filename": "c.png", "size": size}
+    ).headers["Location"]
+    token = path.rsplit("/", 1)[1]
+
+    def send(offset, body):
+        return user_client.patch(path, data=body, headers={"Upload-Offset": str(offset)})
+
+    assert send(0, data[:1024]).status_code == 200
+    # request อื่นกำลังเขียน session นี้อยู่ (ถือ lock ไว้)
+    with app.app_context(), uploads._exclusive(token):
+        assert send(1024, data[1024:]).status_code == 409
+    # ส่งซ้ำด้วย offset เดิมหลังจากส่วนนั้นถูกเขียนไปแล้ว: ไม่ต่อท้ายซ้ำ
+    assert send(1024, data[1024:]).status_code == 201
+    assert send(1024, data[1024:]).status_code == 404
+    with app.app_context():
+        upload = models.db.session.scalars(models.db.select(models.Upload)).one()
+        with blobstore.store.open(upload.sha256) as f:
+            assert f.read() == data
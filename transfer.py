@@ -0,0 +1,457 @@
+import datetime
+import io
+import itertools
+import json
+import os
+import tarfile
+import tempfile
+import time
+import zipfile
+from collections import Counter
+
+import click
+import sqlalchemy as sa
+
+import blobstore
+import models
+import tags
+
+BATCH_SIZE = 5000
+# จำนวนแถวที่ดึงจาก cursor ต่อครั้งตอน export (ไม่โหลดทั้งตารางเข้าหน่วยความจำ)
+EXPORT_BATCH_SIZE = 1000
+ARCHIVE_FORMATS = ("tar", "zip")
+# ในไฟล์ archive: blobs/<sha256> ตามด้วย uploads.ndjson (ข้อมูลของแต่ละ Upload)
+BLOB_PREFIX = "blobs/"
+UPLOADS_MEMBER = "uploads.ndjson"
+UPLOAD_COLUMNS = ("filename", "sha256", "size", "mime_type", "width", "height")
+DATE_COLUMNS = ("created_date", "updated_date")
+# ชนิดของค่าที่รับได้ในแต่ละคอลัมน์ของ uploads.ndjson (None ได้ทุกคอลัมน์ยกเว้น sha256)
+UPLOAD_TYPES = {"filename": str, "size": int, "mime_type": str, "width": int, "height": int}
+
+
+def init_app(app):
+    # ขนาดสูงสุดของ body ที่ /api/v1/import/* รับได้ (None = ไม่จำกัด ไฟล์ใหญ่ใช้ CLI ได้เช่นกัน)
+    app.config.setdefault("IMPORT_MAX_CONTENT_LENGTH", None)
+    app.cli.add_command(import_notes_command)
+    app.cli.add_command(export_notes_command)
+    app.cli.add_command(export_uploads_command)
+    app.cli.add_command(import_uploads_command)
+
+
+# บรรทัดที่ไม่ใช่ JSON หรือข้อมูลไม่ถูกต้อง (line คือเลขบรรทัด เริ่มที่ 1)
+class InvalidRecord(ValueError):
+    def __init__(self, line):
+        super().__init__(f"Invalid record on line {line}")
+        self.line = line
+
+
+# แบ่ง NDJSON เป็นชุดละ size รายการ; valid(record) ที่คืน False จะ raise InvalidRecord
+def _batches(lines, size, valid=None):
+    batch = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise InvalidRecord(number) from None
+        if valid is not None and not valid(record):
+            raise InvalidRecord(number)
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _dump_line(record):
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def _isoformat(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.isoformat()
+
+
+# created_date/updated_date จากข้อมูลที่ export มา (รายการที่ไม่มีใช้เวลาปัจจุบัน)
+def _dates(records):
+    if not any(record.get(name) for record in records for name in DATE_COLUMNS):
+        return [{} for _ in records]
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return [
+        {
+            name: datetime.datetime.fromisoformat(record[name]) if record.get(name) else now
+            for name in DATE_COLUMNS
+        }
+        for record in records
+    ]
+
+
+def _valid_dates(record):
+    for name in DATE_COLUMNS:
+        value = record.get(name)
+        if value is None or value == "":
+            continue
+        if not isinstance(value, str):
+            return False
+        try:
+            datetime.datetime.fromisoformat(value)
+        except ValueError:
+            return False
+    return True
+
+
+# record ของ note จากไฟล์ภายนอก: title ต้องเป็นข้อความที่ไม่ว่าง description เป็นข้อความ
+# (หรือไม่มี) และ tags เป็นรายการของชื่อ (ข้อความเดี่ยวจะถูกแยกเป็นตัวอักษร จึงไม่รับ)
+def _valid_note(record):
+    if not isinstance(record, dict):
+        return False
+    title = record.get("title")
+    description = record.get("description")
+    names = record.get("tags")
+    return (
+        isinstance(title, str)
+        and bool(title.strip())
+        and (description is None or isinstance(description, str))
+        and (
+            names is None
+            or (isinstance(names, list) and all(isinstance(n, str) for n in names))
+        )
+        and _valid_dates(record)
+    )
+
+
+# เพิ่ม note หลายรายการใน session ปัจจุบัน (ยังไม่ commit) คืนค่า id ตามลำดับเดิม
+# แต่ละรายการ: {"title": ..., "description": ..., "tags": ["a", "b"]}
+# และ created_date/updated_date (ISO 8601) ถ้ามี
+def create_notes(records):
+    db = models.db
+    by_name = {
+        tag.name: tag.id
+        for tag in tags.resolve_tags(
+            name for record in records for name in record.get("tags") or []
+        )
+    }
+    note_ids = db.session.execute(
+        sa.insert(models.Note).returning(models.Note.id, sort_by_parameter_order=True),
+        [
+            {
+                "title": record["title"],
+                "description": record.get("description") or "",
+                **dates,
+            }
+            for record, dates in zip(records, _dates(records))
+        ],
+    ).scalars().all()
+    links = [
+        {"note_id": note_id, "tag_id": by_name[name]}
+        for note_id, record in zip(note_ids, records)
+        for name in tags.normalize(record.get("tags") or [])
+    ]
+    if links:
+        db.session.execute(models.note_tag_m2m.insert(), links)
+        tags.adjust_counts(
+            db.session.connection(), Counter(link["tag_id"] for link in links)
+        )
+    return note_ids
+
+
+# นำเข้า note จาก NDJSON ทีละชุด (หนึ่ง transaction ต่อชุด)
+# บรรทัดที่ไม่ถูกต้องจะ raise InvalidRecord ก่อนเพิ่มชุดนั้น (ชุดก่อนหน้า commit ไปแล้ว)
+def import_notes(lines, batch_size=BATCH_SIZE, progress=None):
+    total = 0
+    for batch in _batches(lines, batch_size, _valid_note):
+        create_notes(batch)
+        models.db.session.commit()
+        total += len(batch)
+        if progress:
+            progress(total)
+    return total
+
+
+# note ทั้งหมดพร้อม tag เป็น NDJSON ทีละบรรทัด ใช้ cursor เดียวเรียงตาม id
+# (join กับ note_tag แล้วรวมแถวของ note เดียวกัน) จึงใช้หน่วยความจำคงที่
+def export_notes(batch_size=EXPORT_BATCH_SIZE):
+    note = models.Note.__table__
+    link = models.note_tag_m2m
+    tag = models.Tag.__table__
+    rows = models.db.session.execute(
+        sa.select(
+            note.c.id,
+            note.c.title,
+            note.c.description,
+            note.c.created_date,
+            note.c.updated_date,
+            tag.c.name,
+        )
+        .select_from(
+            note.outerjoin(link, link.c.note_id == note.c.id).outerjoin(
+                tag, tag.c.id == link.c.tag_id
+            )
+        )
+        .order_by(note.c.id),
+        execution_options={"yield_per": batch_size},
+    )
+    for _, group in itertools.groupby(rows, key=lambda row: row.id):
+        group = list(group)
+        first = group[0]
+        yield _dump_line(
+            {
+                "id": first.id,
+                "title": first.title,
+                "description": first.description,
+                "tags": [row.name for row in group if row.name is not None],
+                "created_date": _isoformat(first.created_date),
+                "updated_date": _isoformat(first.updated_date),
+            }
+        )
+
+
+def _upload_rows(batch_size):
+    table = models.Upload.__table__
+    return models.db.session.execute(
+        sa.select(*(table.c[name] for name in UPLOAD_COLUMNS + DATE_COLUMNS)).order_by(
+            table.c.id
+        ),
+        execution_options={"yield_per": batch_size},
+    )
+
+
+def _blob_digests(batch_size):
+    return models.db.session.execute(
+        sa.select(models.Upload.sha256)
+        .where(models.Upload.sha256.is_not(None))
+        .distinct()
+        .order_by(models.Upload.sha256),
+        execution_options={"yield_per": batch_size},
+    ).scalars()
+
+
+# ข้อมูลของทุก Upload เขียนลงไฟล์ชั่วคราวก่อน (ต้องรู้ขนาดก่อนเขียนลง archive)
+def _spool_upload_metadata(batch_size):
+    spool = tempfile.TemporaryFile()
+    for row in _upload_rows(batch_size):
+        record = dict(row._mapping)
+        for name in DATE_COLUMNS:
+            record[name] = _isoformat(record[name])
+        spool.write(_dump_line(record).encode())
+    spool.seek(0)
+    return spool
+
+
+def _read_chunks(f):
+    return iter(lambda: f.read(blobstore.CHUNK_SIZE), b"")
+
+
+# ไฟล์หนึ่งไฟล์ใน tar: header, เนื้อหาทีละ chunk และเติมให้ครบ block ละ 512 byte
+def _tar_member(name, size, chunks, mtime):
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = mtime
+    yield info.tobuf(tarfile.PAX_FORMAT, "utf-8")
+    yield from chunks
+    if size % tarfile.BLOCKSIZE:
+        yield tarfile.NUL * (tarfile.BLOCKSIZE - size % tarfile.BLOCKSIZE)
+
+
+# ที่ให้ zipfile เขียนลง แล้วดึงข้อมูลออกไปส่งต่อเป็นระยะ (zipfile รองรับ stream ที่ seek ไม่ได้)
+class _ZipBuffer(io.RawIOBase):
+    def __init__(self):
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _zip_members(members):
+    buffer = _ZipBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for name, size, chunks, mtime in members:
+            info = zipfile.ZipInfo(name, time.localtime(mtime)[:6])
+            with archive.open(info, "w", force_zip64=size > 0x7FFFFFFF) as dest:
+                for chunk in chunks:
+                    dest.write(chunk)
+                    yield buffer.take()
+            yield buffer.take()
+    yield buffer.take()
+
+
+def _archive_members(batch_size):
+    for digest in _blob_digests(batch_size):
+        try:
+            f = blobstore.store.open(digest)
+        except FileNotFoundError:
+            continue
+        with f:
+            stat = os.fstat(f.fileno())
+            yield BLOB_PREFIX + digest, stat.st_size, _read_chunks(f), int(stat.st_mtime)
+    with _spool_upload_metadata(batch_size) as spool:
+        size = os.fstat(spool.fileno()).st_size
+        yield UPLOADS_MEMBER, size, _read_chunks(spool), int(time.time())
+
+
+# ไฟล์รูปทั้งหมด (ไฟล์ละครั้งตาม sha256) และ uploads.ndjson เป็น tar หรือ zip แบบ stream
+# คืนค่า generator ของ bytes ส่งต่อเป็น response หรือเขียนลงไฟล์ได้ทันที
+def export_uploads(archive_format="tar", batch_size=EXPORT_BATCH_SIZE):
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unknown archive format: {archive_format!r}")
+    members = _archive_members(batch_size)
+    if archive_format == "zip":
+        yield from (chunk for chunk in _zip_members(members) if chunk)
+        return
+    for name, size, chunks, mtime in members:
+        yield from _tar_member(name, size, chunks, mtime)
+    yield tarfile.NUL * (2 * tarfile.BLOCKSIZE)
+
+
+def _archive_entries(fileobj):
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    with archive.open(info) as f:
+                        yield info.filename, f
+        return
+    fileobj.seek(0)
+    with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+        for member in archive:
+            if member.isfile():
+                yield member.name, archive.extractfile(member)
+
+
+# เพิ่ม Upload ที่ยังไม่มี (sha256 และชื่อไฟล์ตรงกันถือว่าซ้ำ) คืนค่าจำนวนที่เพิ่ม
+# record จากไฟล์ภายนอก: sha256 ต้องเป็น hex 64 ตัว (ใช้เป็น path ใน blobstore)
+# และคอลัมน์อื่นต้องเป็นชนิดที่ถูกต้อง ไม่เช่นนั้นข้าม record นั้น
+def _valid_upload(record):
+    if not isinstance(record, dict):
+        return False
+    digest = record.get("sha256")
+    if not isinstance(digest, str) or not blobstore.DIGEST.fullmatch(digest):
+        return False
+    for name, type_ in UPLOAD_TYPES.items():
+        value = record.get(name)
+        if value is not None and (
+            not isinstance(value, type_) or isinstance(value, bool)
+        ):
+            return False
+        if type_ is int and value is not None and value < 0:
+            return False
+    return _valid_dates(record)
+
+
+def _insert_uploads(records):
+    db = models.db
+    records = [
+        record
+        for record in records
+        if _valid_upload(record) and blobstore.store.exists(record["sha256"])
+    ]
+    existing = set()
+    digests = sorted({record["sha256"] for record in records})
+    for start in range(0, len(digests), tags.IN_BATCH):
+        existing.update(
+            db.session.execute(
+                sa.select(models.Upload.sha256, models.Upload.filename).where(
+                    models.Upload.sha256.in_(digests[start : start + tags.IN_BATCH])
+                )
+            ).all()
+        )
+    rows = []
+    for record, dates in zip(records, _dates(records)):
+        key = (record["sha256"], record.get("filename"))
+        if key in existing:
+            continue
+        existing.add(key)
+        rows.append(dict({name: record.get(name) for name in UPLOAD_COLUMNS}, **dates))
+    if rows:
+        db.session.execute(sa.insert(models.Upload), rows)
+    return len(rows)
+
+
+# นำเข้า archive จาก export_uploads (tar, tar.gz หรือ zip)
+# ไฟล์รูปเข้า blobstore ทีละ chunk (ไฟล์ที่มีอยู่แล้วไม่เขียนซ้ำ) แล้วเพิ่ม Upload ทีละชุด
+# fileobj ต้อง seek ได้ (zip เก็บสารบัญไว้ท้ายไฟล์)
+def import_uploads(fileobj, batch_size=BATCH_SIZE, progress=None):
+    result = {"blobs": 0, "uploads": 0, "skipped": 0}
+    for name, f in _archive_entries(fileobj):
+        if name.startswith(BLOB_PREFIX):
+            try:
+                blobstore.store.save(f, expected=name[len(BLOB_PREFIX) :])
+            except blobstore.DigestMismatch:
+                # เนื้อหาไม่ตรงกับชื่อ (ไฟล์เสีย) ไม่ถูกเก็บ
+                # Upload ที่อ้างถึงจะถูกข้ามถ้าไม่มีไฟล์นี้อยู่แล้ว
+                result["skipped"] += 1
+                continue
+            result["blobs"] += 1
+        elif name == UPLOADS_MEMBER:
+            # อ่านทีละบรรทัดเป็น bytes (json.loads รับ UTF-8 ได้โดยตรง)
+            for batch in _batches(f, batch_size):
+                added = _insert_uploads(batch)
+                models.db.session.commit()
+                result["uploads"] += added
+                result["skipped"] += len(batch) - added
+                if progress:
+                    progress(result["uploads"])
+    return result
+
+
+def _progress(label):
+    return lambda count: click.echo(f"{label} {count}", err=True)
+
+
+@click.command("import-notes")
+@click.argument("source", type=click.File("r", encoding="utf-8"))
+@click.option("--batch-size", default=BATCH_SIZE, show_default=True)
+def import_notes_command(source, batch_size):
+    """นำเข้า note และ tag จากไฟล์ NDJSON"""
+    try:
+        total = import_notes(source, batch_size, progress=_progress("imported notes"))
+    except InvalidRecord as error:
+        raise click.ClickException(str(error))
+    click.echo(f"{total} notes imported")
+
+
+@click.command("export-notes")
+@click.argument("output", type=click.File("w", encoding="utf-8"), default="-")
+def export_notes_command(output):
+    """ส่งออก note และ tag ทั้งหมดเป็น NDJSON (ไม่ระบุไฟล์จะเขียนออก stdout)"""
+    for line in export_notes():
+        output.write(line)
+
+
+@click.command("export-uploads")
+@click.argument("output", type=click.File("wb"))
+@click.option(
+    "--format", "archive_format", type=click.Choice(ARCHIVE_FORMATS), default="tar"
+)
+def export_uploads_command(output, archive_format):
+    """ส่งออกไฟล์รูปทั้งหมดและข้อมูลของ Upload เป็น tar หรือ zip"""
+    for chunk in export_uploads(archive_format):
+        output.write(chunk)
+
+
+@click.command("import-uploads")
+@click.argument("source", type=click.File("rb"))
+@click.option("--batch-size", default=BATCH_SIZE, show_default=True)
+def import_uploads_command(source, batch_size):
+    """นำเข้าไฟล์รูปและ Upload จาก archive ของ export-uploads"""
+    result = import_uploads(source, batch_size, progress=_progress("imported uploads"))
+    click.echo(
+        f"{result['blobs']} files, {result['uploads']} uploads imported,"
+        f" {result['skipped']} skipped"
+    )
@@ -0,0 +1,227 @@
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app
+from werkzeug.exceptions import (
+    Conflict,
+    NotFound,
+    RequestEntityTooLarge,
+    UnsupportedMediaType,
+)
+
+import blobstore
+import models
+
+try:
+    import fcntl
+except ImportError:  # Windows: ใช้ lock ภายใน process แทน (พอสำหรับ app.run)
+    fcntl = None
+
+# magic bytes ของไฟล์ที่รับ (ไม่เชื่อนามสกุลหรือ Content-Type ที่ client ส่งมา)
+SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+)
+SNIFF_BYTES = 8
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_-]{22}")
+
+
+def init_app(app):
+    # จำกัดขนาด body ของแต่ละ request (werkzeug ตอบ 413 จาก Content-Length ก่อนอ่าน body)
+    # ไฟล์ที่ใหญ่กว่านี้ต้องอัปโหลดเป็นหลายส่วนผ่าน upload session
+    if app.config["MAX_CONTENT_LENGTH"] is None:
+        app.config["MAX_CONTENT_LENGTH"] = 32 * 1024 * 1024
+    app.config.setdefault("UPLOAD_MAX_FILE_SIZE", 512 * 1024 * 1024)
+    app.config.setdefault("UPLOAD_SESSION_TTL", 24 * 60 * 60)
+    path = app.config.setdefault(
+        "UPLOAD_SESSION_PATH", os.path.join(blobstore.store.root, "sessions")
+    )
+    os.makedirs(path, exist_ok=True)
+
+
+def sniff(head):
+    for signature, mime_type in SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    return None
+
+
+# ครอบ stream ของไฟล์: หยุดทันทีเมื่อเกินขนาด (413) และตรวจ magic bytes
+# จากข้อมูลส่วนแรก (415) ระหว่างที่ blobstore อ่านทีละ chunk
+class CheckedStream:
+    def __init__(self, stream, max_size, check_type=True, message=None):
+        self.stream = stream
+        self.max_size = max_size
+        self.message = message or f"File is larger than the limit of {max_size} bytes."
+        self.size = 0
+        self._head = b"" if check_type else None
+
+    def read(self, size=-1):
+        chunk = self.stream.read(size)
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            raise RequestEntityTooLarge(self.message)
+        if self._head is not None:
+            self._head += chunk[: SNIFF_BYTES - len(self._head)]
+            if len(self._head) >= SNIFF_BYTES or not chunk:
+                if sniff(self._head) is None:
+                    raise UnsupportedMediaType("Only PNG and JPEG images are accepted.")
+                self._head = None
+        return chunk
+
+
+def _create_upload(filename, blob):
+    info = blobstore.store.probe(blob.digest)
+    upload = models.Upload(
+        filename=filename,
+        sha256=blob.digest,
+        size=blob.size,
+        mime_type=info.mime_type,
+        width=info.width,
+        height=info.height,
+    )
+    models.db.session.add(upload)
+    return upload
+
+
+# รับไฟล์ทั้งไฟล์จาก stream (ยังไม่ commit)
+def ingest(stream, filename):
+    limit = current_app.config["UPLOAD_MAX_FILE_SIZE"]
+    blob = blobstore.store.save(CheckedStream(stream, limit))
+    return _create_upload(filename, blob)
+
+
+# upload session: client ส่งไฟล์เป็นหลายส่วนตามลำดับ และส่งต่อจาก offset เดิมได้ถ้าหลุด
+# ข้อมูลที่รับแล้วอยู่ใน <token>.part ส่วนชื่อไฟล์/ขนาด/เจ้าของอยู่ใน <token>.json
+def _session_path(token, suffix):
+    if not TOKEN_PATTERN.fullmatch(token):
+        raise NotFound("Upload session not found")
+    return os.path.join(current_app.config["UPLOAD_SESSION_PATH"], token + suffix)
+
+
+def _prune_sessions():
+    root = current_app.config["UPLOAD_SESSION_PATH"]
+    cutoff = time.time() - current_app.config["UPLOAD_SESSION_TTL"]
+    with os.scandir(root) as entries:
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+            except OSError:
+                pass
+
+
+def create_session(filename, size, user_id):
+    limit = current_app.config["UPLOAD_MAX_FILE_SIZE"]
+    if size > limit:
+        raise RequestEntityTooLarge(f"File is larger than the limit of {limit} bytes.")
+    _prune_sessions()
+    token = secrets.token_urlsafe(16)
+    with open(_session_path(token, ".json"), "w") as f:
+        json.dump({"filename": filename, "size": size, "user_id": user_id}, f)
+    open(_session_path(token, ".part"), "wb").close()
+    return token
+
+
+def load_session(token, user_id):
+    try:
+        with open(_session_path(token, ".json")) as f:
+            session = json.load(f)
+        session["offset"] = os.path.getsize(_session_path(token, ".part"))
+    except FileNotFoundError:
+        raise NotFound("Upload session not found")
+    if session["user_id"] != user_id:
+        raise NotFound("Upload session not found")
+    return session
+
+
+def discard_session(token):
+    for suffix in (".part", ".json"):
+        try:
+            os.unlink(_session_path(token, suffix))
+        except FileNotFoundError:
+            pass
+
+
+_writing = set()
+_writing_lock = threading.Lock()
+
+
+# ให้มี request เดียวที่เขียนต่อ session ได้ในเวลาเดียวกัน (ทุก worker process)
+# ใช้ flock บนไฟล์ .part ผ่าน fd แยก (ปิดไฟล์ที่เขียนแล้วย้ายเข้า blobstore ได้ขณะยังถือ lock)
+# ถ้ามี request อื่นถืออยู่จะตอบ 409 ทันทีแทนการรอ
+@contextmanager
+def _exclusive(token):
+    busy = "Another request is writing to this upload session"
+    if fcntl is None:
+        with _writing_lock:
+            if token in _writing:
+                raise Conflict(busy)
+            _writing.add(token)
+        try:
+            yield
+        finally:
+            with _writing_lock:
+                _writing.discard(token)
+        return
+    try:
+        fd = os.open(_session_path(token, ".part"), os.O_RDONLY)
+    except FileNotFoundError:
+        raise NotFound("Upload session not found")
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise Conflict(busy)
+        yield
+    finally:
+        os.close(fd)
+
+
+# ต่อข้อมูลจาก stream ท้ายไฟล์ของ session คืนค่า (offset ใหม่, Upload หรือ None)
+# เมื่อได้ครบตามขนาดที่แจ้งไว้จะย้ายไฟล์เข้า blobstore และสร้าง Upload (ยังไม่ commit)
+def append(token, user_id, stream, offset):
+    session = load_session(token, user_id)
+    with _exclusive(token):
+        return _append_locked(token, session, stream, offset)
+
+
+def _append_locked(token, session, stream, offset):
+    part_path = _session_path(token, ".part")
+    # ขนาดจริงของไฟล์หลังได้ lock (request ก่อนหน้าอาจเพิ่งเขียนต่อหรือทำเสร็จไปแล้ว)
+    try:
+        received = os.path.getsize(part_path)
+    except FileNotFoundError:
+        raise NotFound("Upload session not found")
+    if offset != received:
+        raise Conflict(f"Upload-Offset must be {received}")
+    checked = CheckedStream(
+        stream,
+        session["size"] - offset,
+        check_type=offset == 0,
+        message=f"Upload is larger than the declared size of {session['size']} bytes.",
+    )
+    with open(part_path, "r+b") as part:
+        part.seek(offset)
+        try:
+            for chunk in iter(lambda: checked.read(blobstore.CHUNK_SIZE), b""):
+                part.write(chunk)
+        except (RequestEntityTooLarge, UnsupportedMediaType):
+            # ทิ้งข้อมูลของ request ที่ถูกปฏิเสธ (ถ้าการเชื่อมต่อหลุด ส่วนที่ได้รับแล้วยังอยู่)
+            part.truncate(offset)
+            raise
+    offset += checked.size
+    if offset < session["size"]:
+        return offset, None
+    with open(part_path, "rb") as part:
+        if sniff(part.read(SNIFF_BYTES)) is None:
+            discard_session(token)
+            raise UnsupportedMediaType("Only PNG and JPEG images are accepted.")
+    blob = blobstore.store.adopt(part_path)
+    discard_session(token)
+    return offset, _create_upload(session["filename"], blob)